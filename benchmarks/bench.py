@@ -0,0 +1,337 @@
+"""
+Benchmark the carving kernels and the end-to-end `CarvableImage` methods.
+
+Every benchmark runs on every input in two fresh interpreters sharing a numba cache
+that starts empty: the first call of the first one measures the JIT compilation, the
+second one the steady state and the peak memory, which the compiler then does not add
+to. Kernels count one call as one seam, as in a carve without incremental updates:
+`carve_seam` copies the image without the seam, `remove_seam` removes it in place from
+the `CarvingBuffer` carves use, refilled from the image outside the timed runs.
+
+Usage:
+    python benchmarks/bench.py [--quick] [--output results.json]
+    python benchmarks/bench.py --compare baseline.json [--threshold 0.1]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Image paths, or the (height, width) of synthetic noise
+INPUTS = {
+    "castle_small": "images/castle_small.png",
+    "balloon": "images/balloon.jpg",
+    "castle": "images/castle.jpg",
+    "noise_720p": (720, 1280),
+    "noise_2160p": (2160, 3840),
+}
+
+KERNELS = ("squared_diff", "find_seam", "carve_seam", "remove_seam")
+METHODS = ("seam_carve", "seam_carve_enlarge", "seam_carve_with_mask")
+BENCHMARKS = KERNELS + METHODS
+
+QUICK_INPUTS = ("castle_small", "noise_720p")
+QUICK_SEAMS = (10,)
+
+
+def _load_input(name: str):
+    import cv2
+    import numpy as np
+
+    source = INPUTS[name]
+    if isinstance(source, str):
+        mat = cv2.imread(os.path.join(ROOT, source))
+        if mat is None:
+            raise ValueError(f"Failed to read '{source}'")
+        return mat
+
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (*source, 3), dtype=np.uint8)
+
+
+def _setup(benchmark: str, mat):
+    """
+    Prepare the inputs of a benchmark.
+
+    Returns:
+        tuple: A function running the benchmark for a number of seams, and a function
+            preparing fresh inputs for the runs that consume them, which returns the
+            number of runs they allow, or None when the runs can repeat forever.
+    """
+    from src.algorithms.carving import CarvingBuffer, carve_seam
+    from src.algorithms.energy import EnergyCalculator
+    from src.algorithms.seam import SeamFinder
+    from src.lib import CarvableImage, Image
+
+    if benchmark == "squared_diff":
+        return lambda num_seams: EnergyCalculator.squared_diff(mat), None
+
+    energy_map = EnergyCalculator.squared_diff(mat)
+    if benchmark == "find_seam":
+        return lambda num_seams: SeamFinder.find_seam(energy_map), None
+
+    seam = SeamFinder.find_seam(energy_map)
+    if benchmark == "carve_seam":
+        return lambda num_seams: carve_seam(mat, seam), None
+
+    if benchmark == "remove_seam":
+        buffers = []
+
+        def reset() -> int:
+            buffers[:] = [CarvingBuffer(mat)]
+            # The buffer shrinks with every seam, down to the width the seam still fits
+            return mat.shape[1] - int(seam.max())
+
+        def remove_seam(num_seams: int) -> None:
+            buffers[0].remove_seam(seam)
+
+        return remove_seam, reset
+
+    carvable = CarvableImage(Image(mat, copy=False))
+    return lambda num_seams: getattr(carvable, benchmark)(num_seams), None
+
+
+def _peak_rss_mb() -> float:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _time_per_run(run, reset, num_seams: int, min_time: float = 0.2) -> float:
+    """
+    Time runs back to back for at least `min_time` seconds, so that the timer and the
+    scheduler do not dominate fast kernels, and return the mean time of one run.
+
+    With a `reset` function from `_setup`, the runs are timed in batches of the number
+    it returns, and the fresh inputs are prepared between the batches, untimed.
+    """
+    import time
+
+    number, elapsed = 0, 0.0
+    while elapsed < min_time:
+        runs = 1 if reset is None else reset()
+        start = time.perf_counter()
+        for _ in range(runs):
+            run(num_seams)
+        elapsed += time.perf_counter() - start
+        number += runs
+    return elapsed / number
+
+
+def run_child(spec: dict) -> dict:
+    """
+    Run one benchmark on one input in this process, see `measure`.
+    """
+    import time
+
+    mat = _load_input(spec["input"])
+    run, reset = _setup(spec["benchmark"], mat)
+    seam_counts = [1] if spec["benchmark"] in KERNELS else spec["seams"]
+
+    if reset is not None:
+        reset()
+    rss_before = _peak_rss_mb()
+    start = time.perf_counter()
+    run(seam_counts[0])
+    result = {"shape": list(mat.shape[:2]), "first_s": time.perf_counter() - start}
+
+    steady = {}
+    for num_seams in seam_counts if spec["repeat"] > 0 else []:
+        steady[num_seams] = min(
+            _time_per_run(run, reset, num_seams) for _ in range(spec["repeat"])
+        )
+
+    result["steady_s"] = steady
+    result["rss_before_mb"] = rss_before
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def _run_process(spec: dict, cache_dir: str) -> dict:
+    env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir, PYTHONPATH=ROOT)
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", json.dumps(spec)],
+        cwd=ROOT,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def measure(
+    benchmark: str, input_name: str, seams: List[int], repeat: int
+) -> List[dict]:
+    """
+    Run a benchmark on an input with a cold and then a warm numba cache.
+
+    Returns:
+        List[dict]: One result per seam count, with the compile time, the fastest of
+            the repeated samples and the peak resident memory of the warm run.
+    """
+    spec = {"benchmark": benchmark, "input": input_name, "seams": seams, "repeat": 0}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = _run_process(spec, cache_dir)
+        warm = _run_process(dict(spec, repeat=repeat), cache_dir)
+
+    steady = {int(n): t for n, t in warm["steady_s"].items()}
+    first_steady = steady[min(steady)]
+    return [
+        {
+            "benchmark": benchmark,
+            "input": input_name,
+            "shape": warm["shape"],
+            "seams": num_seams,
+            "compile_s": max(cold["first_s"] - first_steady, 0.0),
+            "steady_s": steady_s,
+            "seams_per_s": num_seams / steady_s,
+            "peak_rss_mb": warm["peak_rss_mb"],
+            "peak_rss_delta_mb": warm["peak_rss_mb"] - warm["rss_before_mb"],
+        }
+        for num_seams, steady_s in steady.items()
+    ]
+
+
+def _key(result: dict) -> str:
+    return f"{result['benchmark']}/{result['input']}/{result['seams']}"
+
+
+def compare(results: List[dict], baseline: dict, threshold: float) -> List[str]:
+    """
+    Compare the steady-state times with a baseline saved by `--output`.
+
+    Returns:
+        List[str]: The keys of the results slower than the baseline by more than
+            `threshold`, a fraction.
+    """
+    previous: Dict[str, dict] = {_key(r): r for r in baseline["results"]}
+
+    regressions = []
+    print(f"\n{'benchmark':<44} {'baseline ms':>11} {'now ms':>11} {'change':>8}")
+    for result in results:
+        key = _key(result)
+        if key not in previous:
+            print(f"{key:<44} {'-':>11} {result['steady_s'] * 1000:>11.3f} {'new':>8}")
+            continue
+
+        change = result["steady_s"] / previous[key]["steady_s"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(
+            f"{key:<44} {previous[key]['steady_s'] * 1000:>11.3f} "
+            f"{result['steady_s'] * 1000:>11.3f} {change:>+8.1%}{flag}"
+        )
+
+    return regressions
+
+
+def _metadata() -> dict:
+    import numba
+    import numpy as np
+
+    return {
+        "python": platform.python_version(),
+        "numba": numba.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--benchmarks", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS)
+    )
+    parser.add_argument(
+        "--inputs", nargs="+", choices=list(INPUTS), default=list(INPUTS)
+    )
+    parser.add_argument(
+        "--seams",
+        nargs="+",
+        type=int,
+        default=[10, 50],
+        help="Seam counts of the end-to-end methods.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Steady-state samples per seam count."
+    )
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help=f"Only run on {', '.join(QUICK_INPUTS)} with {QUICK_SEAMS[0]} seams.",
+    )
+    parser.add_argument("--output", help="Save the results as JSON to this path.")
+    parser.add_argument("--compare", help="Compare with the results saved at a path.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Slowdown counted as a regression, as a fraction of the baseline.",
+    )
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_child(json.loads(args.child))))
+        return 0
+
+    if args.repeat < 1 or any(n < 1 for n in args.seams):
+        parser.error("--repeat and --seams must be positive")
+
+    inputs, seams = args.inputs, args.seams
+    if args.quick:
+        inputs = [name for name in inputs if name in QUICK_INPUTS]
+        seams = list(QUICK_SEAMS)
+
+    print(
+        f"{'benchmark':<22} {'input':<14} {'size':>11} {'seams':>6} {'compile s':>10} "
+        f"{'steady ms':>10} {'seams/s':>10} {'peak MB':>8} {'+MB':>6}"
+    )
+    results = []
+    for benchmark in args.benchmarks:
+        for name in inputs:
+            for result in measure(benchmark, name, seams, args.repeat):
+                results.append(result)
+                h, w = result["shape"]
+                print(
+                    f"{benchmark:<22} {name:<14} {f'{w}x{h}':>11} "
+                    f"{result['seams']:>6} {result['compile_s']:>10.2f} "
+                    f"{result['steady_s'] * 1000:>10.3f} "
+                    f"{result['seams_per_s']:>10.1f} "
+                    f"{result['peak_rss_mb']:>8.0f} "
+                    f"{result['peak_rss_delta_mb']:>6.0f}",
+                    flush=True,
+                )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"metadata": _metadata(), "results": results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(
+                f"\n{len(regressions)} regressions over {args.threshold:.0%}: "
+                f"{', '.join(regressions)}"
+            )
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
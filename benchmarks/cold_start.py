@@ -0,0 +1,79 @@
+"""
+Measure the cold start of a fresh process: importing `src.lib` and the first carve.
+
+Every run is a new interpreter with numba's on-disk cache pointed at a temporary
+directory, so the first run compiles all kernels and the second one loads them.
+
+Usage:
+    python benchmarks/cold_start.py [--image images/castle_small.png] [--seams 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in the child process, prints its timings as JSON
+CHILD = """
+import json, sys, time
+
+start = time.perf_counter()
+from src.lib import CarvableImage
+imported = time.perf_counter()
+
+carvable = CarvableImage.from_path(sys.argv[1])
+loaded = time.perf_counter()
+carvable.seam_carve(int(sys.argv[2]))
+first = time.perf_counter()
+carvable.seam_carve(int(sys.argv[2]))
+second = time.perf_counter()
+
+print(json.dumps({
+    "import_s": imported - start,
+    "first_carve_s": first - loaded,
+    "steady_carve_s": second - first,
+    "tqdm_imported": "tqdm" in sys.modules,
+}))
+"""
+
+
+def measure(image: str, num_seams: int, cache_dir: str) -> dict:
+    """
+    Run one fresh interpreter and return its timings.
+    """
+    env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir, PYTHONPATH=ROOT)
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, image, str(num_seams)],
+        cwd=ROOT,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--image", default="images/castle_small.png")
+    parser.add_argument("--seams", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for label in ("cold cache", "warm cache"):
+            result = measure(args.image, args.seams, cache_dir)
+            print(
+                f"{label:>10}: import {result['import_s']:.2f} s, "
+                f"first carve {result['first_carve_s']:.2f} s, "
+                f"steady carve {result['steady_carve_s']:.3f} s, "
+                f"tqdm imported: {result['tqdm_imported']}"
+            )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,7 @@ from src.gui import app
 
 
 def main() -> int:
-    instance = app.Application()
+    instance = app.Application(warmup_kernels=True)
 
     return instance.run()
 
@@ -1,8 +1,10 @@
+from typing import Optional
+
 import numba
 import numpy as np
 
 
-@numba.njit
+@numba.njit(cache=True)
 def carve_seam(mat: np.ndarray, seam: np.ndarray) -> np.ndarray:
     """
     Remove a seam from an image.
@@ -19,23 +21,254 @@ def carve_seam(mat: np.ndarray, seam: np.ndarray) -> np.ndarray:
     h, w, c = mat.shape
     assert len(seam) == h, "The seam must have the same height as the image."
 
-    carved = np.zeros((h, w - 1, c), dtype=np.uint8)
+    carved = np.empty((h, w - 1, c), dtype=np.uint8)
 
     for y in range(h):
         x = seam[y]
         carved[y, :x] = mat[y, 0:x]
         carved[y, x:] = mat[y, x + 1 :]
 
-    return carved.astype(np.uint8)
+    return carved
 
-def carve_seam_enlarge(mat: np.ndarray, seam: np.ndarray) -> np.ndarray:
+
+@numba.njit(cache=True)
+def carve_seam_2d(mat: np.ndarray, seam: np.ndarray) -> np.ndarray:
     """
-    Add a seam from an image.
+    Remove a seam from a single-channel map, e.g. an energy map.
 
     Args:
-        mat (np.ndarray): The image to remove the seam from.
+        mat (np.ndarray): The map of shape (h, w) to remove the seam from.
         seam (np.ndarray): The seam to remove.
 
+    Returns:
+        np.ndarray: The map with the seam removed, of the same dtype as the input.
+    """
+    assert len(mat.shape) == 2, "The input map must be a 2D matrix."
+
+    h, w = mat.shape
+    assert len(seam) == h, "The seam must have the same height as the map."
+
+    carved = np.empty((h, w - 1), dtype=mat.dtype)
+
+    for y in range(h):
+        x = seam[y]
+        carved[y, :x] = mat[y, :x]
+        carved[y, x:] = mat[y, x + 1 :]
+
+    return carved
+
+@numba.njit(cache=True)
+def _remove_seam_in_place(
+    mat: np.ndarray, seam: np.ndarray, width: int, mask: Optional[np.ndarray] = None
+) -> None:
+    h, w = len(seam), mat.shape[1]
+    for y in range(h):
+        # Work on the flattened row so the shift is a single slice copy for any channels
+        row = mat[y].reshape(-1)
+        c = len(row) // w
+
+        start, stop = seam[y] * c, (width - 1) * c
+        row[start:stop] = row[start + c : stop + c]
+
+        if mask is not None:
+            mask[y, seam[y] : width - 1] = mask[y, seam[y] + 1 : width]
+
+
+@numba.njit(cache=True)
+def _remove_seams_in_place(
+    mat: np.ndarray, seams: np.ndarray, width: int, mask: Optional[np.ndarray] = None
+) -> None:
+    n, h = seams.shape
+    w = mat.shape[1]
+    for y in range(h):
+        row = mat[y].reshape(-1)
+        c = len(row) // w
+
+        # Move every run of kept pixels left by the number of removed pixels before it
+        columns = np.sort(seams[:, y])
+        for j in range(n):
+            stop = columns[j + 1] if j + 1 < n else width
+            start = columns[j] + 1
+            row[(start - j - 1) * c : (stop - j - 1) * c] = row[start * c : stop * c]
+
+            if mask is not None:
+                mask[y, start - j - 1 : stop - j - 1] = mask[y, start:stop]
+
+
+@numba.njit(cache=True)
+def _remove_horizontal_seam_in_place(
+    mat: np.ndarray,
+    seam: np.ndarray,
+    height: int,
+    width: int,
+    mask: Optional[np.ndarray] = None,
+) -> None:
+    # Walk the rows top-down so every pixel below the seam moves up by one row while
+    # the buffer is still read and written row-major, one run of columns at a time
+    w = mat.shape[1]
+    for y in range(seam[:width].min(), height - 1):
+        row = mat[y].reshape(-1)
+        below = mat[y + 1].reshape(-1)
+        c = len(row) // w
+
+        x = 0
+        while x < width:
+            if seam[x] > y:
+                x += 1
+                continue
+
+            start = x
+            while x < width and seam[x] <= y:
+                x += 1
+            row[start * c : x * c] = below[start * c : x * c]
+
+            if mask is not None:
+                mask[y, start:x] = mask[y + 1, start:x]
+
+
+# Explicit signatures of the in-place removal kernels of `CarvingBuffer`, for the
+# image and the float32 energy map, see `src.lib.warmup`
+REMOVAL_SIGNATURES = (
+    (
+        _remove_seam_in_place,
+        (
+            "void(uint8[:, :, ::1], int32[::1], int64, none)",
+            "void(float32[:, ::1], int32[::1], int64, none)",
+        ),
+    ),
+    (
+        _remove_horizontal_seam_in_place,
+        ("void(uint8[:, :, ::1], int32[::1], int64, int64, none)",),
+    ),
+)
+
+
+class CarvingBuffer(object):
+    """
+    Buffer to remove seams from an image or a map in place.
+
+    The buffer keeps its original allocation and a logical height and width. Removing a
+    vertical seam shifts the remainder of every row left by one pixel, removing a
+    horizontal seam shifts the pixels below it up by one row, and the logical size
+    shrinks, so no image-sized memory is allocated per seam. `view` exposes the logical
+    part of the buffer without copying and `to_array` materializes it as a contiguous
+    array.
+
+    An optional per-pixel mask of shape (h, w) is carved in the same pass as the pixels
+    and exposed by `mask`.
+    """
+
+    def __init__(
+        self, mat: np.ndarray, copy: bool = True, mask: Optional[np.ndarray] = None
+    ):
+        assert len(mat.shape) in (2, 3), "The input must be a 2D or 3D matrix."
+        assert (
+            mask is None or mask.shape == mat.shape[:2]
+        ), "The mask must have the same size as the input."
+
+        self._mat = mat.copy() if copy else np.ascontiguousarray(mat)
+        self._mask = mask.copy() if mask is not None else None
+        self._height = mat.shape[0]
+        self._width = mat.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self._height
+
+    @property
+    def width(self) -> int:
+        return self._width
+
+    @property
+    def shape(self) -> tuple:
+        return (self._height, self._width) + self._mat.shape[2:]
+
+    @property
+    def view(self) -> np.ndarray:
+        return self._mat[: self._height, : self._width]
+
+    @property
+    def mask(self) -> Optional[np.ndarray]:
+        if self._mask is None:
+            return None
+        return self._mask[: self._height, : self._width]
+
+    def remove_seam(self, seam: np.ndarray, axis: int = 1) -> None:
+        """
+        Remove a seam in place.
+
+        Args:
+            seam (np.ndarray): The seam to remove. A vertical seam of shape (h,) holds
+                the column of every row, a horizontal seam of shape (w,) the row of
+                every column.
+            axis (int): The axis the seam is removed along: 1 for a vertical seam, which
+                reduces the width, 0 for a horizontal seam, which reduces the height.
+        """
+        if axis == 0:
+            assert (
+                len(seam) == self._width
+            ), "The seam must have the same width as the buffer."
+
+            _remove_horizontal_seam_in_place(
+                self._mat, seam, self._height, self._width, self._mask
+            )
+            self._height -= 1
+            return
+
+        assert (
+            len(seam) == self._height
+        ), "The seam must have the same height as the buffer."
+
+        _remove_seam_in_place(self._mat, seam, self._width, self._mask)
+        self._width -= 1
+
+    def remove_seams(self, seams: np.ndarray) -> None:
+        """
+        Remove several disjoint seams of the current image in place at once.
+
+        Args:
+            seams (np.ndarray): The seams to remove of shape (n, h).
+        """
+        assert (
+            seams.shape[1] == self._height
+        ), "The seams must have the same height as the buffer."
+
+        _remove_seams_in_place(self._mat, seams, self._width, self._mask)
+        self._width -= seams.shape[0]
+
+    def to_array(self) -> np.ndarray:
+        """
+        Materialize the logical part of the buffer.
+
+        Returns:
+            np.ndarray: A contiguous copy of the buffer of shape `shape`.
+        """
+        return np.ascontiguousarray(self.view)
+
+
+@numba.njit(cache=True)
+def _insert_pixel(
+    enlarged: np.ndarray,
+    out_y: int,
+    out_x: int,
+    pixel: np.ndarray,
+    neighbour: np.ndarray,
+) -> None:
+    # The new pixel is the average of the duplicated pixel and its next neighbour
+    for ch in range(len(pixel)):
+        total = np.int32(pixel[ch]) + np.int32(neighbour[ch])
+        enlarged[out_y, out_x, ch] = total // 2
+
+
+@numba.njit(cache=True)
+def carve_seam_enlarge(mat: np.ndarray, seam: np.ndarray) -> np.ndarray:
+    """
+    Add a seam to an image.
+
+    Args:
+        mat (np.ndarray): The image to add the seam to.
+        seam (np.ndarray): The seam to duplicate.
+
     Returns:
         np.ndarray: The image with the seam added.
     """
@@ -44,19 +277,73 @@ def carve_seam_enlarge(mat: np.ndarray, seam: np.ndarray) -> np.ndarray:
     h, w, c = mat.shape
     assert len(seam) == h, "The seam must have the same height as the image."
 
-    enlarged = np.zeros((h, w + 1, c), dtype=np.uint8)
+    enlarged = np.empty((h, w + 1, c), dtype=mat.dtype)
 
     for y in range(h):
         x = seam[y]
         enlarged[y, :x] = mat[y, :x]
+        _insert_pixel(enlarged, y, x, mat[y, x], mat[y, min(x + 1, w - 1)])
+        enlarged[y, x + 1 :] = mat[y, x:]
+
+    return enlarged
+
+
+@numba.njit(cache=True)
+def insert_seams(
+    mat: np.ndarray, duplicate: np.ndarray, num_seams: int, axis: int = 1
+) -> np.ndarray:
+    """
+    Add several seams to an image in a single pass.
+
+    Every marked pixel is duplicated like in `carve_seam_enlarge`, averaging it with its
+    next neighbour along `axis` from the original image.
+
+    Args:
+        mat (np.ndarray): The image of shape (h, w, c) to add the seams to.
+        duplicate (np.ndarray): Boolean mask of shape (h, w) of the pixels to duplicate,
+            with exactly `num_seams` marked pixels per row (per column for axis 0).
+        num_seams (int): The number of seams to add.
+        axis (int): 1 to add vertical seams, 0 to add horizontal seams.
+
+    Returns:
+        np.ndarray: The image with the seams added, of shape (h, w + num_seams, c), or
+            (h + num_seams, w, c) for axis 0.
+    """
+    assert len(mat.shape) == 3, "The input image must be a 3D matrix."
+
+    h, w, c = mat.shape
+    assert duplicate.shape == (h, w), "The mask must have the same size as the image."
+
+    if axis == 0:
+        enlarged = np.empty((h + num_seams, w, c), dtype=mat.dtype)
+
+        # Row-major: every column remembers how far down its pixels have moved so far
+        inserted = np.zeros(w, dtype=np.int32)
+        for y in range(h):
+            for x in range(w):
+                if duplicate[y, x]:
+                    assert inserted[x] < num_seams, "Too many pixels in a column."
+                    neighbour = mat[min(y + 1, h - 1), x]
+                    _insert_pixel(enlarged, y + inserted[x], x, mat[y, x], neighbour)
+                    inserted[x] += 1
+                enlarged[y + inserted[x], x] = mat[y, x]
+
+        assert (inserted == num_seams).all(), "Too few pixels in a column."
+        return enlarged
+
+    enlarged = np.empty((h, w + num_seams, c), dtype=mat.dtype)
+
+    for y in range(h):
+        out_x = 0
+        for x in range(w):
+            if duplicate[y, x]:
+                assert out_x < x + num_seams, "Too many pixels in a row."
+                neighbour = mat[y, min(x + 1, w - 1)]
+                _insert_pixel(enlarged, y, out_x, mat[y, x], neighbour)
+                out_x += 1
+            enlarged[y, out_x] = mat[y, x]
+            out_x += 1
 
-        if x < w - 1:
-            avg_pixel = (mat[y, x].astype(np.int32) + mat[y, x + 1].astype(np.int32)) // 2
-            enlarged[y, x] = avg_pixel.astype(np.uint8)
-            enlarged[y, x + 1] = mat[y, x]
-            enlarged[y, x + 2:] = mat[y, x + 1:]
-        else:
-            enlarged[y, x] = mat[y, x]
-            enlarged[y, x + 1] = mat[y, x]
+        assert out_x == w + num_seams, "Too few pixels in a row."
 
-    return enlarged.astype(np.uint8)
\ No newline at end of file
+    return enlarged
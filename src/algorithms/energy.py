@@ -1,12 +1,400 @@
-import cv2
+from typing import Callable, List, Optional, Tuple
+
 import numba
 import numpy as np
 
 
+def stencil_radius(energy_function: Callable[[np.ndarray], np.ndarray]) -> Optional[int]:
+    """
+    Get the stencil radius declared by an energy function.
+
+    An energy function declares its radius `r` by setting a `stencil_radius`
+    attribute, promising that the energy of a pixel only depends on the pixels
+    within `r` rows and columns of it (and on whether those lie on the border).
+
+    Args:
+        energy_function (Callable): The energy function.
+
+    Returns:
+        Optional[int]: The stencil radius, or None if it is not declared.
+    """
+    return getattr(energy_function, "stencil_radius", None)
+
+
+@numba.njit(cache=True)
+def seam_band(seam: np.ndarray, width: int, radius: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the columns whose energy is invalidated by removing a seam.
+
+    Args:
+        seam (np.ndarray): The removed seam of shape (h,), in the coordinates before removal.
+        width (int): The width of the image after removal.
+        radius (int): The stencil radius of the energy function.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The first and last invalidated column of every row,
+            in the coordinates after removal.
+    """
+    h = len(seam)
+    lo = np.empty(h, dtype=np.int32)
+    hi = np.empty(h, dtype=np.int32)
+
+    for y in range(h):
+        s_min = seam[y]
+        s_max = seam[y]
+        for yy in range(max(0, y - radius), min(h, y + radius + 1)):
+            s_min = min(s_min, seam[yy])
+            s_max = max(s_max, seam[yy])
+
+        lo[y] = max(0, s_min - radius)
+        hi[y] = min(width - 1, s_max + radius - 1)
+
+    return lo, hi
+
+
+@numba.njit(cache=True)
+def _luma(mat: np.ndarray, y: int, x: int) -> np.float32:
+    b, g, r = mat[y, x]
+    return np.float32(0.299 * r + 0.587 * g + 0.114 * b)
+
+
+@numba.njit(cache=True)
+def _squared_diff_at(mat: np.ndarray, y: int, x: int) -> np.float32:
+    """
+    Calculate the energy of a single pixel, matching `EnergyCalculator.squared_diff`.
+    """
+    h, w, _ = mat.shape
+
+    # Column borders take precedence over row borders
+    if x == 0:
+        return np.float32(_luma(mat, y, 1) / 2.0)
+    if x == w - 1:
+        return np.float32(np.abs(_luma(mat, y, w - 1) - _luma(mat, y, w - 2)))
+    if y == 0:
+        return np.float32(_luma(mat, 1, x) / 2.0)
+    if y == h - 1:
+        return np.float32(np.abs(_luma(mat, h - 1, x) - _luma(mat, h - 2, x)))
+
+    dy = (_luma(mat, y + 1, x) - _luma(mat, y - 1, x)) / 2.0
+    dx = (_luma(mat, y, x + 1) - _luma(mat, y, x - 1)) / 2.0
+
+    return np.float32(np.abs(dy) + np.abs(dx))
+
+
+@numba.njit(cache=True)
+def _squared_diff_intensity_at(intensity: np.ndarray, y: int, x: int) -> np.float32:
+    """
+    Same as `_squared_diff_at`, but from a precomputed intensity map.
+    """
+    h, w = intensity.shape
+
+    if x == 0:
+        return np.float32(intensity[y, 1] / 2.0)
+    if x == w - 1:
+        return np.float32(np.abs(intensity[y, w - 1] - intensity[y, w - 2]))
+    if y == 0:
+        return np.float32(intensity[1, x] / 2.0)
+    if y == h - 1:
+        return np.float32(np.abs(intensity[h - 1, x] - intensity[h - 2, x]))
+
+    dy = (intensity[y + 1, x] - intensity[y - 1, x]) / 2.0
+    dx = (intensity[y, x + 1] - intensity[y, x - 1]) / 2.0
+
+    return np.float32(np.abs(dy) + np.abs(dx))
+
+
+@numba.njit(cache=True)
+def _intensity_row(mat: np.ndarray, y: int, out: np.ndarray) -> None:
+    for x in range(mat.shape[1]):
+        b, g, r = mat[y, x]
+        out[x] = 0.299 * r + 0.587 * g + 0.114 * b
+
+
+@numba.njit(cache=True)
+def intensity_map(mat: np.ndarray) -> np.ndarray:
+    """
+    Calculate the intensity (luma) of every pixel of an image.
+
+    Args:
+        mat (np.ndarray): The image of shape (h, w, 3) in BGR order.
+
+    Returns:
+        np.ndarray: The intensity map of shape (h, w).
+    """
+    assert len(mat.shape) == 3, "The input image must be a 3D matrix."
+
+    intensity = np.empty(mat.shape[:2], dtype=np.float32)
+    for y in range(mat.shape[0]):
+        _intensity_row(mat, y, intensity[y])
+
+    return intensity
+
+
+@numba.njit(cache=True)
+def _squared_diff_row(
+    above: np.ndarray, row: np.ndarray, below: np.ndarray, y: int, h: int, out: np.ndarray
+) -> None:
+    """
+    Calculate one row of `squared_diff` from the intensities of the rows around it.
+    """
+    w = len(row)
+
+    if y == 0:
+        for x in range(1, w - 1):
+            out[x] = below[x] / 2.0
+    elif y == h - 1:
+        for x in range(1, w - 1):
+            out[x] = np.abs(row[x] - above[x])
+    else:
+        for x in range(1, w - 1):
+            dy = (below[x] - above[x]) / 2.0
+            dx = (row[x + 1] - row[x - 1]) / 2.0
+            out[x] = np.abs(dy) + np.abs(dx)
+
+    out[0] = row[1] / 2.0
+    out[w - 1] = np.abs(row[w - 1] - row[w - 2])
+
+
+# Energy of the pixels a keep/remove mask keeps, and the negative of it for the pixels
+# it removes. Fixed, so that flat images are protected as well, and far above the
+# energy any seam accumulates from the built-in energy functions. Masked energy maps
+# are float64, so that the seam searches accumulate in float64: next to multiples of
+# it, float32 sums round the ordinary energy differences away.
+MASK_ENERGY = 1e8
+
+# Fixed-point scale of the uint16 energy maps: `squared_diff` is at most 255, so its
+# quantized values fit in uint16 with 8 fractional bits
+UINT16_ENERGY_SCALE = 256.0
+
+
+@numba.njit(cache=True)
+def _quantize(value: float, scale: float) -> np.uint16:
+    """
+    Round a non-negative energy to fixed point, saturating at the uint16 maximum.
+    """
+    return np.uint16(min(value * scale + 0.5, 65535.0))
+
+
+@numba.njit(cache=True)
+def quantize_energy(
+    energy_map: np.ndarray,
+    scale: float = UINT16_ENERGY_SCALE,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Convert a non-negative energy map to uint16 fixed point, for `SeamFinder` kernels
+    with integer cumulative sums such as `SeamFinder.find_seam_uint16`.
+
+    Args:
+        energy_map (np.ndarray): The energy map of shape (h, w).
+        scale (float): The factor applied before rounding, values beyond the uint16
+            range saturate.
+        out (np.ndarray, optional): The uint16 buffer of shape (h, w) to write to.
+
+    Returns:
+        np.ndarray: The quantized energy map of shape (h, w), `out` if given.
+    """
+    h, w = energy_map.shape
+    if out is None:
+        out = np.empty((h, w), dtype=np.uint16)
+
+    for y in range(h):
+        for x in range(w):
+            out[y, x] = _quantize(energy_map[y, x], scale)
+    return out
+
+
+@numba.njit(cache=True)
+def _reflect(i: int, n: int) -> int:
+    """
+    Map an index outside [0, n) back into it by reflection without repeating the border
+    pixel, like OpenCV's `BORDER_REFLECT_101`.
+    """
+    if i < 0:
+        i = -i
+    elif i >= n:
+        i = 2 * n - 2 - i
+    return min(max(i, 0), n - 1)
+
+
+@numba.njit(cache=True)
+def _energy_buffer(shape: Tuple[int, int], out: Optional[np.ndarray]) -> np.ndarray:
+    if out is None:
+        return np.empty(shape, dtype=np.float32)
+
+    assert out.shape == shape, "The output must have the shape of the image."
+    return out
+
+
+@numba.njit(cache=True)
+def _gradient_magnitude(intensity: np.ndarray, out: np.ndarray) -> None:
+    h, w = intensity.shape
+    for y in range(h):
+        above, below = _reflect(y - 1, h), _reflect(y + 1, h)
+        for x in range(w):
+            left, right = _reflect(x - 1, w), _reflect(x + 1, w)
+            dy = (intensity[below, x] - intensity[above, x]) / np.float32(2.0)
+            dx = (intensity[y, right] - intensity[y, left]) / np.float32(2.0)
+            out[y, x] = np.sqrt(dx * dx + dy * dy)
+
+
+@numba.njit(cache=True)
+def _derivative_energy(
+    intensity: np.ndarray, out: np.ndarray, side: float, center: float
+) -> None:
+    """
+    Sum of the absolute 3x3 derivatives in x and y, smoothed across the derivative with
+    the weights (side, center, side): (1, 2, 1) for Sobel, (3, 10, 3) for Scharr.
+    """
+    side, center = np.float32(side), np.float32(center)
+
+    h, w = intensity.shape
+    for y in range(h):
+        above, below = _reflect(y - 1, h), _reflect(y + 1, h)
+        for x in range(w):
+            left, right = _reflect(x - 1, w), _reflect(x + 1, w)
+            dx = (
+                side * (intensity[above, right] - intensity[above, left])
+                + center * (intensity[y, right] - intensity[y, left])
+                + side * (intensity[below, right] - intensity[below, left])
+            )
+            dy = (
+                side * (intensity[below, left] - intensity[above, left])
+                + center * (intensity[below, x] - intensity[above, x])
+                + side * (intensity[below, right] - intensity[above, right])
+            )
+            out[y, x] = np.abs(dx) + np.abs(dy)
+
+
+@numba.njit(cache=True)
+def _laplacian(intensity: np.ndarray, out: np.ndarray) -> None:
+    h, w = intensity.shape
+    for y in range(h):
+        above, below = _reflect(y - 1, h), _reflect(y + 1, h)
+        for x in range(w):
+            left, right = _reflect(x - 1, w), _reflect(x + 1, w)
+            out[y, x] = np.abs(
+                intensity[above, x]
+                + intensity[below, x]
+                + intensity[y, left]
+                + intensity[y, right]
+                - np.float32(4.0) * intensity[y, x]
+            )
+
+
+# Intensity levels and window radius of `EnergyCalculator.entropy`
+_ENTROPY_LEVELS = 16
+_ENTROPY_RADIUS = 4
+
+
+@numba.njit(cache=True)
+def _local_entropy(intensity: np.ndarray, out: np.ndarray) -> None:
+    """
+    Shannon entropy of the quantized intensities in the window around every pixel.
+
+    The histogram slides along every row, one column of the window in and one out, and
+    the entropy follows from the sum of `c * log2(c)` over its bins. The sum is taken
+    afresh for every pixel, so the entropy only depends on the exact counts of its
+    window, and recalculating a band of the map gives the same values.
+    """
+    h, w = intensity.shape
+    radius = _ENTROPY_RADIUS
+    size = 2 * radius + 1
+    count = size * size
+
+    levels = np.empty((h, w), dtype=np.int8)
+    for y in range(h):
+        for x in range(w):
+            levels[y, x] = min(int(intensity[y, x]) * _ENTROPY_LEVELS // 256, 15)
+
+    # c * log2(c) for every possible bin count
+    c_log_c = np.zeros(count + 1, dtype=np.float64)
+    for c in range(2, count + 1):
+        c_log_c[c] = c * np.log2(c)
+
+    rows = np.empty(size, dtype=np.int64)
+    histogram = np.empty(_ENTROPY_LEVELS, dtype=np.int64)
+    for y in range(h):
+        for i in range(size):
+            rows[i] = _reflect(y - radius + i, h)
+
+        histogram[:] = 0
+        for i in range(-radius, radius + 1):
+            column = _reflect(i, w)
+            for row in rows:
+                histogram[levels[row, column]] += 1
+
+        for x in range(w):
+            if x > 0:
+                leaving, entering = _reflect(x - 1 - radius, w), _reflect(x + radius, w)
+                for row in rows:
+                    histogram[levels[row, leaving]] -= 1
+                    histogram[levels[row, entering]] += 1
+
+            total = 0.0
+            for c in histogram:
+                total += c_log_c[c]
+
+            # Clamped, a uniform window can round to slightly below zero
+            out[y, x] = max(np.log2(count) - total / count, 0.0)
+
+
 class EnergyCalculator(object):
+    """
+    Energy functions, and a registry to select them by name, see `get`.
+
+    The built-in functions take an image of shape (h, w, 3) in BGR order and return a
+    float32 energy map of shape (h, w). All but `squared_diff` and its variants also
+    accept a preallocated float32 `out` buffer of shape (h, w) to write the map into.
+    """
+
+    _functions = {}
+
+    @classmethod
+    def register(
+        cls,
+        name: str,
+        energy_function: Callable[[np.ndarray], np.ndarray],
+        stencil_radius: Optional[int] = None,
+    ) -> Callable[[np.ndarray], np.ndarray]:
+        """
+        Register an energy function by name.
+
+        Args:
+            name (str): The name to select the function by.
+            energy_function (Callable): The energy function.
+            stencil_radius (int, optional): The stencil radius to declare on the
+                function, see `stencil_radius`.
+
+        Returns:
+            Callable: The energy function.
+        """
+        if stencil_radius is not None:
+            energy_function.stencil_radius = stencil_radius
+        cls._functions[name] = energy_function
+        return energy_function
+
+    @classmethod
+    def get(cls, name: str) -> Callable[[np.ndarray], np.ndarray]:
+        """
+        Get a registered energy function by name.
+        """
+        try:
+            return cls._functions[name]
+        except KeyError:
+            raise ValueError(
+                f"Expected: an energy function in {cls.names()}, but got: '{name}'"
+            )
+
+    @classmethod
+    def names(cls) -> List[str]:
+        """
+        Get the names of the registered energy functions, in registration order.
+        """
+        return list(cls._functions)
 
     @staticmethod
-    @numba.njit
+    @numba.njit(cache=True)
     def squared_diff(mat: np.ndarray) -> np.ndarray:
         assert len(mat.shape) == 3, "The input image must be a 3D matrix."
         w, h, _ = mat.shape
@@ -36,138 +424,390 @@ class EnergyCalculator(object):
 
         return energy_map.astype(np.float32)
 
-
-class _EnergyCalculator(object):
-    """
-    Calculate the energy of an image.
-
-    Args:
-        np.ndarray: The image to calculate the energy of.
-
-    Returns:
-        np.ndarray: The energy of the image with the same shape as the input.
-    """
-
     @staticmethod
-    @numba.jit(nopython=False, forceobj=True)
-    def squared_diff_1c(mat: np.ndarray) -> np.ndarray:
+    @numba.njit(parallel=True, cache=True)
+    def squared_diff_parallel(mat: np.ndarray) -> np.ndarray:
         """
-        Calculate the energy of an image using the squared difference.
+        Multi-threaded `squared_diff`, parallelized over the rows of the image.
 
         Args:
             mat (np.ndarray): The image to calculate the energy of.
 
         Returns:
-            np.ndarray: The energy of the image with the same shape as the input.
+            np.ndarray: The same energy map as `squared_diff`.
         """
-        mat = cv2.cvtColor(mat, cv2.COLOR_BGR2GRAY)
-        w, h = mat.shape
+        assert len(mat.shape) == 3, "The input image must be a 3D matrix."
+        h, w, _ = mat.shape
 
-        grad_y = np.zeros_like(mat, dtype=np.float32)
-        grad_x = np.zeros_like(mat, dtype=np.float32)
+        intensity = np.empty((h, w), dtype=np.float32)
+        for y in numba.prange(h):
+            for x in range(w):
+                b, g, r = mat[y, x]
+                intensity[y, x] = 0.299 * r + 0.587 * g + 0.114 * b
 
-        # Handle the borders
-        grad_y[0, :] = mat[0, :]
-        grad_y[-1, :] = mat[-2, :] - mat[-1, :]
+        energy_map = np.empty((h, w), dtype=np.float32)
+        for y in numba.prange(h):
+            for x in range(w):
+                energy_map[y, x] = _squared_diff_intensity_at(intensity, y, x)
 
-        grad_x[:, 0] = mat[:, 0]
-        grad_x[:, -1] = mat[:, -2] - mat[:, -1]
+        return energy_map
 
-        for y in range(1, w - 1):
-            for x in range(1, h - 1):
-                grad_y[y, x] = (mat[y + 1, x] - mat[y - 1, x]) / 2
-                grad_x[y, x] = (mat[y, x + 1] - mat[y, x - 1]) / 2
+    @staticmethod
+    @numba.njit(cache=True)
+    def squared_diff_band(
+        mat: np.ndarray,
+        energy_map: np.ndarray,
+        lo: np.ndarray,
+        hi: np.ndarray,
+        axis: int = 1,
+    ) -> None:
+        """
+        Recalculate `squared_diff` in place for a band of every row or column.
 
-        return np.abs(grad_y) + np.abs(grad_x)
+        Args:
+            mat (np.ndarray): The image of shape (h, w, 3).
+            energy_map (np.ndarray): The energy map of shape (h, w) to update.
+            lo (np.ndarray): The first column to recalculate for every row.
+            hi (np.ndarray): The last column to recalculate for every row.
+            axis (int): 1 for bands of columns after a vertical seam, 0 for bands of
+                rows after a horizontal seam, where `lo` and `hi` hold the first and
+                last row to recalculate for every column.
+        """
+        assert len(mat.shape) == 3, "The input image must be a 3D matrix."
+
+        if axis == 0:
+            for x in range(mat.shape[1]):
+                for y in range(lo[x], hi[x] + 1):
+                    energy_map[y, x] = _squared_diff_at(mat, y, x)
+            return
+
+        for y in range(mat.shape[0]):
+            for x in range(lo[y], hi[y] + 1):
+                energy_map[y, x] = _squared_diff_at(mat, y, x)
 
     @staticmethod
-    @numba.njit
-    def squared_diff(mat: np.ndarray) -> np.ndarray:
+    @numba.njit(cache=True)
+    def squared_diff_uint16(mat: np.ndarray) -> np.ndarray:
         """
-        Calculate the energy of an image using the squared difference.
+        `squared_diff` in uint16 fixed point with `UINT16_ENERGY_SCALE`, half the size
+        of the float32 map, for `SeamFinder.find_seam_uint16`.
 
         Args:
             mat (np.ndarray): The image to calculate the energy of.
 
         Returns:
-            np.ndarray: The energy of the image with the same shape as the input.
+            np.ndarray: The quantized energy map of shape (h, w).
         """
-        b, g, r = mat[:, :, 0], mat[:, :, 1], mat[:, :, 2]
+        assert len(mat.shape) == 3, "The input image must be a 3D matrix."
+        h, w, _ = mat.shape
 
-        # Calculate the squared difference between the pixels.
-        # Note: approximating by the sum of the absolute differences.
-        e_b = np.zeros_like(b, dtype=np.uint8)
-        e_g = np.zeros_like(g, dtype=np.uint8)
-        e_r = np.zeros_like(r, dtype=np.uint8)
+        intensity = intensity_map(mat)
+        energy_map = np.empty((h, w), dtype=np.uint16)
+        row = np.empty(w, dtype=np.float32)
+        for y in range(h):
+            above, below = intensity[max(y - 1, 0)], intensity[min(y + 1, h - 1)]
+            _squared_diff_row(above, intensity[y], below, y, h, row)
+            for x in range(w):
+                energy_map[y, x] = _quantize(row[x], UINT16_ENERGY_SCALE)
 
-        for y in range(mat.shape[0]):
-            for x in range(mat.shape[1]):
-                # Current pixel values
-                b_current, g_current, r_current = b[y, x], g[y, x], r[y, x]
+        return energy_map
 
-                e_b[y, x] += abs(b_current - b[y - 1, x]) + abs(b_current - b[y, x - 1])
-                e_g[y, x] += abs(g_current - g[y - 1, x]) + abs(g_current - g[y, x - 1])
-                e_r[y, x] += abs(r_current - r[y - 1, x]) + abs(r_current - r[y, x - 1])
+    @staticmethod
+    @numba.njit(cache=True)
+    def squared_diff_uint16_band(
+        mat: np.ndarray,
+        energy_map: np.ndarray,
+        lo: np.ndarray,
+        hi: np.ndarray,
+        axis: int = 1,
+    ) -> None:
+        """
+        Recalculate `squared_diff_uint16` in place for a band of every row or column,
+        see `squared_diff_band`.
+        """
+        assert len(mat.shape) == 3, "The input image must be a 3D matrix."
+
+        if axis == 0:
+            for x in range(mat.shape[1]):
+                for y in range(lo[x], hi[x] + 1):
+                    energy = _squared_diff_at(mat, y, x)
+                    energy_map[y, x] = _quantize(energy, UINT16_ENERGY_SCALE)
+            return
 
-        return np.divide(e_b + e_g + e_r, 3).astype(np.float32)
+        for y in range(mat.shape[0]):
+            for x in range(lo[y], hi[y] + 1):
+                energy = _squared_diff_at(mat, y, x)
+                energy_map[y, x] = _quantize(energy, UINT16_ENERGY_SCALE)
 
     @staticmethod
-    @numba.jit(nopython=False, forceobj=True)
-    def sobel(mat: np.ndarray) -> np.ndarray:
+    @numba.njit(cache=True)
+    def gradient_magnitude(
+        mat: np.ndarray, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
         """
-        Calculate the energy of an image using the Sobel operator.
+        Calculate the energy as the magnitude of the central-difference gradient of the
+        intensity, with reflected borders.
 
         Args:
             mat (np.ndarray): The image to calculate the energy of.
+            out (np.ndarray, optional): The float32 buffer of shape (h, w) to write to.
 
         Returns:
-            np.ndarray: The energy of the image with the same shape as the input.
+            np.ndarray: The energy map of shape (h, w), `out` if given.
         """
-        b, g, r = mat[:, :, 0], mat[:, :, 1], mat[:, :, 2]
+        assert len(mat.shape) == 3, "The input image must be a 3D matrix."
+        out = _energy_buffer(mat.shape[:2], out)
+        _gradient_magnitude(intensity_map(mat), out)
+        return out
 
-        # Calculate the Sobel operator of the image
-        e_b = np.abs(cv2.Sobel(b, -1, 1, 0)) + np.abs(cv2.Sobel(b, -1, 0, 1))
-        e_g = np.abs(cv2.Sobel(g, -1, 1, 0)) + np.abs(cv2.Sobel(g, -1, 0, 1))
-        e_r = np.abs(cv2.Sobel(r, -1, 1, 0)) + np.abs(cv2.Sobel(r, -1, 0, 1))
+    @staticmethod
+    @numba.njit(cache=True)
+    def sobel(mat: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Calculate the energy as the sum of the absolute Sobel derivatives of the
+        intensity, with reflected borders.
 
-        return np.divide(e_b + e_g + e_r, 3).astype(np.float32)
+        Args:
+            mat (np.ndarray): The image to calculate the energy of.
+            out (np.ndarray, optional): The float32 buffer of shape (h, w) to write to.
+
+        Returns:
+            np.ndarray: The energy map of shape (h, w), `out` if given.
+        """
+        assert len(mat.shape) == 3, "The input image must be a 3D matrix."
+        out = _energy_buffer(mat.shape[:2], out)
+        _derivative_energy(intensity_map(mat), out, 1.0, 2.0)
+        return out
 
     @staticmethod
-    @numba.jit(nopython=False, forceobj=True)
-    def scharr(mat: np.ndarray) -> np.ndarray:
+    @numba.njit(cache=True)
+    def scharr(mat: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
         """
-        Calculate the energy of an image using the Scharr operator.
+        Calculate the energy as the sum of the absolute Scharr derivatives of the
+        intensity, with reflected borders.
 
         Args:
             mat (np.ndarray): The image to calculate the energy of.
+            out (np.ndarray, optional): The float32 buffer of shape (h, w) to write to.
 
         Returns:
-            np.ndarray: The energy of the image with the same shape as the input.
+            np.ndarray: The energy map of shape (h, w), `out` if given.
+        """
+        assert len(mat.shape) == 3, "The input image must be a 3D matrix."
+        out = _energy_buffer(mat.shape[:2], out)
+        _derivative_energy(intensity_map(mat), out, 3.0, 10.0)
+        return out
+
+    @staticmethod
+    @numba.njit(cache=True)
+    def laplacian(mat: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
         """
-        b, g, r = mat[:, :, 0], mat[:, :, 1], mat[:, :, 2]
-        b_energy = np.abs(cv2.Scharr(b, -1, 1, 0)) + np.abs(cv2.Scharr(b, -1, 0, 1))
-        g_energy = np.abs(cv2.Scharr(g, -1, 1, 0)) + np.abs(cv2.Scharr(g, -1, 0, 1))
-        r_energy = np.abs(cv2.Scharr(r, -1, 1, 0)) + np.abs(cv2.Scharr(r, -1, 0, 1))
+        Calculate the energy as the absolute 4-neighbour Laplacian of the intensity,
+        with reflected borders.
 
-        return np.divide(b_energy + g_energy + r_energy, 3).astype(np.float32)
+        Args:
+            mat (np.ndarray): The image to calculate the energy of.
+            out (np.ndarray, optional): The float32 buffer of shape (h, w) to write to.
+
+        Returns:
+            np.ndarray: The energy map of shape (h, w), `out` if given.
+        """
+        assert len(mat.shape) == 3, "The input image must be a 3D matrix."
+        out = _energy_buffer(mat.shape[:2], out)
+        _laplacian(intensity_map(mat), out)
+        return out
 
     @staticmethod
-    @numba.jit(nopython=False, forceobj=True)
-    def laplacian(mat: np.ndarray) -> np.ndarray:
+    @numba.njit(cache=True)
+    def entropy(mat: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
         """
-        Calculate the energy of an image using the Laplacian operator.
+        Calculate the energy as the local entropy of the intensity, quantized to 16
+        levels, in the 9x9 window around every pixel, with reflected borders.
 
         Args:
             mat (np.ndarray): The image to calculate the energy of.
+            out (np.ndarray, optional): The float32 buffer of shape (h, w) to write to.
 
         Returns:
-            np.ndarray: The energy of the image with the same shape as the input.
+            np.ndarray: The energy map of shape (h, w), in bits, `out` if given.
         """
-        b, g, r = mat[:, :, 0], mat[:, :, 1], mat[:, :, 2]
+        assert len(mat.shape) == 3, "The input image must be a 3D matrix."
+        out = _energy_buffer(mat.shape[:2], out)
+        _local_entropy(intensity_map(mat), out)
+        return out
+
+
+EnergyCalculator.squared_diff.stencil_radius = 1
+EnergyCalculator.squared_diff.band_function = EnergyCalculator.squared_diff_band
+EnergyCalculator.squared_diff_parallel.stencil_radius = 1
+EnergyCalculator.squared_diff_parallel.band_function = EnergyCalculator.squared_diff_band
+EnergyCalculator.squared_diff_uint16.stencil_radius = 1
+EnergyCalculator.squared_diff_uint16.band_function = (
+    EnergyCalculator.squared_diff_uint16_band
+)
+
+EnergyCalculator.register("squared_diff", EnergyCalculator.squared_diff)
+EnergyCalculator.register(
+    "gradient_magnitude", EnergyCalculator.gradient_magnitude, stencil_radius=1
+)
+EnergyCalculator.register("sobel", EnergyCalculator.sobel, stencil_radius=1)
+EnergyCalculator.register("scharr", EnergyCalculator.scharr, stencil_radius=1)
+EnergyCalculator.register("laplacian", EnergyCalculator.laplacian, stencil_radius=1)
+EnergyCalculator.register(
+    "entropy", EnergyCalculator.entropy, stencil_radius=_ENTROPY_RADIUS
+)
+
+
+def update_energy(
+    energy_function: Callable[[np.ndarray], np.ndarray],
+    mat: np.ndarray,
+    energy_map: np.ndarray,
+    seam: np.ndarray,
+    strip_height: int = 32,
+    axis: int = 1,
+    mask: Optional[np.ndarray] = None,
+    mask_value: float = MASK_ENERGY,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Update an energy map in place after a seam has been removed from the image.
 
-        # Calculate the Laplacian of the image
-        e_b = np.abs(cv2.Laplacian(b, -1))
-        e_g = np.abs(cv2.Laplacian(g, -1))
-        e_r = np.abs(cv2.Laplacian(r, -1))
+    Both `mat` and `energy_map` must already have the seam removed. Only the band of
+    pixels around the seam whose stencil touched it is recalculated: through the
+    function's `band_function` if it has one, otherwise by calling the energy function
+    on small windows around the band. A mask is applied to the recalculated band
+    like `apply_mask` does to the whole map.
+
+    Args:
+        energy_function (Callable): The energy function, which must declare a stencil radius.
+        mat (np.ndarray): The image after removal of shape (h, w, 3).
+        energy_map (np.ndarray): The energy map after removal of shape (h, w).
+        seam (np.ndarray): The removed seam, in the coordinates before removal.
+        strip_height (int): The number of rows per window on the generic path, or
+            columns for a horizontal seam.
+        axis (int): 1 for a vertical seam, 0 for a horizontal seam.
+        mask (np.ndarray, optional): The keep/remove mask after removal of shape (h, w).
+        mask_value (float): The energy of the kept pixels, see `apply_mask`.
 
-        return np.divide(e_b + e_g + e_r, 3).astype(np.float32)
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The first and last recalculated column of every
+            row, or row of every column for a horizontal seam.
+    """
+    radius = stencil_radius(energy_function)
+    if radius is None:
+        raise ValueError("The energy function does not declare a `stencil_radius`.")
+
+    h, w = energy_map.shape
+    lo, hi = seam_band(seam, h if axis == 0 else w, radius)
+
+    band_function = getattr(energy_function, "band_function", None)
+    if band_function is not None:
+        band_function(mat, energy_map, lo, hi, axis)
+        if mask is not None:
+            _apply_mask_band(energy_map, mask, lo, hi, mask_value, axis)
+    else:
+        _update_energy_windows(
+            energy_function,
+            mat,
+            energy_map,
+            lo,
+            hi,
+            radius,
+            strip_height,
+            axis,
+            mask,
+            mask_value,
+        )
+
+    return lo, hi
+
+
+def _update_energy_windows(
+    energy_function: Callable[[np.ndarray], np.ndarray],
+    mat: np.ndarray,
+    energy_map: np.ndarray,
+    lo: np.ndarray,
+    hi: np.ndarray,
+    radius: int,
+    strip_height: int,
+    axis: int,
+    mask: Optional[np.ndarray],
+    mask_value: float,
+) -> None:
+    """
+    Recalculate a band of an energy map by calling the energy function on windows.
+    """
+    h, w = energy_map.shape
+
+    # Bands always run across the rows of the transposed views for a horizontal seam
+    if axis == 0:
+        mat, energy_map = mat.transpose(1, 0, 2), energy_map.T
+        mask = mask.T if mask is not None else None
+        h, w = w, h
+
+    for y0 in range(0, h, strip_height):
+        y1 = min(h, y0 + strip_height)
+        x0, x1 = lo[y0:y1].min(), hi[y0:y1].max() + 1
+        if x1 <= x0:
+            continue
+
+        # Pad the window with the stencil so the band is computed as in the full image
+        wy0, wy1 = max(0, y0 - radius), min(h, y1 + radius)
+        wx0, wx1 = max(0, x0 - radius), min(w, x1 + radius)
+        if axis == 0:
+            window = energy_function(mat[wy0:wy1, wx0:wx1].transpose(1, 0, 2)).T
+        else:
+            window = energy_function(mat[wy0:wy1, wx0:wx1])
+
+        energy_map[y0:y1, x0:x1] = window[y0 - wy0 : y1 - wy0, x0 - wx0 : x1 - wx0]
+        if mask is not None:
+            apply_mask(energy_map[y0:y1, x0:x1], mask[y0:y1, x0:x1], mask_value)
+
+
+@numba.njit(cache=True)
+def apply_mask(
+    energy_map: np.ndarray, mask: np.ndarray, value: float = MASK_ENERGY
+) -> None:
+    """
+    Apply a keep/remove mask to an energy map in place.
+
+    Pixels with a positive mask value are kept by raising their energy to `value`, so
+    seams avoid them. Pixels with a negative mask value are removed first by lowering
+    their energy to `-value`, so seams go through them.
+
+    Args:
+        energy_map (np.ndarray): The energy map of shape (h, w) to update.
+        mask (np.ndarray): The mask of shape (h, w).
+        value (float): The energy of the kept pixels, `MASK_ENERGY` by default.
+    """
+    for y in range(energy_map.shape[0]):
+        for x in range(energy_map.shape[1]):
+            if mask[y, x] > 0:
+                energy_map[y, x] = value
+            elif mask[y, x] < 0:
+                energy_map[y, x] = -value
+
+
+@numba.njit(cache=True)
+def _apply_mask_band(
+    energy_map: np.ndarray,
+    mask: np.ndarray,
+    lo: np.ndarray,
+    hi: np.ndarray,
+    value: float,
+    axis: int,
+) -> None:
+    if axis == 0:
+        for x in range(energy_map.shape[1]):
+            for y in range(lo[x], hi[x] + 1):
+                if mask[y, x] > 0:
+                    energy_map[y, x] = value
+                elif mask[y, x] < 0:
+                    energy_map[y, x] = -value
+        return
+
+    for y in range(energy_map.shape[0]):
+        for x in range(lo[y], hi[y] + 1):
+            if mask[y, x] > 0:
+                energy_map[y, x] = value
+            elif mask[y, x] < 0:
+                energy_map[y, x] = -value
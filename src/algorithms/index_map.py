@@ -0,0 +1,201 @@
+import zipfile
+
+import numba
+import numpy as np
+
+from src.algorithms.carving import insert_seams
+
+
+@numba.njit(cache=True)
+def _record_seam(
+    order: np.ndarray, positions: np.ndarray, seam: np.ndarray, index: int, axis: int
+) -> None:
+    if axis == 0:
+        for x in range(len(seam)):
+            order[positions[seam[x], x], x] = index
+        return
+
+    for y in range(len(seam)):
+        order[y, positions[y, seam[y]]] = index
+
+
+def _memmap_member(path: str, name: str) -> np.memmap:
+    """
+    Memory-map an array stored uncompressed in a .npz file, read-only.
+    """
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(name)
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError(f"Cannot memory-map the compressed '{name}' of '{path}'")
+
+    with open(path, "rb") as f:
+        # The member's data follows its local header, whose extra field can differ
+        # from the one in the central directory
+        f.seek(info.header_offset + 26)
+        name_length, extra_length = np.frombuffer(f.read(4), dtype="<u2")
+        f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+
+        if np.lib.format.read_magic(f) == (1, 0):
+            header = np.lib.format.read_array_header_1_0(f)
+        else:
+            header = np.lib.format.read_array_header_2_0(f)
+        shape, fortran_order, dtype = header
+        offset = f.tell()
+
+    return np.memmap(
+        path,
+        dtype=dtype,
+        mode="r",
+        shape=shape,
+        order="F" if fortran_order else "C",
+        offset=offset,
+    )
+
+
+class SeamIndexMap(object):
+    """
+    Multi-size representation of an image, recording the removal order of every pixel.
+
+    Pixels removed by the k-th vertical seam are marked with k, and pixels that survive
+    all `num_seams` precomputed seams with `num_seams`. Reducing the width by `n` seams
+    then keeps exactly the pixels marked with at least `n`, in their original order.
+    With `axis` 0, the same holds for horizontal seams and the height.
+    """
+
+    def __init__(self, order: np.ndarray, axis: int = 1):
+        assert len(order.shape) == 2, "The index map must be a 2D matrix."
+        assert axis in (0, 1), "The axis must be 0 or 1."
+
+        self._order = order
+        self._axis = axis
+        self._num_seams = int(order.max()) if order.size else 0
+
+    @classmethod
+    def empty(
+        cls, height: int, width: int, num_seams: int, axis: int = 1
+    ) -> "SeamIndexMap":
+        """
+        Create an index map where no seam is recorded yet.
+
+        Args:
+            height (int): The height of the image.
+            width (int): The width of the image.
+            num_seams (int): The number of seams that will be recorded.
+            axis (int): 1 for vertical seams, 0 for horizontal seams.
+
+        Returns:
+            SeamIndexMap: The index map.
+        """
+        size = (height, width)[axis]
+        if not 0 <= num_seams < size:
+            raise ValueError(
+                f"Expected: 0 <= `num_seams` < {size}, but got: {num_seams}"
+            )
+
+        dtype = np.uint16 if num_seams <= np.iinfo(np.uint16).max else np.uint32
+        return cls(np.full((height, width), num_seams, dtype=dtype), axis)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False) -> "SeamIndexMap":
+        """
+        Load an index map saved with `save`, with the axis it was recorded for.
+
+        Args:
+            path (str): The path to the .npz file.
+            mmap (bool): Whether to memory-map the removal order read-only instead of
+                reading it.
+
+        Returns:
+            SeamIndexMap: The index map.
+        """
+        with np.load(path) as data:
+            axis = int(data["axis"])
+            order = _memmap_member(path, "order.npy") if mmap else data["order"]
+        return cls(order, axis)
+
+    def save(self, path: str):
+        """
+        Save the removal order and the axis to an uncompressed .npz file, which
+        `load` can memory-map. Like `np.savez`, appends ".npz" to `path` if missing.
+        """
+        np.savez(path, order=self._order, axis=np.int8(self._axis))
+
+    @property
+    def order(self) -> np.ndarray:
+        return self._order
+
+    @property
+    def axis(self) -> int:
+        return self._axis
+
+    @property
+    def num_seams(self) -> int:
+        return self._num_seams
+
+    @property
+    def shape(self) -> tuple:
+        return self._order.shape
+
+    def record_seam(self, positions: np.ndarray, seam: np.ndarray, index: int):
+        """
+        Mark the pixels of a removed seam with its index.
+
+        Args:
+            positions (np.ndarray): The original column of every pixel of the current
+                image, or its original row for horizontal seams.
+            seam (np.ndarray): The seam in the coordinates of the current image.
+            index (int): The index of the seam in the removal order.
+        """
+        _record_seam(self._order, positions, seam, index, self._axis)
+
+    def _validate(self, mat: np.ndarray, num_seams: int):
+        h, w = self._order.shape
+        if mat.shape[:2] != (h, w):
+            raise ValueError(
+                f"Expected an image of shape {(h, w)}, but got: {mat.shape[:2]}"
+            )
+
+        if not 0 <= num_seams <= self._num_seams:
+            raise ValueError(
+                f"Expected: 0 <= `num_seams` <= {self._num_seams}, but got: {num_seams}"
+            )
+
+    def carve(self, mat: np.ndarray, num_seams: int) -> np.ndarray:
+        """
+        Remove the first `num_seams` seams from the original image in a single gather.
+
+        Args:
+            mat (np.ndarray): The original image of shape (h, w, c).
+            num_seams (int): The number of seams to remove, at most `self.num_seams`.
+
+        Returns:
+            np.ndarray: The carved image of shape (h, w - num_seams, c), or
+                (h - num_seams, w, c) for horizontal seams.
+        """
+        self._validate(mat, num_seams)
+
+        h, w = self._order.shape
+        keep = self._order >= num_seams
+        if self._axis == 0:
+            # Gather column by column so every column keeps its pixels in order
+            carved = mat.swapaxes(0, 1)[keep.T]
+            carved = carved.reshape((w, h - num_seams) + mat.shape[2:])
+            return np.ascontiguousarray(carved.swapaxes(0, 1))
+
+        return mat[keep].reshape((h, w - num_seams) + mat.shape[2:])
+
+    def enlarge(self, mat: np.ndarray, num_seams: int) -> np.ndarray:
+        """
+        Duplicate the first `num_seams` seams of the original image in a single pass.
+
+        Args:
+            mat (np.ndarray): The original image of shape (h, w, c).
+            num_seams (int): The number of seams to add, at most `self.num_seams`.
+
+        Returns:
+            np.ndarray: The enlarged image of shape (h, w + num_seams, c), or
+                (h + num_seams, w, c) for horizontal seams.
+        """
+        self._validate(mat, num_seams)
+
+        return insert_seams(mat, self._order < num_seams, num_seams, self._axis)
@@ -1,15 +1,33 @@
+from typing import Optional
+
 import numba
 import numpy as np
 
+from src.algorithms.carving import CarvingBuffer
+from src.algorithms.energy import (
+    _intensity_row,
+    _squared_diff_row,
+    intensity_map,
+    seam_band,
+)
+
+# Number of columns the horizontal seam kernels gather at once, so that every cache line
+# of a row is read once per block instead of once per column
+_COLUMN_BLOCK = 16
+
 
 class SeamFinder(object):
 
     @staticmethod
-    @numba.njit
+    @numba.njit(cache=True)
     def find_seam(energy_map: np.ndarray) -> np.ndarray:
         """
         Find the seam with the lowest energy in an image.
 
+        Only two rows of the cumulative energy map are kept; the path is recorded as
+        one int8 backpointer per pixel during the forward pass and followed back from
+        the cheapest pixel of the last row.
+
         Args:
             energy_map (np.ndarray): The energy map of the image of shape (h, w).
 
@@ -20,66 +38,989 @@ class SeamFinder(object):
 
         h, w = energy_map.shape
 
-        # Build the cumulative energy map
-        cumulative_energy_map = np.zeros_like(energy_map)
-        cumulative_energy_map[0] = energy_map[0]  # Initial value
-        preceding = np.zeros(3)
+        backtrack = np.zeros((h, w), dtype=np.int8)
+        previous = energy_map[0].copy()
+        current = np.empty_like(previous)
+        for y in range(1, h):
+            accumulate_row(energy_map[y], previous, current, backtrack[y])
+            previous, current = current, previous
+
+        return backtrack_seam(previous, backtrack)
+
+    @staticmethod
+    @numba.njit(cache=True)
+    def find_seam_uint16(energy_map: np.ndarray) -> np.ndarray:
+        """
+        `find_seam` for a uint16 energy map, with uint32 cumulative rows and saturating
+        sums. Pair it with `EnergyCalculator.squared_diff_uint16`, or an energy function
+        quantized by `quantize_energy`.
+
+        The energy map and the cumulative rows take half the memory of the float32
+        ones, and the sums are exact, so ties are broken the same way on every
+        platform. Sums saturate at the uint32 maximum, which the default fixed-point
+        scale only reaches in images over 65000 rows high.
+
+        The seam is the cheapest one of the quantized energy. It can differ from the
+        seam `find_seam` picks on the float energy when seams are within the rounding
+        error of each other, and carving several seams then diverges from there on.
+
+        Args:
+            energy_map (np.ndarray): The uint16 energy map of the image of shape (h, w).
+
+        Returns:
+            np.ndarray: The seam with the lowest energy of shape (h,).
+        """
+        assert len(energy_map.shape) == 2, "The input energy map must be a 2D matrix."
+
+        h, w = energy_map.shape
+
+        backtrack = np.zeros((h, w), dtype=np.int8)
+        previous = energy_map[0].astype(np.uint32)
+        current = np.empty_like(previous)
+        for y in range(1, h):
+            _accumulate_row_saturating(energy_map[y], previous, current, backtrack[y])
+            previous, current = current, previous
+
+        return backtrack_seam(previous, backtrack)
+
+    @staticmethod
+    @numba.njit(cache=True)
+    def find_seam_squared_diff(mat: np.ndarray) -> np.ndarray:
+        """
+        Find the seam with the lowest `EnergyCalculator.squared_diff` energy in an image.
+
+        The energy is calculated row by row inside the same sweep as the cumulative
+        energy, from a ring of three intensity rows, so the energy map is never
+        materialized.
+
+        Args:
+            mat (np.ndarray): The image of shape (h, w, 3).
+
+        Returns:
+            np.ndarray: The same seam as `find_seam(EnergyCalculator.squared_diff(mat))`.
+        """
+        assert len(mat.shape) == 3, "The input image must be a 3D matrix."
+
+        h, w, _ = mat.shape
+
+        intensity = np.empty((3, w), dtype=np.float32)
+        _intensity_row(mat, 0, intensity[0])
+        _intensity_row(mat, 1, intensity[1])
+
+        energy_row = np.empty(w, dtype=np.float32)
+        backtrack = np.zeros((h, w), dtype=np.int8)
+        previous = np.empty(w, dtype=np.float32)
+        current = np.empty(w, dtype=np.float32)
+
+        _squared_diff_row(intensity[1], intensity[0], intensity[1], 0, h, previous)
+        for y in range(1, h):
+            if y + 1 < h:
+                _intensity_row(mat, y + 1, intensity[(y + 1) % 3])
+
+            above = intensity[(y - 1) % 3]
+            row = intensity[y % 3]
+            below = intensity[(y + 1) % 3] if y + 1 < h else row
+            _squared_diff_row(above, row, below, y, h, energy_row)
+
+            accumulate_row(energy_row, previous, current, backtrack[y])
+            previous, current = current, previous
+
+        return backtrack_seam(previous, backtrack)
+
+    @staticmethod
+    @numba.njit(cache=True)
+    def find_seam_forward(mat: np.ndarray) -> np.ndarray:
+        """
+        Find the seam that inserts the least energy into the image (forward energy).
+
+        Instead of the energy of the removed pixels, the cost of a seam is the intensity
+        difference between the pixels that become neighbours once it is removed. The
+        costs are calculated inside the cumulative energy sweep from a ring of three
+        intensity rows, so no energy map is allocated.
+
+        Args:
+            mat (np.ndarray): The image of shape (h, w, 3).
+
+        Returns:
+            np.ndarray: The seam with the lowest forward energy of shape (h,).
+        """
+        assert len(mat.shape) == 3, "The input image must be a 3D matrix."
+
+        h, w, _ = mat.shape
+
+        intensity = np.empty((2, w), dtype=np.float32)
+        _intensity_row(mat, 0, intensity[0])
+
+        backtrack = np.zeros((h, w), dtype=np.int8)
+        previous = np.empty(w, dtype=np.float32)
+        current = np.empty(w, dtype=np.float32)
+
+        _first_row_forward(intensity[0], previous)
         for y in range(1, h):
-            for x in range(w):
-                self = energy_map[y, x]
+            above, row = intensity[(y - 1) % 2], intensity[y % 2]
+            _intensity_row(mat, y, row)
+
+            _accumulate_row_forward(above, row, previous, current, backtrack[y])
+            previous, current = current, previous
+
+        return backtrack_seam(previous, backtrack)
+
+    @staticmethod
+    @numba.njit(parallel=True, cache=True)
+    def find_seam_forward_parallel(mat: np.ndarray) -> np.ndarray:
+        """
+        Multi-threaded `find_seam_forward`, parallelized over the columns of every row.
+
+        Args:
+            mat (np.ndarray): The image of shape (h, w, 3).
+
+        Returns:
+            np.ndarray: The same seam as `find_seam_forward` of shape (h,).
+        """
+        assert len(mat.shape) == 3, "The input image must be a 3D matrix."
+
+        h, w, _ = mat.shape
+
+        intensity = np.empty((2, w), dtype=np.float32)
+        _intensity_row(mat, 0, intensity[0])
+
+        backtrack = np.zeros((h, w), dtype=np.int8)
+        previous = np.empty(w, dtype=np.float32)
+        current = np.empty(w, dtype=np.float32)
+
+        _first_row_forward(intensity[0], previous)
+        for y in range(1, h):
+            above, row = intensity[(y - 1) % 2], intensity[y % 2]
+            for x in numba.prange(w):
+                b, g, r = mat[y, x]
+                row[x] = 0.299 * r + 0.587 * g + 0.114 * b
+
+            for x in numba.prange(w):
+                best, offset = _relax_forward(above, row, previous, x)
+                current[x] = best
+                backtrack[y, x] = offset
+            previous, current = current, previous
+
+        return backtrack_seam(previous, backtrack)
+
+    @staticmethod
+    @numba.njit(cache=True)
+    def find_seams(
+        energy_map: np.ndarray, num_seams: int, max_cost_ratio: float = np.inf
+    ) -> np.ndarray:
+        """
+        Find up to `num_seams` disjoint, non-crossing low-energy seams in one pass.
+
+        The seams are traced back from the cheapest cells of the last row of a single
+        cumulative energy map. When a seam runs into one found before, it is rerouted
+        through the cheapest free parent that does not cross it, or dropped if there is
+        none. This is an approximation: apart from the first one, the seams are not the
+        ones that sequential carving would find.
+
+        Args:
+            energy_map (np.ndarray): The energy map of the image of shape (h, w).
+            num_seams (int): The maximum number of seams to find.
+            max_cost_ratio (float): Only accept seams whose energy is at most this many
+                times the energy of the cheapest seam. Lower values trade speed for
+                quality, as fewer seams are removed per pass. The tolerance is taken
+                on the magnitude of the cheapest energy, so a negative one, e.g. through
+                pixels a mask removes, also bounds the seams from above.
+
+        Returns:
+            np.ndarray: The seams of shape (n, h), with 1 <= n <= num_seams.
+        """
+        assert len(energy_map.shape) == 2, "The input energy map must be a 2D matrix."
+
+        h, w = energy_map.shape
+
+        cumulative_energy_map = np.empty_like(energy_map)
+        backtrack = np.zeros((h, w), dtype=np.int8)
+        _build_cumulative_energy(energy_map, cumulative_energy_map, backtrack)
+
+        # Index of the seam occupying every pixel, or -1
+        owner = np.full((h, w), -1, dtype=np.int32)
+        seams = np.empty((min(num_seams, w), h), dtype=np.int32)
+        seam = np.empty(h, dtype=np.int32)
+
+        n = 0
+        max_cost = np.inf
+        for end in np.argsort(cumulative_energy_map[-1], kind="mergesort"):
+            if n == len(seams) or cumulative_energy_map[-1, end] > max_cost:
+                break
+            if owner[-1, end] >= 0:
+                continue
+
+            seam[-1] = end
+            cost = np.float64(energy_map[-1, end])
+            complete = True
+            for y in range(h - 1, 0, -1):
+                x = seam[y]
+                preferred = np.int64(backtrack[y, x])
+                parent = -1
+                for offset in (preferred, -1, 0, 1):
+                    candidate = x + offset
+                    if candidate < 0 or candidate >= w or owner[y - 1, candidate] >= 0:
+                        continue
+                    # Disjoint seams can still cross diagonally
+                    if offset != 0 and owner[y, candidate] >= 0:
+                        if owner[y, candidate] == owner[y - 1, x]:
+                            continue
+                    if parent < 0 or (
+                        cumulative_energy_map[y - 1, candidate]
+                        < cumulative_energy_map[y - 1, parent]
+                    ):
+                        parent = candidate
+                    if offset == preferred:
+                        break
+                if parent < 0:
+                    complete = False
+                    break
+                seam[y - 1] = parent
+                cost += energy_map[y - 1, parent]
+
+            if not complete:
+                continue
+            if n == 0:
+                max_cost = (
+                    cost + (max_cost_ratio - 1) * np.abs(cost)
+                    if max_cost_ratio < np.inf
+                    else np.inf
+                )
+            elif cost > max_cost:
+                continue
+
+            for y in range(h):
+                owner[y, seam[y]] = n
+            seams[n] = seam
+            n += 1
+
+        return seams[:n]
+
+    @staticmethod
+    @numba.njit(cache=True)
+    def find_seam_banded(
+        energy_map: np.ndarray, center: np.ndarray, radius: int
+    ) -> np.ndarray:
+        """
+        Find the seam with the lowest energy within a band around a path.
+
+        The cumulative energy is only calculated for the `2 * radius + 1` columns around
+        `center` in every row, so the cost is proportional to the band, not the width.
+
+        Args:
+            energy_map (np.ndarray): The energy map of the image of shape (h, w).
+            center (np.ndarray): The column of the band center in every row of shape (h,).
+            radius (int): The number of columns on each side of the center.
+
+        Returns:
+            np.ndarray: The seam with the lowest energy inside the band of shape (h,), or
+                an empty array if no seam fits in the band.
+        """
+        assert len(energy_map.shape) == 2, "The input energy map must be a 2D matrix."
+
+        h, w = energy_map.shape
+        size = min(2 * radius + 1, w)
+
+        # First column of the band in every row, shifted to keep the band in the image
+        lo = np.empty(h, dtype=np.int64)
+        for y in range(h):
+            lo[y] = min(max(center[y] - radius, 0), w - size)
+
+        cumulative_energy_map = np.full((h, size), np.inf, dtype=energy_map.dtype)
+        backtrack = np.zeros((h, size), dtype=np.int8)
+
+        cumulative_energy_map[0] = energy_map[0, lo[0] : lo[0] + size]
+        for y in range(1, h):
+            for i in range(size):
+                x = lo[y] + i
+                best, offset = np.inf, 0
+                for d in (-1, 0, 1):
+                    j = x + d - lo[y - 1]
+                    # Strictly lower, so that ties go to the left-most parent
+                    if 0 <= j < size and cumulative_energy_map[y - 1, j] < best:
+                        best, offset = cumulative_energy_map[y - 1, j], d
+                if best < np.inf:
+                    cumulative_energy_map[y, i] = energy_map[y, x] + np.float64(best)
+                    backtrack[y, i] = offset
+
+        end = np.argmin(cumulative_energy_map[-1])
+        if cumulative_energy_map[-1, end] == np.inf:
+            return np.empty(0, dtype=np.int32)
+
+        seam = np.empty(h, dtype=np.int32)
+        seam[-1] = lo[-1] + end
+        for y in range(h - 2, -1, -1):
+            seam[y] = seam[y + 1] + backtrack[y + 1, seam[y + 1] - lo[y + 1]]
+
+        return seam
+
+    @staticmethod
+    @numba.njit(parallel=True, cache=True)
+    def find_seam_parallel(energy_map: np.ndarray) -> np.ndarray:
+        """
+        Multi-threaded `find_seam`, parallelized over the columns of every row.
+
+        Args:
+            energy_map (np.ndarray): The energy map of the image of shape (h, w).
+
+        Returns:
+            np.ndarray: The same seam as `find_seam` of shape (h,).
+        """
+        assert len(energy_map.shape) == 2, "The input energy map must be a 2D matrix."
+
+        cumulative_energy_map = np.empty_like(energy_map)
+        backtrack = np.zeros(energy_map.shape, dtype=np.int8)
+        _build_cumulative_energy_parallel(
+            energy_map, None, cumulative_energy_map, backtrack
+        )
+
+        return backtrack_seam(cumulative_energy_map[-1], backtrack)
+
+    @staticmethod
+    @numba.njit(cache=True)
+    def find_horizontal_seam(energy_map: np.ndarray) -> np.ndarray:
+        """
+        Find the horizontal seam with the lowest energy in an image.
+
+        Same as `find_seam` on the transposed energy map, sweeping the columns from left
+        to right. The columns are gathered into small contiguous blocks while reading
+        the energy map row by row, so nothing is transposed.
+
+        Args:
+            energy_map (np.ndarray): The energy map of the image of shape (h, w).
+
+        Returns:
+            np.ndarray: The row of the seam in every column, of shape (w,).
+        """
+        assert len(energy_map.shape) == 2, "The input energy map must be a 2D matrix."
+
+        h, w = energy_map.shape
+
+        columns = np.empty((_COLUMN_BLOCK, h), dtype=energy_map.dtype)
+        backtrack = np.zeros((w, h), dtype=np.int8)
+        previous = np.empty(h, dtype=energy_map.dtype)
+        current = np.empty_like(previous)
+        for x0 in range(0, w, _COLUMN_BLOCK):
+            x1 = min(w, x0 + _COLUMN_BLOCK)
+            _gather_columns(energy_map, x0, x1, columns)
+
+            for x in range(x0, x1):
+                if x == 0:
+                    previous[:] = columns[0]
+                    continue
+
+                accumulate_row(columns[x - x0], previous, current, backtrack[x])
+                previous, current = current, previous
+
+        return backtrack_seam(previous, backtrack)
 
-                # Previous row (cumulated)
-                left = cumulative_energy_map[y - 1, x - 1] if x - 1 >= 0 else np.inf
-                middle = cumulative_energy_map[y - 1, x]
-                right = cumulative_energy_map[y - 1, x + 1] if x + 1 < w else np.inf
+    @staticmethod
+    @numba.njit(cache=True)
+    def find_horizontal_seam_forward(mat: np.ndarray) -> np.ndarray:
+        """
+        Find the horizontal seam that inserts the least energy into the image.
+
+        Same as `find_seam_forward` on the transposed image, with the intensity of the
+        columns calculated in small blocks like in `find_horizontal_seam`.
+
+        Args:
+            mat (np.ndarray): The image of shape (h, w, 3).
+
+        Returns:
+            np.ndarray: The row of the seam in every column, of shape (w,).
+        """
+        assert len(mat.shape) == 3, "The input image must be a 3D matrix."
+
+        h, w, _ = mat.shape
+
+        intensity = np.empty((_COLUMN_BLOCK, h), dtype=np.float32)
+        above = np.empty(h, dtype=np.float32)
+        backtrack = np.zeros((w, h), dtype=np.int8)
+        previous = np.empty(h, dtype=np.float32)
+        current = np.empty(h, dtype=np.float32)
+        for x0 in range(0, w, _COLUMN_BLOCK):
+            x1 = min(w, x0 + _COLUMN_BLOCK)
+            _intensity_columns(mat, x0, x1, intensity)
+
+            for x in range(x0, x1):
+                column = intensity[x - x0]
+                if x == 0:
+                    _first_row_forward(column, previous)
+                else:
+                    _accumulate_row_forward(
+                        above, column, previous, current, backtrack[x]
+                    )
+                    previous, current = current, previous
+                above[:] = column
+
+        return backtrack_seam(previous, backtrack)
+
+
+@numba.njit(cache=True)
+def _gather_columns(mat: np.ndarray, x0: int, x1: int, out: np.ndarray) -> None:
+    for y in range(mat.shape[0]):
+        for x in range(x0, x1):
+            out[x - x0, y] = mat[y, x]
+
+
+@numba.njit(cache=True)
+def _intensity_columns(mat: np.ndarray, x0: int, x1: int, out: np.ndarray) -> None:
+    for y in range(mat.shape[0]):
+        for x in range(x0, x1):
+            b, g, r = mat[y, x]
+            out[x - x0, y] = 0.299 * r + 0.587 * g + 0.114 * b
+
+
+@numba.njit(cache=True)
+def _relax(cumulative_energy_map: np.ndarray, y: int, x: int):
+    """
+    Find the cheapest of the three cells above a cell, preferring the left-most on ties.
+
+    Returns:
+        Tuple[float, int]: The cumulative energy of the cell above and its column offset.
+    """
+    w = cumulative_energy_map.shape[1]
+
+    best = cumulative_energy_map[y - 1, x]
+    offset = 0
+    if x - 1 >= 0 and cumulative_energy_map[y - 1, x - 1] <= best:
+        best = cumulative_energy_map[y - 1, x - 1]
+        offset = -1
+    if x + 1 < w and cumulative_energy_map[y - 1, x + 1] < best:
+        best = cumulative_energy_map[y - 1, x + 1]
+        offset = 1
+
+    return best, offset
+
+
+@numba.njit(cache=True)
+def accumulate_row(
+    energy_row: np.ndarray,
+    previous: np.ndarray,
+    current: np.ndarray,
+    backtrack_row: np.ndarray,
+) -> None:
+    """
+    Calculate one row of the cumulative energy map and its backpointers.
+
+    Same as `_relax` for every cell, with the borders peeled off so that the inner
+    loop compares three parents without bounds checks. Together with `backtrack_seam`,
+    the building block of seam searches that keep only two cumulative rows, e.g. out
+    of core.
+
+    Args:
+        energy_row (np.ndarray): The energy of the row of shape (w,).
+        previous (np.ndarray): The cumulative energy of the row above of shape (w,).
+        current (np.ndarray): The cumulative energy of the row to write, of shape (w,).
+        backtrack_row (np.ndarray): The int8 column offsets of the cheapest parents to
+            write, of shape (w,).
+    """
+    w = len(energy_row)
+
+    if w == 1:
+        current[0] = energy_row[0] + np.float64(previous[0])
+        backtrack_row[0] = 0
+        return
+
+    # Left border, without a left parent
+    best, offset = previous[0], 0
+    if previous[1] < best:
+        best, offset = previous[1], 1
+    current[0] = energy_row[0] + np.float64(best)
+    backtrack_row[0] = offset
+
+    for x in range(1, w - 1):
+        best, offset = previous[x], 0
+        if previous[x - 1] <= best:
+            best, offset = previous[x - 1], -1
+        if previous[x + 1] < best:
+            best, offset = previous[x + 1], 1
+        current[x] = energy_row[x] + np.float64(best)
+        backtrack_row[x] = offset
+
+    # Right border, without a right parent
+    best, offset = previous[w - 1], 0
+    if previous[w - 2] <= best:
+        best, offset = previous[w - 2], -1
+    current[w - 1] = energy_row[w - 1] + np.float64(best)
+    backtrack_row[w - 1] = offset
+
+
+@numba.njit(cache=True)
+def _saturating_add(energy: np.uint16, cumulative: np.uint32) -> np.uint32:
+    return np.uint32(min(np.uint64(energy) + np.uint64(cumulative), 0xFFFFFFFF))
+
+
+@numba.njit(cache=True)
+def _accumulate_row_saturating(
+    energy_row: np.ndarray,
+    previous: np.ndarray,
+    current: np.ndarray,
+    backtrack_row: np.ndarray,
+) -> None:
+    """
+    `accumulate_row` for uint32 cumulative rows, with saturating sums.
+    """
+    w = len(energy_row)
+
+    if w == 1:
+        current[0] = _saturating_add(energy_row[0], previous[0])
+        backtrack_row[0] = 0
+        return
+
+    best, offset = previous[0], 0
+    if previous[1] < best:
+        best, offset = previous[1], 1
+    current[0] = _saturating_add(energy_row[0], best)
+    backtrack_row[0] = offset
+
+    for x in range(1, w - 1):
+        best, offset = previous[x], 0
+        if previous[x - 1] <= best:
+            best, offset = previous[x - 1], -1
+        if previous[x + 1] < best:
+            best, offset = previous[x + 1], 1
+        current[x] = _saturating_add(energy_row[x], best)
+        backtrack_row[x] = offset
+
+    best, offset = previous[w - 1], 0
+    if previous[w - 2] <= best:
+        best, offset = previous[w - 2], -1
+    current[w - 1] = _saturating_add(energy_row[w - 1], best)
+    backtrack_row[w - 1] = offset
+
+
+@numba.njit(cache=True)
+def _forward_costs(above: np.ndarray, row: np.ndarray, x: int):
+    """
+    Calculate the forward energy of reaching a cell from its left, upper and right
+    parent.
+
+    Out-of-image neighbours are replaced by the cell itself.
+    """
+    w = len(row)
+
+    left = row[x - 1] if x - 1 >= 0 else row[x]
+    right = row[x + 1] if x + 1 < w else row[x]
+    up = above[x]
+
+    cost_up = np.abs(right - left)
+    return cost_up + np.abs(up - left), cost_up, cost_up + np.abs(up - right)
+
+
+@numba.njit(cache=True)
+def _relax_forward(above: np.ndarray, row: np.ndarray, previous: np.ndarray, x: int):
+    """
+    Same as `_relax`, including the forward energy of every transition.
+
+    Returns:
+        Tuple[float, int]: The cumulative energy of the cell and its column offset.
+    """
+    w = len(row)
+    cost_left, cost_up, cost_right = _forward_costs(above, row, x)
+
+    best = previous[x] + cost_up
+    offset = 0
+    if x - 1 >= 0 and previous[x - 1] + cost_left <= best:
+        best = previous[x - 1] + cost_left
+        offset = -1
+    if x + 1 < w and previous[x + 1] + cost_right < best:
+        best = previous[x + 1] + cost_right
+        offset = 1
+
+    return best, offset
+
+
+@numba.njit(cache=True)
+def _first_row_forward_cost(row: np.ndarray, x: int) -> float:
+    w = len(row)
+
+    left = row[x - 1] if x - 1 >= 0 else row[x]
+    right = row[x + 1] if x + 1 < w else row[x]
+    return np.abs(right - left)
+
+
+@numba.njit(cache=True)
+def _first_row_forward(row: np.ndarray, current: np.ndarray) -> None:
+    for x in range(len(row)):
+        current[x] = _first_row_forward_cost(row, x)
+
+
+@numba.njit(cache=True)
+def _accumulate_row_forward(
+    above: np.ndarray,
+    row: np.ndarray,
+    previous: np.ndarray,
+    current: np.ndarray,
+    backtrack_row: np.ndarray,
+) -> None:
+    """
+    Same as `_relax_forward` for every cell, with the borders peeled off.
+    """
+    w = len(row)
+
+    for x in (0, w - 1):
+        best, offset = _relax_forward(above, row, previous, x)
+        current[x] = best
+        backtrack_row[x] = offset
 
-                preceding[0] = left
-                preceding[1] = middle
-                preceding[2] = right
-                # The energy of the current pixel is the sum of its own energy and the minimum of the
-                # three possible paths from the previous row to the current pixel.
-                cumulative_energy_map[y, x] = self + np.min(preceding)
+    for x in range(1, w - 1):
+        left, right, up = row[x - 1], row[x + 1], above[x]
 
-        # Find the seam with the lowest energy
-        seam = np.zeros(h, dtype=np.int32)
-        # The last pixel of the seam is the one with the lowest energy in the last row
-        seam[-1] = np.argmin(cumulative_energy_map[-1])
+        cost_up = np.abs(right - left)
+        best, offset = previous[x] + cost_up, 0
 
-        # y \in [h - 2, 0]
-        for y in range(h - 2, -1, -1):  # From the second last row to the first row
-            x = seam[y + 1]
-            left = cumulative_energy_map[y, x - 1] if x - 1 >= 0 else np.inf
-            middle = cumulative_energy_map[y, x]
-            right = cumulative_energy_map[y, x + 1] if x + 1 < w else np.inf
+        cost_left = cost_up + np.abs(up - left)
+        if previous[x - 1] + cost_left <= best:
+            best, offset = previous[x - 1] + cost_left, -1
 
-            preceding[0] = left
-            preceding[1] = middle
-            preceding[2] = right
-            seam[y] = x + np.argmin(preceding) - 1
-            # assert 0 <= seam[y] < w, f"The seam must be within the image boundaries. ({y=})"
+        cost_right = cost_up + np.abs(up - right)
+        if previous[x + 1] + cost_right < best:
+            best, offset = previous[x + 1] + cost_right, 1
 
-        return seam.astype(np.int32)
+        current[x] = best
+        backtrack_row[x] = offset
 
 
-def draw_seam(mat: np.ndarray, seam: np.ndarray) -> np.ndarray:
+@numba.njit(cache=True)
+def _relax_cell(
+    energy_map: Optional[np.ndarray],
+    intensity: Optional[np.ndarray],
+    cumulative_energy_map: np.ndarray,
+    y: int,
+    x: int,
+):
+    """
+    Calculate the cumulative energy of a cell, from the backward energy map, the
+    forward energy of the intensity map, or both.
+    """
+    if intensity is None:
+        best, offset = _relax(cumulative_energy_map, y, x)
+    else:
+        best, offset = _relax_forward(
+            intensity[y - 1], intensity[y], cumulative_energy_map[y - 1], x
+        )
+
+    if energy_map is not None:
+        return energy_map[y, x] + np.float64(best), offset
+    return best, offset
+
+
+@numba.njit(cache=True)
+def _build_cumulative_energy(
+    energy_map: np.ndarray, cumulative_energy_map: np.ndarray, backtrack: np.ndarray
+) -> None:
+    h = energy_map.shape[0]
+
+    cumulative_energy_map[0] = energy_map[0]
+    for y in range(1, h):
+        accumulate_row(
+            energy_map[y],
+            cumulative_energy_map[y - 1],
+            cumulative_energy_map[y],
+            backtrack[y],
+        )
+
+
+@numba.njit(cache=True)
+def _build_cumulative_forward_energy(
+    intensity: np.ndarray, cumulative_energy_map: np.ndarray, backtrack: np.ndarray
+) -> None:
+    h = intensity.shape[0]
+
+    _first_row_forward(intensity[0], cumulative_energy_map[0])
+    for y in range(1, h):
+        _accumulate_row_forward(
+            intensity[y - 1],
+            intensity[y],
+            cumulative_energy_map[y - 1],
+            cumulative_energy_map[y],
+            backtrack[y],
+        )
+
+
+@numba.njit(cache=True)
+def _first_row(
+    energy_map: Optional[np.ndarray],
+    intensity: Optional[np.ndarray],
+    current: np.ndarray,
+) -> None:
+    if intensity is not None:
+        _first_row_forward(intensity[0], current)
+        if energy_map is not None:
+            for x in range(len(current)):
+                current[x] = energy_map[0, x] + np.float64(current[x])
+    elif energy_map is not None:
+        current[:] = energy_map[0]
+
+
+@numba.njit(parallel=True, cache=True)
+def _build_cumulative_energy_parallel(
+    energy_map: Optional[np.ndarray],
+    intensity: Optional[np.ndarray],
+    cumulative_energy_map: np.ndarray,
+    backtrack: np.ndarray,
+) -> None:
+    h = cumulative_energy_map.shape[0]
+
+    _first_row(energy_map, intensity, cumulative_energy_map[0])
+    for y in range(1, h):
+        for x in numba.prange(cumulative_energy_map.shape[1]):
+            best, offset = _relax_cell(
+                energy_map, intensity, cumulative_energy_map, y, x
+            )
+            cumulative_energy_map[y, x] = best
+            backtrack[y, x] = offset
+
+
+@numba.njit(cache=True)
+def _update_cumulative_energy(
+    energy_map: Optional[np.ndarray],
+    intensity: Optional[np.ndarray],
+    cumulative_energy_map: np.ndarray,
+    backtrack: np.ndarray,
+    seam: np.ndarray,
+    lo: np.ndarray,
+    hi: np.ndarray,
+) -> None:
+    h, w = cumulative_energy_map.shape
+
+    # The forward energy of the first row changes next to the seam
+    start, stop = lo[0], hi[0]
+    if intensity is not None:
+        start, stop = min(start, seam[0] - 1), max(stop, seam[0])
+
+    # Columns of the previous row whose cumulative energy changed
+    changed_lo, changed_hi = w, -1
+    for x in range(max(0, start), min(w - 1, stop) + 1):
+        value = 0.0
+        if intensity is not None:
+            value = _first_row_forward_cost(intensity[0], x)
+        if energy_map is not None:
+            value += energy_map[0, x]
+
+        previous = cumulative_energy_map[0, x]
+        cumulative_energy_map[0, x] = value
+        if cumulative_energy_map[0, x] != previous:
+            changed_lo, changed_hi = min(changed_lo, x), max(changed_hi, x)
+
+    for y in range(1, h):
+        # Cells whose own energy changed, whose parents shifted because the seam
+        # moved between rows, or whose parents' cumulative energy changed
+        start = min(lo[y], min(seam[y], seam[y - 1]) - 1)
+        stop = max(hi[y], max(seam[y], seam[y - 1]))
+        if changed_hi >= 0:
+            start = min(start, changed_lo - 1)
+            stop = max(stop, changed_hi + 1)
+
+        changed_lo, changed_hi = w, -1
+        for x in range(max(0, start), min(w - 1, stop) + 1):
+            best, offset = _relax_cell(
+                energy_map, intensity, cumulative_energy_map, y, x
+            )
+            backtrack[y, x] = offset
+
+            previous = cumulative_energy_map[y, x]
+            cumulative_energy_map[y, x] = best
+            if cumulative_energy_map[y, x] != previous:
+                changed_lo, changed_hi = min(changed_lo, x), max(changed_hi, x)
+
+
+@numba.njit(cache=True)
+def backtrack_seam(last_row: np.ndarray, backtrack: np.ndarray) -> np.ndarray:
+    """
+    Follow the backpointers up from the cheapest cell of the last cumulative row.
+
+    Args:
+        last_row (np.ndarray): The cumulative energy of the last row of shape (w,).
+        backtrack (np.ndarray): The backpointers of shape (h, w), see `accumulate_row`.
+
+    Returns:
+        np.ndarray: The seam of shape (h,).
+    """
+    h = backtrack.shape[0]
+
+    seam = np.empty(h, dtype=np.int32)
+    seam[-1] = np.argmin(last_row)
+    for y in range(h - 2, -1, -1):
+        seam[y] = seam[y + 1] + backtrack[y + 1, seam[y + 1]]
+
+    return seam
+
+
+class IncrementalSeamFinder(object):
+    """
+    Stateful seam finder that keeps the cumulative energy map between seams.
+
+    After a seam is removed, the cumulative energy map and the backpointers are carved
+    in place alongside the image and only the cone of cells below the seam whose inputs
+    changed is recalculated, row by row, narrowing down to the cells whose values
+    actually changed. The seams found are the same as `SeamFinder.find_seam` on the same
+    energy map, or `SeamFinder.find_seam_forward` on the same image for `forward`.
+    """
+
+    def __init__(
+        self,
+        energy_map: Optional[np.ndarray],
+        parallel: bool = False,
+        intensity: Optional[np.ndarray] = None,
+    ):
+        assert (
+            energy_map is not None or intensity is not None
+        ), "Either an energy map or an intensity map is required."
+
+        shape = energy_map.shape if energy_map is not None else intensity.shape
+        assert len(shape) == 2, "The input energy map must be a 2D matrix."
+
+        # Float64 for the float64 energy maps of masked carves, see `MASK_ENERGY`
+        dtype = np.float32 if energy_map is None else energy_map.dtype
+        cumulative_energy_map = np.empty(shape, dtype=np.result_type(dtype, np.float32))
+        backtrack = np.zeros(shape, dtype=np.int8)
+        if parallel or (energy_map is not None and intensity is not None):
+            _build_cumulative_energy_parallel(
+                energy_map, intensity, cumulative_energy_map, backtrack
+            )
+        elif intensity is not None:
+            _build_cumulative_forward_energy(
+                intensity, cumulative_energy_map, backtrack
+            )
+        else:
+            cumulative_energy_map = np.empty_like(energy_map)
+            _build_cumulative_energy(energy_map, cumulative_energy_map, backtrack)
+
+        self._cumulative_energy_map = CarvingBuffer(cumulative_energy_map, copy=False)
+        self._backtrack = CarvingBuffer(backtrack, copy=False)
+        self._intensity = (
+            CarvingBuffer(intensity, copy=False) if intensity is not None else None
+        )
+
+    @classmethod
+    def forward(
+        cls,
+        mat: np.ndarray,
+        energy_map: Optional[np.ndarray] = None,
+        parallel: bool = False,
+    ) -> "IncrementalSeamFinder":
+        """
+        Create a seam finder using the forward energy of an image.
+
+        The intensity map of the image is kept and carved alongside the image, so only
+        `remove_seam` needs to be called after every seam.
+
+        Args:
+            mat (np.ndarray): The image of shape (h, w, 3).
+            energy_map (np.ndarray, optional): A backward energy map to add to the
+                forward energy.
+            parallel (bool): Whether to build the initial map with multiple threads.
+
+        Returns:
+            IncrementalSeamFinder: The seam finder.
+        """
+        return cls(energy_map, parallel, intensity=intensity_map(mat))
+
+    @property
+    def cumulative_energy_map(self) -> np.ndarray:
+        return self._cumulative_energy_map.view
+
+    def find_seam(self) -> np.ndarray:
+        """
+        Find the seam with the lowest energy in the current image.
+
+        Returns:
+            np.ndarray: The seam with the lowest energy of shape (h,).
+        """
+        return backtrack_seam(
+            self._cumulative_energy_map.view[-1], self._backtrack.view
+        )
+
+    def remove_seam(
+        self,
+        seam: np.ndarray,
+        energy_map: Optional[np.ndarray] = None,
+        lo: Optional[np.ndarray] = None,
+        hi: Optional[np.ndarray] = None,
+    ) -> None:
+        """
+        Update the cumulative energy map after a seam has been removed.
+
+        Args:
+            seam (np.ndarray): The removed seam, in the coordinates before removal.
+            energy_map (np.ndarray, optional): The energy map after removal of shape
+                (h, w - 1). Only omitted for pure forward energy.
+            lo (np.ndarray, optional): The first column of every row whose energy changed.
+            hi (np.ndarray, optional): The last column of every row whose energy changed.
+                If `lo` or `hi` is not given, every cell is assumed to have changed.
+        """
+        h, w = self._cumulative_energy_map.shape
+        w -= 1
+
+        if energy_map is None:
+            lo = np.full(h, w, dtype=np.int32)
+            hi = np.full(h, -1, dtype=np.int32)
+        else:
+            assert energy_map.shape == (h, w), "Energy map size mismatch."
+            if lo is None or hi is None:
+                lo = np.zeros(h, dtype=np.int32)
+                hi = np.full(h, w - 1, dtype=np.int32)
+
+        self._cumulative_energy_map.remove_seam(seam)
+        self._backtrack.remove_seam(seam)
+
+        intensity = None
+        if self._intensity is not None:
+            self._intensity.remove_seam(seam)
+            intensity = self._intensity.view
+
+            # The forward energy changes where the neighbours of a pixel changed
+            band_lo, band_hi = seam_band(seam, w, 1)
+            lo, hi = np.minimum(lo, band_lo), np.maximum(hi, band_hi)
+
+        _update_cumulative_energy(
+            energy_map,
+            intensity,
+            self._cumulative_energy_map.view,
+            self._backtrack.view,
+            seam,
+            lo,
+            hi,
+        )
+
+
+def draw_seam(
+    mat: np.ndarray,
+    seam: np.ndarray,
+    out: Optional[np.ndarray] = None,
+    axis: int = 1,
+) -> np.ndarray:
     """
     Draw a seam on an image.
 
     Args:
         mat (np.ndarray): The image to draw the seam on.
         seam (np.ndarray): The seam to draw.
+        out (np.ndarray, optional): A buffer of the same shape as `mat` to draw into
+            instead of a new copy, e.g. reused between frames. May be `mat` itself.
+        axis (int): 1 for a vertical seam of shape (h,), 0 for a horizontal seam of
+            shape (w,).
 
     Returns:
-        np.ndarray: The image with the seam drawn.
+        np.ndarray: The image with the seam drawn, `out` if given.
     """
     assert len(mat.shape) == 3, "The input image must be a 3D matrix."
 
     h, w, c = mat.shape
-    assert len(seam) == h, "The seam must have the same height as the image."
+    assert len(seam) == (h if axis == 1 else w), "The seam must span the image."
+
+    if out is None:
+        out = mat.copy()
+    elif out is not mat:
+        assert out.shape == mat.shape, "The output must have the shape of the image."
+        np.copyto(out, mat)
 
-    mat = mat.copy()
-    for y in range(h):
-        x = seam[y]
-        mat[y, x] = [0, 0, 255]  # Red color
+    positions = np.arange(len(seam))
+    if axis == 1:
+        out[positions, seam] = [0, 0, 255]  # Red color
+    else:
+        out[seam, positions] = [0, 0, 255]
 
-    return mat
+    return out
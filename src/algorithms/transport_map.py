@@ -0,0 +1,157 @@
+from typing import Callable, Tuple
+
+import numpy as np
+
+from src.algorithms.carving import CarvingBuffer
+
+
+def _remove_cheapest_seam(
+    mat: np.ndarray,
+    energy_map: np.ndarray,
+    seam_function: Callable[[np.ndarray], np.ndarray],
+    axis: int,
+) -> Tuple[np.ndarray, float]:
+    """
+    Remove the cheapest seam along an axis from an image.
+
+    Returns:
+        Tuple[np.ndarray, float]: The image without the seam and the energy of the seam.
+    """
+    seam = seam_function(energy_map)
+    if axis == 0:
+        cost = energy_map[seam, np.arange(len(seam))].sum()
+    else:
+        cost = energy_map[np.arange(len(seam)), seam].sum()
+
+    carved = CarvingBuffer(mat)
+    carved.remove_seam(seam, axis)
+    return carved.view, float(cost)
+
+
+def seam_order(
+    mat: np.ndarray,
+    num_vertical: int,
+    num_horizontal: int,
+    energy_function: Callable[[np.ndarray], np.ndarray],
+    seam_function: Callable[[np.ndarray], np.ndarray],
+    horizontal_seam_function: Callable[[np.ndarray], np.ndarray],
+) -> np.ndarray:
+    """
+    Find an order of vertical and horizontal seams with a low total energy.
+
+    Dynamic programming over the transport map `T[i, j]`, the energy of removing `i`
+    vertical and `j` horizontal seams, where every cell adds the cheapest seam of the
+    image it is reached from. Every cell only keeps the image of its cheaper incoming
+    path, so the order is not always the cheapest of all interleavings. Only one row of
+    intermediate images is kept, but every cell still runs the energy and seam
+    functions once, so this is meant for small proxy images.
+
+    Args:
+        mat (np.ndarray): The image of shape (h, w, 3).
+        num_vertical (int): The number of vertical seams to remove.
+        num_horizontal (int): The number of horizontal seams to remove.
+        energy_function (Callable): The energy function.
+        seam_function (Callable): The function finding vertical seams.
+        horizontal_seam_function (Callable): The function finding horizontal seams.
+
+    Returns:
+        np.ndarray: The axis of every seam in removal order, 1 for vertical and 0 for
+            horizontal seams, of shape (num_vertical + num_horizontal,).
+    """
+    h, w = mat.shape[:2]
+    if not (0 <= num_vertical < w and 0 <= num_horizontal < h):
+        raise ValueError(
+            f"Expected: fewer than {w} vertical and {h} horizontal seams, "
+            f"but got: {num_vertical} and {num_horizontal}"
+        )
+
+    def remove_seam(image, energy_map, find_seam, axis):
+        carved, cost = _remove_cheapest_seam(image, energy_map, find_seam, axis)
+        return carved, energy_function(carved), cost
+
+    # Whether cell (i, j) is reached by a vertical seam from (i - 1, j)
+    vertical = np.zeros((num_vertical + 1, num_horizontal + 1), dtype=bool)
+
+    # The image and energy map of every cell of the current row
+    costs = np.zeros(num_horizontal + 1)
+    images = [(mat, energy_function(mat))]
+    for j in range(1, num_horizontal + 1):
+        image, energy_map, cost = remove_seam(*images[-1], horizontal_seam_function, 0)
+        costs[j] = costs[j - 1] + cost
+        images.append((image, energy_map))
+
+    for i in range(1, num_vertical + 1):
+        previous_costs, previous_images = costs, images
+        costs, images = np.empty_like(previous_costs), []
+
+        for j in range(num_horizontal + 1):
+            image, energy_map, cost = remove_seam(*previous_images[j], seam_function, 1)
+            costs[j], vertical[i, j] = previous_costs[j] + cost, True
+
+            if j > 0:
+                left_image, left_energy_map, left_cost = remove_seam(
+                    *images[-1], horizontal_seam_function, 0
+                )
+                if costs[j - 1] + left_cost < costs[j]:
+                    image, energy_map = left_image, left_energy_map
+                    costs[j], vertical[i, j] = costs[j - 1] + left_cost, False
+
+            images.append((image, energy_map))
+
+    # Walk back from the target size
+    order = np.empty(num_vertical + num_horizontal, dtype=np.int8)
+    i, j = num_vertical, num_horizontal
+    for k in range(len(order) - 1, -1, -1):
+        if i > 0 and (j == 0 or vertical[i, j]):
+            order[k], i = 1, i - 1
+        else:
+            order[k], j = 0, j - 1
+
+    return order
+
+
+def scale_seam_order(
+    order: np.ndarray, num_vertical: int, num_horizontal: int
+) -> np.ndarray:
+    """
+    Stretch a seam order, e.g. found on a downscaled proxy, to other seam counts.
+
+    The result follows the same path through the transport map, scaled to the new
+    numbers of vertical and horizontal seams.
+
+    Args:
+        order (np.ndarray): The axis of every seam in removal order, see `seam_order`.
+        num_vertical (int): The number of vertical seams of the result.
+        num_horizontal (int): The number of horizontal seams of the result.
+
+    Returns:
+        np.ndarray: The stretched order of shape (num_vertical + num_horizontal,).
+    """
+    proxy_vertical = int(np.count_nonzero(order))
+    proxy_horizontal = len(order) - proxy_vertical
+
+    def scaled_count(count: int, total: int, proxy_total: int) -> int:
+        # Rounded to nearest, seams the proxy could not represent are left for the end
+        return (count * total * 2 + proxy_total) // (2 * proxy_total) if count else 0
+
+    scaled = np.empty(num_vertical + num_horizontal, dtype=np.int8)
+    i = j = k = 0
+    proxy_i = proxy_j = 0
+    for axis in order:
+        if axis == 1:
+            proxy_i += 1
+        else:
+            proxy_j += 1
+
+        # Catch up with the scaled position of the proxy path
+        target_i = scaled_count(proxy_i, num_vertical, proxy_vertical)
+        target_j = scaled_count(proxy_j, num_horizontal, proxy_horizontal)
+        while i < target_i:
+            scaled[k], i, k = 1, i + 1, k + 1
+        while j < target_j:
+            scaled[k], j, k = 0, j + 1, k + 1
+
+    scaled[k : k + num_vertical - i] = 1
+    scaled[k + num_vertical - i :] = 0
+
+    return scaled
@@ -0,0 +1,401 @@
+"""
+Headless batch retargeting of many images with a process pool.
+
+Every image is decoded, retargeted to every target and encoded in one worker process,
+so with several workers the decoding, carving and encoding of different images
+overlap. A JSON manifest records the outputs, timings and failures of every image.
+
+Usage:
+    python -m src.batch images/ "photos/*.jpg" --aspect 16:9 --size 640x480 \
+        --output-dir out --name "{stem}_{target}{ext}" --workers 4
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from src.algorithms.energy import EnergyCalculator
+from src.lib import CarvableImage, Image
+
+# .npy files are memory-mapped instead of decoded, see `Image.from_path`
+IMAGE_EXTENSIONS = (
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".bmp",
+    ".xpm",
+    ".tif",
+    ".tiff",
+    ".webp",
+    ".npy",
+)
+
+
+def parse_size(value: str) -> Tuple[int, int]:
+    """
+    Parse a target size in the format "WIDTHxHEIGHT", e.g. "640x480".
+    """
+    try:
+        width, height = map(int, value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Size must be in the format 'WIDTHxHEIGHT', but got: {value}"
+        )
+    if width < 1 or height < 1:
+        raise argparse.ArgumentTypeError(f"Size must be positive, but got: {value}")
+    return width, height
+
+
+def parse_aspect_ratio(value: str) -> Tuple[int, int]:
+    """
+    Parse an aspect ratio in the format "WIDTH:HEIGHT", e.g. "16:9".
+    """
+    try:
+        width, height = map(int, value.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Aspect ratio must be in the format 'width:height', but got: {value}"
+        )
+    if width < 1 or height < 1:
+        raise argparse.ArgumentTypeError(
+            f"Aspect ratio must be positive, but got: {value}"
+        )
+    return width, height
+
+
+def aspect_ratio_size(
+    width: int, height: int, aspect_ratio: Tuple[int, int]
+) -> Tuple[int, int]:
+    """
+    Get the size an image is carved down to for an aspect ratio, like the GUI does.
+
+    Args:
+        width (int): The width of the image.
+        height (int): The height of the image.
+        aspect_ratio (Tuple[int, int]): The aspect ratio (width, height).
+
+    Returns:
+        Tuple[int, int]: The target size (width, height), never larger than the image.
+    """
+    width_ratio, height_ratio = aspect_ratio
+    target_width = int(height * (width_ratio / height_ratio))
+    target_height = int(width * (height_ratio / width_ratio))
+    return min(target_width, width), min(target_height, height)
+
+
+def find_images(patterns: List[str]) -> List[str]:
+    """
+    Expand files, directories and glob patterns into a sorted list of image paths.
+    """
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            candidates = glob.glob(pattern) or [pattern]
+
+        paths.update(
+            path
+            for path in candidates
+            if os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+        )
+
+    return sorted(paths)
+
+
+def output_stems(paths: List[str]) -> Dict[str, str]:
+    """
+    Get the `{stem}` of the output names of every image.
+
+    The stem is the file name without its extension. Images sharing it, e.g. from
+    different directories, are named after their paths relative to the common parent
+    directory of those images instead, so that their outputs do not overwrite each
+    other but are saved in matching subdirectories.
+    """
+    groups: Dict[str, List[str]] = {}
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        groups.setdefault(stem, []).append(path)
+
+    stems = {}
+    for stem, group in groups.items():
+        directories = [os.path.abspath(os.path.dirname(path)) for path in group]
+        parent = os.path.commonpath(directories)
+        for path in group:
+            relative = os.path.relpath(os.path.abspath(path), parent)
+            stems[path] = stem if len(group) == 1 else os.path.splitext(relative)[0]
+
+    return stems
+
+
+def process_image(
+    path: str,
+    sizes: List[Tuple[int, int]],
+    aspect_ratios: List[Tuple[int, int]],
+    output_dir: str,
+    name: str,
+    protect_faces: bool = True,
+    forward_energy: bool = False,
+    energy: str = "squared_diff",
+    stem: Optional[str] = None,
+) -> dict:
+    """
+    Decode an image once, retarget it to every target and save the results.
+
+    Runs in the worker processes. The faces are detected once and their mask is
+    reused for every target. Failures are recorded in the result instead of raised,
+    per image for decoding and face detection, and per target for carving and
+    encoding.
+
+    Args:
+        path (str): The path of the image.
+        sizes (List[Tuple[int, int]]): The target sizes (width, height).
+        aspect_ratios (List[Tuple[int, int]]): The target aspect ratios.
+        output_dir (str): The directory to save the results to.
+        name (str): The file name pattern of the results, see `main`.
+        protect_faces (bool): Whether to avoid removing seams through faces.
+        forward_energy (bool): See `CarvableImage.forward_energy`.
+        energy (str): The name of the energy function, see `EnergyCalculator.get`.
+        stem (str, optional): The `{stem}` of the output names, by default the file
+            name of the image without its extension, see `output_stems`.
+
+    Returns:
+        dict: The manifest entry of the image.
+    """
+    entry = {"input": path, "outputs": []}
+
+    start = time.perf_counter()
+    try:
+        image = Image.from_path(path)
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+        return entry
+    entry["decode_s"] = time.perf_counter() - start
+
+    height, width, _ = image.shape
+    entry["size"] = [width, height]
+
+    targets = [(f"{w}x{h}", (w, h)) for w, h in sizes]
+    targets += [
+        (f"{w}-{h}", aspect_ratio_size(width, height, (w, h))) for w, h in aspect_ratios
+    ]
+
+    name_stem, ext = os.path.splitext(os.path.basename(path))
+    stem = name_stem if stem is None else stem
+    carvable = CarvableImage(image, energy, forward_energy=forward_energy)
+
+    mask = None
+    if protect_faces:
+        start = time.perf_counter()
+        try:
+            mask = carvable.face_mask()
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+            return entry
+        entry["faces_s"] = time.perf_counter() - start
+    for target, (target_width, target_height) in targets:
+        output = os.path.join(
+            output_dir,
+            name.format(
+                stem=stem,
+                ext=ext,
+                target=target,
+                width=target_width,
+                height=target_height,
+            ),
+        )
+        result = {"target": target, "output": output}
+        entry["outputs"].append(result)
+
+        try:
+            start = time.perf_counter()
+            carved = carvable.retarget(target_width, target_height, mask=mask)
+            result["carve_s"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+            carved.img.save(output)
+            result["encode_s"] = time.perf_counter() - start
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+
+    return entry
+
+
+def run(
+    paths: List[str],
+    sizes: List[Tuple[int, int]],
+    aspect_ratios: List[Tuple[int, int]],
+    output_dir: str,
+    name: str,
+    workers: Optional[int] = None,
+    protect_faces: bool = True,
+    forward_energy: bool = False,
+    energy: str = "squared_diff",
+) -> dict:
+    """
+    Process images in a process pool and collect the manifest.
+
+    Images sharing a file name are told apart by `output_stems`. Outputs that the name
+    pattern still saves to the same file are recorded as failures of every image.
+
+    Args:
+        paths (List[str]): The paths of the images.
+        workers (int, optional): The number of worker processes, by default the
+            number of CPUs.
+        See `process_image` for the other arguments.
+
+    Returns:
+        dict: The manifest, with the entries in the order of `paths`.
+    """
+    start = time.perf_counter()
+    stems = output_stems(paths)
+    entries = {}
+    # Forked workers can deadlock on the thread pools that numba or OpenCV already
+    # started in this process, e.g. when the batch runs after carving in-process
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {
+            executor.submit(
+                process_image,
+                path,
+                sizes,
+                aspect_ratios,
+                output_dir,
+                name,
+                protect_faces,
+                forward_energy,
+                energy,
+                stems[path],
+            ): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                entries[path] = future.result()
+            except Exception as e:
+                # The worker process itself failed, e.g. it was killed
+                entries[path] = {"input": path, "outputs": [], "error": repr(e)}
+
+            entry = entries[path]
+            failed = "error" in entry or any("error" in o for o in entry["outputs"])
+            print(f"{'FAILED' if failed else 'done'}: {path}", file=sys.stderr)
+
+    images = [entries[path] for path in paths]
+
+    # Left to the name pattern, e.g. without `{stem}`, several images can still be
+    # saved to the same file, which only keeps the last one
+    results: Dict[str, List[dict]] = {}
+    for entry in images:
+        for result in entry["outputs"]:
+            results.setdefault(os.path.normpath(result["output"]), []).append(result)
+    for output, shared in results.items():
+        if len(shared) > 1:
+            for result in shared:
+                result["error"] = f"{len(shared)} outputs are saved to '{output}'"
+
+    failures = sum(
+        "error" in entry or any("error" in o for o in entry["outputs"])
+        for entry in images
+    )
+    return {
+        "workers": workers or os.cpu_count(),
+        "wall_s": time.perf_counter() - start,
+        "num_images": len(images),
+        "num_failed": failures,
+        "images": images,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Retarget images with seam carving in parallel."
+    )
+    parser.add_argument(
+        "inputs", nargs="+", help="Image files, directories or glob patterns."
+    )
+    parser.add_argument(
+        "--size",
+        type=parse_size,
+        action="append",
+        default=[],
+        help="Target size WIDTHxHEIGHT, can be repeated.",
+    )
+    parser.add_argument(
+        "--aspect",
+        type=parse_aspect_ratio,
+        action="append",
+        default=[],
+        help="Target aspect ratio W:H carved down to like the GUI, can be repeated.",
+    )
+    parser.add_argument("--output-dir", default="out", help="Output directory.")
+    parser.add_argument(
+        "--name",
+        default="{stem}_{target}{ext}",
+        help="Output file name pattern with the fields {stem}, {ext}, {target}, "
+        "{width} and {height}. {stem} includes the parent directories of inputs "
+        "sharing a file name.",
+    )
+    parser.add_argument(
+        "--manifest", help="Manifest path, by default manifest.json in --output-dir."
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Number of processes, by default the CPUs."
+    )
+    parser.add_argument(
+        "--no-protect-faces",
+        dest="protect_faces",
+        action="store_false",
+        help="Do not avoid removing seams through detected faces.",
+    )
+    parser.add_argument(
+        "--forward-energy", action="store_true", help="Pick seams by forward energy."
+    )
+    parser.add_argument(
+        "--energy",
+        choices=EnergyCalculator.names(),
+        default="squared_diff",
+        help="Energy function.",
+    )
+    args = parser.parse_args(argv)
+
+    if not args.size and not args.aspect:
+        parser.error("at least one --size or --aspect is required")
+
+    paths = find_images(args.inputs)
+    if not paths:
+        parser.error(f"no images found in: {', '.join(args.inputs)}")
+
+    manifest = run(
+        paths,
+        args.size,
+        args.aspect,
+        args.output_dir,
+        args.name,
+        args.workers,
+        args.protect_faces,
+        args.forward_energy,
+        args.energy,
+    )
+
+    manifest_path = args.manifest or os.path.join(args.output_dir, "manifest.json")
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    print(
+        f"{manifest['num_images']} images, {manifest['num_failed']} failed, "
+        f"{manifest['wall_s']:.1f} s, manifest: {manifest_path}",
+        file=sys.stderr,
+    )
+    return 1 if manifest["num_failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,7 @@ import traceback
 from PySide6.QtWidgets import QApplication, QMessageBox
 
 from src.gui.mainwindow import MainWindow
+from src.lib import warmup
 
 
 class Application(QApplication):
@@ -11,10 +12,18 @@ class Application(QApplication):
     Root class for the application window.
     """
 
-    def __init__(self):
+    def __init__(self, warmup_kernels: bool = False):
+        """
+        Args:
+            warmup_kernels (bool): Whether to compile the carving kernels in a
+                background thread while the window starts, see `src.lib.warmup`.
+        """
         super().__init__(sys.argv)
         self.window = MainWindow()
 
+        if warmup_kernels:
+            warmup(threaded=True)
+
         setattr(sys, "excepthook", self.handle_exception)
 
     def handle_exception(self, exctype, value: BaseException, tb):
@@ -1,7 +1,7 @@
 import sys
 
 import cv2
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QThreadPool
 from PySide6.QtGui import QImage, QPixmap
 from PySide6.QtWidgets import (
     QMainWindow,
@@ -21,6 +21,7 @@ from PySide6.QtWidgets import (
 
 from src.algorithms.energy import EnergyCalculator
 from src.algorithms.seam import SeamFinder
+from src.gui.worker import CarvingWorker
 from src.lib import Image, CarvableImage
 
 
@@ -159,6 +160,11 @@ class MainWindow(QMainWindow):
         self.carved_image = None
         self.export_button = None
 
+        self.thread_pool = QThreadPool.globalInstance()
+        self.worker = None
+        self.preview_worker = None
+        self.worker_aspect_ratio = None
+
         self._setup_ui()
 
     def _setup_ui(self):
@@ -189,7 +195,14 @@ class MainWindow(QMainWindow):
         self.export_button.setStyleSheet(AppStyles.BUTTON_STYLE)
         self.export_button.clicked.connect(self.export_image)
 
+        # Add Cancel Button
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setStyleSheet(AppStyles.BUTTON_STYLE)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_carving)
+
         export_layout.addWidget(self.export_button)
+        export_layout.addWidget(self.cancel_button)
 
         main_layout.addLayout(export_layout)
 
@@ -219,6 +232,15 @@ class MainWindow(QMainWindow):
             ["16:9", "4:5", "1:1", "3:4", "9:16", "Custom"]
         )
         self.aspect_ratio_dropdown.setStyleSheet(AppStyles.DROP_DOWN_STYLE)
+        self.aspect_ratio_dropdown.currentTextChanged.connect(
+            self._on_aspect_ratio_changed
+        )
+
+        # Energy Function
+        self.energy_dropdown = QComboBox()
+        self.energy_dropdown.addItems(EnergyCalculator.names())
+        self.energy_dropdown.setToolTip("Energy function")
+        self.energy_dropdown.setStyleSheet(AppStyles.DROP_DOWN_STYLE)
 
         # Seam Input
         self.seams_input = QLineEdit()
@@ -234,6 +256,7 @@ class MainWindow(QMainWindow):
         # Add to layout
         button_layout.addWidget(self.load_button)
         button_layout.addWidget(self.aspect_ratio_dropdown)
+        button_layout.addWidget(self.energy_dropdown)
         # button_layout.addWidget(self.seams_input) # seams_input enter box
         button_layout.addWidget(self.carve_button)
         controls_layout.addLayout(button_layout)
@@ -261,17 +284,17 @@ class MainWindow(QMainWindow):
         self.seams_input_height.setPlaceholderText("Height")
         self.seams_input_height.setStyleSheet(AppStyles.LINE_EDIT_STYLE)
 
-        # Carve Button
-        self.carve_button = QPushButton("Enlarge Image")
-        self.carve_button.setMaximumWidth(150)
-        self.carve_button.setStyleSheet(AppStyles.BUTTON_STYLE)
-        self.carve_button.clicked.connect(self.start_seam_enlarge)  # st_seam_carving
+        # Enlarge Button
+        self.enlarge_button = QPushButton("Enlarge Image")
+        self.enlarge_button.setMaximumWidth(150)
+        self.enlarge_button.setStyleSheet(AppStyles.BUTTON_STYLE)
+        self.enlarge_button.clicked.connect(self.start_seam_enlarge)
         ##############################
 
         # Add to layout
         button_layout.addWidget(self.seams_input_width)
         button_layout.addWidget(self.seams_input_height)
-        button_layout.addWidget(self.carve_button)
+        button_layout.addWidget(self.enlarge_button)
         controls_layout.addLayout(button_layout)
         return controls_group
 
@@ -376,9 +399,9 @@ class MainWindow(QMainWindow):
         if not self.original_image:
             print("No image loaded.")
             return
-        self.carved_image_label.setText("Processing...")
-        self.carved_image_label.repaint()
-        QApplication.processEvents()
+
+        # A running job is for a previous aspect ratio, even if this one is invalid
+        self.cancel_carving()
 
         try:
             aspect_ratio = self.aspect_ratio_dropdown.currentText()
@@ -393,62 +416,17 @@ class MainWindow(QMainWindow):
             )
             print(num_v_seams, num_h_seams)
 
-            self.progress_bar.setValue(0)
-
         except ValueError:
             print("Please enter a valid integer for seams.")
             return
 
-        # Vertical seam carving (reduce width)
-        try:
-            carvable_image = CarvableImage(self.original_image)
-            carvable_image.energy_function = EnergyCalculator.squared_diff
-            carvable_image.seam_function = SeamFinder.find_seam
-
-            for i in range(1, num_v_seams + 1):
-                carvable_image.seam_carve_with_mask(1)  # Carve one seam at a time
-                self.progress_bar.setValue(
-                    int((i / num_v_seams) * 50)
-                )  # Update progress bar for vertical seams
-
-            carved_data = carvable_image.seam_carve_with_mask(num_v_seams).img.mat
-            self.vertical_save = Image(carved_data)
-
-        except Exception as e:
-            print(f"Error in vertical seam carving: {e}")
-            return
-
-        # Horizontal seam carving (reduce height)
-        try:
-            carvable_image_hor = CarvableImage(self.vertical_save)
-            carvable_image_hor.img.mat = cv2.rotate(
-                carvable_image_hor.img.mat, cv2.ROTATE_90_CLOCKWISE
-            )
-
-            # Perform seam carving one seam at a time and update the progress bar
-            for i in range(1, num_h_seams + 1):
-                carvable_image_hor.seam_carve_with_mask(1)  # Carve one seam at a time
-                self.progress_bar.setValue(
-                    50 + int((i / num_h_seams) * 50)
-                )  # Update progress bar for horizontal seams
-
-            # Rotate the final result back to the original orientation
-            carved_data_hor = cv2.rotate(
-                carvable_image_hor.img.mat, cv2.ROTATE_90_COUNTERCLOCKWISE
-            )
-
-        except Exception as e:
-            print(f"Error in horizontal seam carving: {e}")
-            return
-
-        try:
-            self.final_image = Image(carved_data_hor)
-            self._display_image(self.final_image.mat, self.carved_image_label)
-
-            self.progress_bar.setValue(100)  # Set progress to 100% when complete
-        except Exception as e:
-            print(f"Error in displaying the carved image: {e}")
-            return
+        # Remove the vertical and horizontal seams in the order with the lowest energy
+        self._start_retarget(
+            original_width - num_v_seams,
+            original_height - num_h_seams,
+            protect_faces=True,
+        )
+        self.worker_aspect_ratio = aspect_ratio
 
     def start_seam_enlarge(self):
         if not self.original_image:
@@ -464,45 +442,146 @@ class MainWindow(QMainWindow):
             print("Please enter a valid integer for seams.")
             return
 
-        # Vertical seam carving (enlarge width)
-        try:
-            enlarge_image = CarvableImage(self.original_image)
-            enlarge_image.energy_function = EnergyCalculator.squared_diff
-            enlarge_image.seam_function = SeamFinder.find_seam
-            enlarged_data = enlarge_image.seam_carve_enlarge(width_pixel).img.mat
+        # Enlarge the width, then the height
+        original_height, original_width = self.original_image.mat.shape[:2]
+        self._start_retarget(
+            original_width + width_pixel, original_height + height_pixel
+        )
 
-        except Exception as e:
-            print(f"Error in vertical seam carving: {e}")
-            return
+    def cancel_carving(self):
+        for worker in (self.worker, self.preview_worker):
+            if worker is not None:
+                worker.cancel()
+
+        if self.worker is not None:
+            self.carved_image_label.setText("Cancelled")
+            self.progress_bar.setValue(0)
+        self._set_running(False)
 
-        enlarged_vertical_save = Image(enlarged_data)
+    def closeEvent(self, event):
+        self.cancel_carving()
+        self.thread_pool.waitForDone()
+        super().closeEvent(event)
 
-        # Horizontal seam carving (enlarge height)
-        try:
-            enlarge_image_hor = CarvableImage(enlarged_vertical_save)
-            enlarge_image_hor.img.mat = cv2.rotate(
-                enlarge_image_hor.img.mat, cv2.ROTATE_90_CLOCKWISE
+    def _on_aspect_ratio_changed(self, aspect_ratio: str):
+        # Replace a running resize to the previous aspect ratio
+        if self.worker is not None and self.worker_aspect_ratio is not None:
+            self.start_seam_carving()
+
+    def _start_retarget(self, width: int, height: int, **kwargs):
+        """
+        Retarget the original image in the thread pool, showing a preview first.
+
+        Unless the result fits the carved image label as is, a copy of the original
+        downscaled to the label is retargeted first and shown until the full-resolution
+        result replaces it. Running jobs are cancelled.
+
+        Args:
+            width (int): The target width.
+            height (int): The target height.
+            **kwargs: Passed on to `CarvableImage.retarget`.
+        """
+        self.cancel_carving()
+
+        mat = self.original_image.mat
+        original_height, original_width = mat.shape[:2]
+        label_size = self.carved_image_label.size()
+        scale = min(1.0, label_size.width() / width, label_size.height() / height)
+
+        if scale < 1.0:
+            size = (
+                max(round(original_width * scale), 2),
+                max(round(original_height * scale), 2),
             )
-            enlarge_image_hor.energy_function = EnergyCalculator.squared_diff
-            enlarge_image_hor.seam_function = SeamFinder.find_seam
-            enlarged_data_hor = enlarge_image_hor.seam_carve_enlarge(
-                height_pixel
-            ).img.mat
-            enlarged_data_hor = cv2.rotate(
-                enlarged_data_hor, cv2.ROTATE_90_COUNTERCLOCKWISE
+            proxy = cv2.resize(mat, size, interpolation=cv2.INTER_AREA)
+            proxy_width = max(round(width * scale), 1)
+            proxy_height = max(round(height * scale), 1)
+            self.preview_worker = self._start_worker(
+                Image(proxy),
+                lambda image: image.retarget(proxy_width, proxy_height, **kwargs),
             )
 
-        except Exception as e:
-            print(f"Error in horizontal seam carving: {e}")
+        self.worker = self._start_worker(
+            self.original_image,
+            lambda image: image.retarget(width, height, **kwargs),
+        )
+
+        self._set_running(True)
+        self.carved_image_label.setText("Processing...")
+        self.progress_bar.setValue(0)
+
+    def _start_worker(self, image: Image, operation) -> CarvingWorker:
+        """
+        Run a carving operation in the thread pool.
+
+        Args:
+            image (Image): The image to carve.
+            operation (Callable): Carves a `CarvableImage` and returns the result.
+
+        Returns:
+            CarvingWorker: The started worker.
+        """
+        carvable_image = CarvableImage(image)
+        carvable_image.energy_function = self.energy_dropdown.currentText()
+        carvable_image.seam_function = SeamFinder.find_seam
+
+        # Signals of replaced workers still arrive and are told apart by the worker
+        worker = CarvingWorker(carvable_image, operation)
+        worker.signals.progress.connect(self._on_carving_progress)
+        worker.signals.finished.connect(self._on_carving_finished)
+        worker.signals.failed.connect(self._on_carving_failed)
+
+        self.thread_pool.start(worker)
+        return worker
+
+    def _set_running(self, running: bool):
+        self.carve_button.setEnabled(not running)
+        self.enlarge_button.setEnabled(not running)
+        self.load_button.setEnabled(not running)
+        self.energy_dropdown.setEnabled(not running)
+        self.cancel_button.setEnabled(running)
+        if not running:
+            self.worker = None
+            self.preview_worker = None
+            self.worker_aspect_ratio = None
+
+    def _on_carving_progress(self, worker: CarvingWorker, percent: int):
+        if worker is self.worker:
+            self.progress_bar.setValue(percent)
+
+    def _on_carving_finished(self, worker: CarvingWorker, carved_data):
+        if worker is self.preview_worker:
+            self.preview_worker = None
+            self._display_image(carved_data, self.carved_image_label)
+            return
+
+        if worker is not self.worker:
             return
 
+        # A preview still running would only replace the full-resolution result
+        if self.preview_worker is not None:
+            self.preview_worker.cancel()
+        self._set_running(False)
+
         try:
-            self.final_image = Image(enlarged_data_hor)
+            self.final_image = Image(carved_data)
             self._display_image(self.final_image.mat, self.carved_image_label)
+
+            self.progress_bar.setValue(100)  # Set progress to 100% when complete
         except Exception as e:
             print(f"Error in displaying the carved image: {e}")
+
+    def _on_carving_failed(self, worker: CarvingWorker, message: str):
+        if worker is self.preview_worker:
+            self.preview_worker = None
+        elif worker is self.worker:
+            self._set_running(False)
+            self.carved_image_label.setText("No Image Loaded")
+        else:
             return
 
+        print(f"Error in seam carving: {message}")
+
     def _display_image(self, image_data, label: QLabel):
         height, width, channel = image_data.shape
         bytes_per_line = 3 * width
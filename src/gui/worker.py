@@ -0,0 +1,74 @@
+import threading
+from typing import Callable
+
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from src.lib import CarvableImage, CarvingCancelled
+
+
+class CarvingSignals(QObject):
+    """
+    Signals of a `CarvingWorker`, delivered to the thread of their receivers.
+
+    Every signal carries the worker first, to tell the signals of replaced workers
+    apart.
+    """
+
+    progress = Signal(object, int)
+    finished = Signal(object, object)
+    cancelled = Signal(object)
+    failed = Signal(object, str)
+
+
+class CarvingWorker(QRunnable):
+    """
+    Run a carving operation on a `CarvableImage` in a `QThreadPool`.
+    """
+
+    def __init__(
+        self,
+        carvable_image: CarvableImage,
+        operation: Callable[[CarvableImage], CarvableImage],
+    ):
+        """
+        Args:
+            carvable_image (CarvableImage): The image to carve. Its progress callback
+                is replaced by the worker's.
+            operation (Callable): Carves the image and returns the result, e.g.
+                `lambda image: image.retarget(width, height)`.
+        """
+        super().__init__()
+        self.signals = CarvingSignals()
+
+        self._carvable_image = carvable_image
+        self._operation = operation
+        self._cancelled = threading.Event()
+        self._percent = -1
+
+        carvable_image.progress_callback = self._report_progress
+
+    def cancel(self):
+        """
+        Stop the operation at the next seam. Safe to call from any thread.
+        """
+        self._cancelled.set()
+
+    def _report_progress(self, done: int, total: int):
+        if self._cancelled.is_set():
+            raise CarvingCancelled()
+
+        # Only whole percents reach the GUI thread
+        percent = done * 100 // max(total, 1)
+        if percent != self._percent:
+            self._percent = percent
+            self.signals.progress.emit(self, percent)
+
+    def run(self):
+        try:
+            carved = self._operation(self._carvable_image)
+        except CarvingCancelled:
+            self.signals.cancelled.emit(self)
+        except Exception as e:
+            self.signals.failed.emit(self, str(e))
+        else:
+            self.signals.finished.emit(self, carved.img.mat)
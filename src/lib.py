@@ -1,39 +1,277 @@
+import os
+import threading
 import time
+from contextlib import contextmanager
 from copy import deepcopy
+from functools import lru_cache
 
+import numba
 import numpy as np
 import cv2
-from typing import Optional, Callable
-from tqdm import trange
+from typing import Callable, Generator, Iterable, Iterator, Optional, Tuple, Union
 
-from src.algorithms.carving import carve_seam, carve_seam_enlarge
-from src.algorithms.energy import EnergyCalculator
-from src.algorithms.seam import SeamFinder, draw_seam
+from src.algorithms.carving import REMOVAL_SIGNATURES, CarvingBuffer
+from src.algorithms.energy import (
+    EnergyCalculator,
+    apply_mask,
+    stencil_radius,
+    update_energy,
+)
+from src.algorithms.index_map import SeamIndexMap
+from src.algorithms.seam import IncrementalSeamFinder, SeamFinder, draw_seam
+from src.algorithms.transport_map import scale_seam_order, seam_order
+
+
+# Multi-threaded variants of the built-in kernels, used when `num_threads` > 1
+_PARALLEL_KERNELS = {
+    EnergyCalculator.squared_diff: EnergyCalculator.squared_diff_parallel,
+    SeamFinder.find_seam: SeamFinder.find_seam_parallel,
+}
+
+# Seam functions that calculate the energy within their own sweep
+_FUSED_KERNELS = {
+    (EnergyCalculator.squared_diff, SeamFinder.find_seam): (
+        SeamFinder.find_seam_squared_diff
+    ),
+}
+
+
+# Explicit signatures of the kernels every carve runs per seam, see `warmup`
+_HOT_SIGNATURES = (
+    (
+        EnergyCalculator.squared_diff,
+        ("float32[:, ::1](uint8[:, :, ::1])", "float32[:, ::1](uint8[:, :, :])"),
+    ),
+    (
+        EnergyCalculator.squared_diff_band,
+        (
+            "void(uint8[:, :, ::1], float32[:, :], int32[::1], int32[::1], int64)",
+            "void(uint8[:, :, :], float32[:, :], int32[::1], int32[::1], int64)",
+        ),
+    ),
+    (
+        SeamFinder.find_seam,
+        ("int32[::1](float32[:, ::1])", "int32[::1](float32[:, :])"),
+    ),
+    (
+        SeamFinder.find_seam_squared_diff,
+        ("int32[::1](uint8[:, :, ::1])", "int32[::1](uint8[:, :, :])"),
+    ),
+) + REMOVAL_SIGNATURES
+
+# Native horizontal variants of the built-in seam functions
+_HORIZONTAL_KERNELS = {
+    SeamFinder.find_seam: SeamFinder.find_horizontal_seam,
+    SeamFinder.find_seam_parallel: SeamFinder.find_horizontal_seam,
+}
+
+
+def _horizontal_seam_function(
+    seam_function: Callable[[np.ndarray], np.ndarray]
+) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Get a function finding horizontal seams in an energy map from a vertical one.
+
+    Custom seam functions are run on the transposed view of the energy map.
+    """
+    if seam_function in _HORIZONTAL_KERNELS:
+        return _HORIZONTAL_KERNELS[seam_function]
+
+    def find_horizontal_seam(energy_map: np.ndarray) -> np.ndarray:
+        return seam_function(energy_map.T)
+
+    return find_horizontal_seam
+
+
+@lru_cache(maxsize=None)
+def _face_classifier() -> cv2.CascadeClassifier:
+    """
+    Load the face classifier once per process.
+    """
+    return cv2.CascadeClassifier(
+        cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+    )
+
+
+def _apply_mask(energy_map: np.ndarray, carved: CarvingBuffer) -> np.ndarray:
+    """
+    Apply the keep/remove mask carried by a carving buffer to an energy map, see
+    `apply_mask`.
+
+    Returns:
+        np.ndarray: The energy map itself without a mask, otherwise a float64 copy
+            with the mask applied, see `MASK_ENERGY`.
+    """
+    if carved.mask is None:
+        return energy_map
+
+    if np.issubdtype(energy_map.dtype, np.unsignedinteger):
+        raise ValueError(
+            f"Masks need a signed energy map, but got: {energy_map.dtype}, use a "
+            f"float energy function"
+        )
+    energy_map = energy_map.astype(np.float64)
+    apply_mask(energy_map, carved.mask)
+    return energy_map
+
+
+def _validate_axis(axis: int):
+    if axis not in (0, 1):
+        raise ValueError(f"Expected: `axis` in (0, 1), but got: {axis}")
+
+
+class CarvingCancelled(Exception):
+    """
+    Raised by a `CarvableImage.progress_callback` to stop carving.
+    """
+
+
+class Progress(object):
+    """
+    Count the seams done for an optional progress bar and an optional callback.
+
+    Shared by the carving operations of `CarvableImage` and the video and out-of-core
+    pipelines.
+    """
+
+    def __init__(
+        self,
+        total: int,
+        show_progress: bool = False,
+        callback: Optional[Callable[[int, int], None]] = None,
+    ):
+        self.total = total
+        self.done = 0
+        self._callback = callback
+
+        self._bar = None
+        if show_progress:
+            # Imported only once progress is shown
+            from tqdm import tqdm
+
+            self._bar = tqdm(total=total, ncols=100)
+
+    def update(self, n: int = 1):
+        self.done += n
+        if self._bar is not None:
+            self._bar.update(n)
+        if self._callback is not None:
+            self._callback(self.done, self.total)
+
+    def close(self):
+        if self._bar is not None:
+            self._bar.close()
+
+    def track(self, iterable: Iterable) -> Iterator:
+        """
+        Yield the items of `iterable`, counting one seam done after each.
+        """
+        try:
+            for item in iterable:
+                yield item
+                self.update()
+        finally:
+            self.close()
+
+
+@contextmanager
+def _num_threads(num_threads: int):
+    """
+    Set the number of threads used by numba's parallel kernels in the current thread.
+    """
+    previous = numba.get_num_threads()
+    numba.set_num_threads(min(num_threads, numba.config.NUMBA_NUM_THREADS))
+    try:
+        yield
+    finally:
+        numba.set_num_threads(previous)
 
 
 class Image(object):
     @classmethod
-    def from_path(cls, path: str):
+    def from_path(cls, path: str, shape: Optional[Tuple[int, int]] = None):
+        """
+        Read an image from a file.
+
+        Uncompressed inputs are memory-mapped read-only instead of decoded: `.npy` files
+        holding a uint8 array of shape (h, w, 3), and raw BGR files (`.raw`, `.bgr`) of
+        the given `shape`. The image then wraps the mapping, see `copy` in `__init__`.
+
+        Args:
+            path (str): The path of the image.
+            shape (Tuple[int, int], optional): The (height, width) of a raw BGR file.
+
+        Returns:
+            Image: The image.
+        """
+        ext = os.path.splitext(path)[1].lower()
         try:
+            if ext == ".npy":
+                return cls(np.load(path, mmap_mode="r"), copy=False)
+            if ext in (".raw", ".bgr"):
+                if shape is None:
+                    raise ValueError("The shape of a raw image must be given.")
+                mat = np.memmap(path, dtype=np.uint8, mode="r", shape=(*shape, 3))
+                return cls(mat, copy=False)
+
             mat = cv2.imread(path)
         except Exception as e:
             raise ValueError(f"Failed to read '{path}': {e}")
 
-        return cls(mat)
+        return cls._adopt(mat)
+
+    @classmethod
+    def _adopt(cls, mat: np.ndarray) -> "Image":
+        """
+        Wrap a new array that nothing else references, without copying it.
+        """
+        image = cls.__new__(cls)
+        image._mat = mat
+        image._owned = True
+        image._validate_mat()
+        return image
 
-    def __init__(self, mat: np.ndarray):
-        self._mat = deepcopy(mat)
+    def __init__(self, mat: np.ndarray, copy: bool = True):
+        """
+        Args:
+            mat (np.ndarray): The pixels of shape (h, w, 3) and dtype uint8.
+            copy (bool): Whether to copy `mat`. Otherwise the image wraps a read-only
+                view of it, which `writable_mat` copies on first use, so the caller's
+                array is never modified.
+        """
+        self._mat = deepcopy(mat) if copy else mat
+        self._owned = copy
         self._validate_mat()
 
+        if not copy:
+            self._mat = mat.view()
+            self._mat.flags.writeable = False
+
     @property
     def mat(self) -> np.ndarray:
+        """
+        The pixels, read-only if the image wraps an array it does not own.
+        """
         return self._mat
 
     @mat.setter
     def mat(self, value: np.ndarray):
         self._mat = value
+        self._owned = True
         self._validate_mat()
 
+    def writable_mat(self) -> np.ndarray:
+        """
+        Get the pixels for writing, copying them first if the image does not own them.
+
+        Returns:
+            np.ndarray: The pixels, owned by the image from now on.
+        """
+        if not self._owned:
+            self._mat = np.array(self._mat)
+            self._owned = True
+        return self._mat
+
     @property
     def shape(self) -> tuple:
         return self.mat.shape
@@ -53,7 +291,10 @@ class Image(object):
             raise ValueError(f"Image must be of type uint8, but got: {self.mat.dtype}")
 
     def save(self, path: str):
-        cv2.imwrite(path, self.mat)
+        if os.path.splitext(path)[1].lower() == ".npy":
+            np.save(path, self.mat)
+        else:
+            cv2.imwrite(path, self.mat)
 
     def show(self, title: str = "Image", wait: bool = False):
         cv2.imshow(title, self.mat)
@@ -74,33 +315,105 @@ class CarvableImage(object):
         self,
         img: Image,
         energy_function: Optional[
-            Callable[[np.ndarray], np.ndarray]
+            Union[str, Callable[[np.ndarray], np.ndarray]]
         ] = EnergyCalculator.squared_diff,
         seam_function: Optional[
             Callable[[np.ndarray], np.ndarray]
         ] = SeamFinder.find_seam,
+        num_threads: int = 1,
+        forward_energy: bool = False,
     ):
         self._img = img
 
+        if isinstance(energy_function, str):
+            energy_function = EnergyCalculator.get(energy_function)
         self._energy_function = energy_function
         self._seam_function = seam_function
+        self._index_map: Optional[SeamIndexMap] = None
 
         self._validate_functions()
 
+        self.num_threads = num_threads
+        self.forward_energy = forward_energy
+        self.progress_callback = None
+
     def _validate_functions(self):
         # TODO: Validate the energy and seam functions
         ...
 
+    @property
+    def num_threads(self) -> int:
+        """
+        Number of threads for the built-in energy and seam kernels. With more than one
+        thread, their multi-threaded variants are used, which give identical results.
+        """
+        return self._num_threads
+
+    @num_threads.setter
+    def num_threads(self, value: int):
+        if value < 1:
+            raise ValueError(f"Expected: `num_threads` >= 1, but got: {value}")
+        self._num_threads = value
+
+    @property
+    def forward_energy(self) -> bool:
+        """
+        Whether `seam_carve` and `interactive_seam_carve` pick seams by forward energy,
+        the energy of the pixels a seam brings next to each other, instead of
+        `energy_function` and `seam_function`. Its costs are computed within the seam
+        search, so no energy map is allocated. `seam_carve_enlarge` follows it as well,
+        the approximate, pyramid and mask modes always use backward energy.
+        """
+        return self._forward_energy
+
+    @forward_energy.setter
+    def forward_energy(self, value: bool):
+        self._forward_energy = value
+
+    @property
+    def progress_callback(self) -> Optional[Callable[[int, int], None]]:
+        """
+        Called as `progress_callback(done, total)` after every seam of a carving
+        operation, or of each of its steps for `retarget`, from the thread carving.
+        Raising `CarvingCancelled` in it stops the operation, which then re-raises it.
+        """
+        return self._progress_callback
+
+    @progress_callback.setter
+    def progress_callback(self, value: Optional[Callable[[int, int], None]]):
+        self._progress_callback = value
+
+    def _progress(self, total: int, show_progress: bool = False) -> Progress:
+        return Progress(total, show_progress, self.progress_callback)
+
+    def _kernels(self) -> Tuple[Callable, Callable]:
+        """
+        Get the energy and seam functions to run with the current `num_threads`.
+        """
+        if self.num_threads == 1:
+            return self.energy_function, self.seam_function
+
+        return (
+            _PARALLEL_KERNELS.get(self.energy_function, self.energy_function),
+            _PARALLEL_KERNELS.get(self.seam_function, self.seam_function),
+        )
+
     @property
     def img(self) -> Image:
         return self._img
 
     @property
     def energy_function(self) -> Callable[[np.ndarray], np.ndarray]:
+        """
+        The energy function, which can also be set by its name in the registry of
+        `EnergyCalculator`, e.g. "sobel".
+        """
         return self._energy_function
 
     @energy_function.setter
-    def energy_function(self, value: Callable[[np.ndarray], np.ndarray]):
+    def energy_function(self, value: Union[str, Callable[[np.ndarray], np.ndarray]]):
+        if isinstance(value, str):
+            value = EnergyCalculator.get(value)
         self._energy_function = value
         self._validate_functions()
 
@@ -113,119 +426,903 @@ class CarvableImage(object):
         self._seam_function = value
         self._validate_functions()
 
+    @property
+    def index_map(self) -> Optional[SeamIndexMap]:
+        return self._index_map
+
+    @index_map.setter
+    def index_map(self, value: Optional[SeamIndexMap]):
+        if value is not None and value.shape != self.img.shape[:2]:
+            raise ValueError(
+                f"Index map of shape {value.shape} does not match: {self.img.shape}"
+            )
+        self._index_map = value
+
+    def _iter_seams(
+        self,
+        carved: CarvingBuffer,
+        num_seams: int,
+        show_progress: bool = False,
+        incremental: bool = True,
+        axis: int = 1,
+    ) -> Iterator[np.ndarray]:
+        """
+        Find and remove seams from a carving buffer one by one.
+
+        Every seam is yielded before it is removed from `carved`, so the consumer
+        still sees it in the current image.
+
+        Args:
+            carved (CarvingBuffer): The buffer to remove the seams from.
+            num_seams (int): The number of seams to remove.
+            show_progress (bool): Whether to show a progress bar.
+            incremental (bool): See `seam_carve`.
+            axis (int): 1 for vertical seams, 0 for horizontal seams.
+
+        Yields:
+            np.ndarray: The seam about to be removed, of shape (h,), or (w,) for
+                horizontal seams.
+        """
+        energy_function, seam_function = self._kernels()
+        incremental_energy = (
+            incremental and stencil_radius(energy_function) is not None
+        )
+        incremental_seams = incremental and seam_function in (
+            SeamFinder.find_seam,
+            SeamFinder.find_seam_parallel,
+        )
+
+        fused_function = (
+            None
+            if incremental or axis == 0 or carved.mask is not None
+            else _FUSED_KERNELS.get((energy_function, seam_function))
+        )
+
+        # The incremental seam finder works on the rows of the transposed energy map for
+        # horizontal seams, which also makes removing them from it a row-wise shift
+        transposed = axis == 0 and incremental_seams
+        if axis == 0 and not transposed:
+            seam_function = _horizontal_seam_function(seam_function)
+
+        def energy_buffer() -> CarvingBuffer:
+            energy_map = energy_function(carved.view)
+            energy_map = _apply_mask(energy_map, carved)
+            return CarvingBuffer(energy_map.T if transposed else energy_map, copy=False)
+
+        it = self._progress(num_seams, show_progress).track(range(num_seams))
+
+        if self.forward_energy and carved.mask is None:
+            yield from self._iter_forward_seams(carved, it, incremental, axis)
+            return
+
+        with _num_threads(self.num_threads):
+            if fused_function is not None:
+                for _ in it:
+                    seam = fused_function(carved.view)
+                    yield seam
+                    carved.remove_seam(seam)
+                return
+
+            energy_map = energy_buffer()
+            seam_finder = (
+                IncrementalSeamFinder(energy_map.view, parallel=self.num_threads > 1)
+                if incremental_seams
+                else None
+            )
+            for _ in it:
+                if seam_finder is not None:
+                    seam = seam_finder.find_seam()
+                else:
+                    seam = seam_function(energy_map.view)
+
+                yield seam
+                carved.remove_seam(seam, axis)
+
+                lo = hi = None
+                if incremental_energy:
+                    energy_map.remove_seam(seam, 1 if transposed else axis)
+                    lo, hi = update_energy(
+                        energy_function,
+                        carved.view,
+                        energy_map.view.T if transposed else energy_map.view,
+                        seam,
+                        axis=axis,
+                        mask=carved.mask,
+                    )
+                else:
+                    energy_map = energy_buffer()
+
+                if seam_finder is not None:
+                    seam_finder.remove_seam(seam, energy_map.view, lo, hi)
+
+    def _iter_forward_seams(
+        self,
+        carved: CarvingBuffer,
+        it: Iterable[int],
+        incremental: bool,
+        axis: int = 1,
+    ) -> Iterator[np.ndarray]:
+        """
+        Find and remove seams by forward energy, see `_iter_seams`.
+        """
+        with _num_threads(self.num_threads):
+            if not incremental:
+                if axis == 0:
+                    find_seam = SeamFinder.find_horizontal_seam_forward
+                elif self.num_threads > 1:
+                    find_seam = SeamFinder.find_seam_forward_parallel
+                else:
+                    find_seam = SeamFinder.find_seam_forward
+
+                for _ in it:
+                    seam = find_seam(carved.view)
+                    yield seam
+                    carved.remove_seam(seam, axis)
+                return
+
+            # Horizontal seams are vertical seams of the transposed intensity map
+            seam_finder = IncrementalSeamFinder.forward(
+                carved.view.transpose(1, 0, 2) if axis == 0 else carved.view,
+                parallel=self.num_threads > 1,
+            )
+            for _ in it:
+                seam = seam_finder.find_seam()
+                yield seam
+                carved.remove_seam(seam, axis)
+                seam_finder.remove_seam(seam)
+
+    def _iter_seam_batches(
+        self,
+        carved: CarvingBuffer,
+        num_seams: int,
+        seams_per_pass: int,
+        max_cost_ratio: float,
+        show_progress: bool = False,
+    ) -> Iterator[np.ndarray]:
+        """
+        Find and remove batches of disjoint vertical seams, one energy and seam pass each.
+
+        Every batch is yielded before it is removed from `carved`.
+
+        Args:
+            carved (CarvingBuffer): The buffer to remove the seams from.
+            num_seams (int): The total number of seams to remove.
+            seams_per_pass (int): The maximum number of seams per batch.
+            max_cost_ratio (float): See `SeamFinder.find_seams`.
+            show_progress (bool): Whether to show a progress bar.
+
+        Yields:
+            np.ndarray: The seams about to be removed, of shape (n, h).
+        """
+        energy_function, _ = self._kernels()
+        progress = self._progress(num_seams, show_progress)
+
+        remaining = num_seams
+        with _num_threads(self.num_threads):
+            while remaining > 0:
+                energy_map = energy_function(carved.view)
+                energy_map = _apply_mask(energy_map, carved)
+                seams = SeamFinder.find_seams(
+                    energy_map, min(seams_per_pass, remaining), max_cost_ratio
+                )
+
+                yield seams
+                carved.remove_seams(seams)
+
+                remaining -= len(seams)
+                progress.update(len(seams))
+
+        progress.close()
+
     def seam_carve(
         self,
         num_seams: int,
         show_progress: bool = False,
+        incremental: bool = True,
+        seams_per_pass: int = 1,
+        max_cost_ratio: float = 1.5,
+        axis: int = 1,
+        mask: Optional[np.ndarray] = None,
     ) -> "CarvableImage":
-        carved: np.ndarray = self.img.mat.copy()
+        """
+        Remove vertical seams from the image, or horizontal seams with `axis` 0.
+
+        Args:
+            num_seams (int): The number of seams to remove.
+            show_progress (bool): Whether to show a progress bar.
+            incremental (bool): Whether to carve the energy map alongside the image and
+                only recalculate the band around each removed seam. Requires an energy
+                function that declares its `stencil_radius`, otherwise the whole energy
+                map is recalculated for every seam. With the default seam function, the
+                cumulative energy map is also kept and updated between seams. Without
+                it, the default functions run as a single fused kernel per seam. With
+                `forward_energy`, the cumulative forward energy map is kept instead.
+            seams_per_pass (int): Approximate mode: with more than one, remove up to this
+                many disjoint seams found in a single energy and seam pass. Always uses
+                the default seam search, regardless of `seam_function`.
+            max_cost_ratio (float): Approximate mode: only remove seams whose energy is at
+                most this many times the cheapest seam of the pass. Lower is closer to
+                exact carving, higher removes more seams per pass.
+            axis (int): The axis to carve along: 1 removes vertical seams, reducing the
+                width, 0 removes horizontal seams, reducing the height. Horizontal seams
+                are found and removed in place, without rotating the image. The
+                approximate mode only supports vertical seams.
+            mask (np.ndarray, optional): Keep/remove mask of shape (h, w), carved
+                alongside the image. Seams avoid pixels with a positive value, whose
+                energy is raised to `MASK_ENERGY`, and go through pixels with a
+                negative value, whose energy is lowered to the negative of it.
+                Disables `forward_energy`.
+
+        Returns:
+            CarvableImage: The carved image.
+        """
+        _validate_axis(axis)
+        if seams_per_pass > 1 and axis == 0:
+            raise ValueError("The approximate mode only supports vertical seams.")
 
-        it = trange(num_seams, ncols=100) if show_progress else range(num_seams)
+        carved = CarvingBuffer(self.img.mat, mask=self._prepare_mask(mask))
 
-        for _ in it:
-            energy_map = self.energy_function(carved)
-            seam = self.seam_function(energy_map)
-            carved = carve_seam(carved, seam)
+        if seams_per_pass > 1:
+            seams = self._iter_seam_batches(
+                carved, num_seams, seams_per_pass, max_cost_ratio, show_progress
+            )
+        else:
+            seams = self._iter_seams(
+                carved, num_seams, show_progress, incremental, axis
+            )
+
+        for _ in seams:
+            pass
 
         return CarvableImage(
-            Image(carved),
+            Image._adopt(carved.to_array()),
             self.energy_function,
             self.seam_function,
+            self.num_threads,
+            self.forward_energy,
         )
-        
-        
+
+    def seam_carve_pyramid(
+        self,
+        num_seams: int,
+        scale: int = 4,
+        band: int = 8,
+        show_progress: bool = False,
+    ) -> "CarvableImage":
+        """
+        Remove vertical seams coarse-to-fine.
+
+        The cheapest seam is found on a copy of the image downscaled by `scale`, then
+        `scale` seams are refined at full resolution by a seam search restricted to a
+        band around the upscaled path. With an energy function that declares its
+        `stencil_radius`, the full-resolution energy map is only updated around the
+        removed seams. The seam search of a refined seam then runs over O(h * band)
+        cells instead of O(h * w), but removing it from the image still moves O(h * w)
+        pixels, and every `scale` seams the coarse image is resized and its energy
+        computed again.
+
+        Args:
+            num_seams (int): The number of seams to remove.
+            scale (int): The downscaling factor of the coarse image.
+            band (int): The number of columns on each side of the upscaled path that the
+                full-resolution search may use. At least `scale`.
+            show_progress (bool): Whether to show a progress bar.
+
+        Returns:
+            CarvableImage: The carved image.
+        """
+        energy_function, seam_function = self._kernels()
+        incremental_energy = stencil_radius(energy_function) is not None
+        radius = max(band, scale)
+
+        carved = CarvingBuffer(self.img.mat)
+        h = carved.shape[0]
+        rows = np.minimum(np.arange(h) // scale, max(h // scale, 1) - 1)
+
+        progress = self._progress(num_seams, show_progress)
+
+        remaining = num_seams
+        with _num_threads(self.num_threads):
+            energy_map = CarvingBuffer(energy_function(carved.view), copy=False)
+            while remaining > 0:
+                w = carved.width
+                size = (max(w // scale, 2), max(h // scale, 2))
+                coarse = cv2.resize(carved.view, size, interpolation=cv2.INTER_AREA)
+                coarse_seam = seam_function(energy_function(coarse))
+
+                # Center of the coarse pixels, in full-resolution columns
+                center = coarse_seam[rows] * w // size[0] + scale // 2
+
+                for _ in range(min(scale, remaining)):
+                    seam = SeamFinder.find_seam_banded(
+                        energy_map.view, center, radius
+                    )
+                    if len(seam) == 0:
+                        seam = seam_function(energy_map.view)
+
+                    carved.remove_seam(seam)
+                    energy_map.remove_seam(seam)
+                    if incremental_energy:
+                        update_energy(
+                            energy_function, carved.view, energy_map.view, seam
+                        )
+                    else:
+                        energy_map = CarvingBuffer(
+                            energy_function(carved.view), copy=False
+                        )
+
+                    center -= seam < center
+                    remaining -= 1
+                    progress.update()
+
+        progress.close()
+
+        return CarvableImage(
+            Image._adopt(carved.to_array()),
+            self.energy_function,
+            self.seam_function,
+            self.num_threads,
+            self.forward_energy,
+        )
+
+    def _seam_order(
+        self, num_vertical: int, num_horizontal: int, proxy_size: int
+    ) -> np.ndarray:
+        """
+        Find the order of vertical and horizontal seams on a downscaled proxy image.
+        """
+        if num_vertical == 0 or num_horizontal == 0:
+            return np.array([1] * num_vertical + [0] * num_horizontal, dtype=np.int8)
+
+        h, w, _ = self.img.shape
+        factor = min(1.0, proxy_size / max(h, w))
+        size = (max(round(w * factor), 2), max(round(h * factor), 2))
+        proxy = cv2.resize(self.img.mat, size, interpolation=cv2.INTER_AREA)
+
+        # Every seam of the full image is represented by at least one of the proxy
+        proxy_vertical = min(max(round(num_vertical * factor), 1), size[0] - 1)
+        proxy_horizontal = min(max(round(num_horizontal * factor), 1), size[1] - 1)
+
+        energy_function, seam_function = self._kernels()
+        order = seam_order(
+            proxy,
+            proxy_vertical,
+            proxy_horizontal,
+            energy_function,
+            seam_function,
+            _horizontal_seam_function(seam_function),
+        )
+
+        return scale_seam_order(order, num_vertical, num_horizontal)
+
+    def _iter_ordered_seams(
+        self,
+        carved: CarvingBuffer,
+        order: np.ndarray,
+        show_progress: bool = False,
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Find and remove seams along the axes given by `order` one by one.
+
+        The energy map is kept between seams of both axes and only recalculated around
+        the removed seams, like the incremental `_iter_seams`.
+
+        Args:
+            carved (CarvingBuffer): The buffer to remove the seams from.
+            order (np.ndarray): The axis of every seam in removal order.
+            show_progress (bool): Whether to show a progress bar.
+
+        Yields:
+            Tuple[int, np.ndarray]: The axis and the seam about to be removed.
+        """
+        energy_function, seam_function = self._kernels()
+        seam_functions = {1: seam_function, 0: _horizontal_seam_function(seam_function)}
+        forward_functions = {
+            1: SeamFinder.find_seam_forward,
+            0: SeamFinder.find_horizontal_seam_forward,
+        }
+        forward_energy = self.forward_energy and carved.mask is None
+        incremental_energy = stencil_radius(energy_function) is not None
+
+        def energy_buffer() -> CarvingBuffer:
+            energy_map = energy_function(carved.view)
+            energy_map = _apply_mask(energy_map, carved)
+            return CarvingBuffer(energy_map, copy=False)
+
+        it = self._progress(len(order), show_progress).track(order)
+
+        with _num_threads(self.num_threads):
+            energy_map = None if forward_energy else energy_buffer()
+
+            for axis in it:
+                axis = int(axis)
+                if forward_energy:
+                    seam = forward_functions[axis](carved.view)
+                else:
+                    seam = seam_functions[axis](energy_map.view)
+
+                yield axis, seam
+                carved.remove_seam(seam, axis)
+
+                if energy_map is None:
+                    continue
+
+                if incremental_energy:
+                    energy_map.remove_seam(seam, axis)
+                    update_energy(
+                        energy_function,
+                        carved.view,
+                        energy_map.view,
+                        seam,
+                        axis=axis,
+                        mask=carved.mask,
+                    )
+                else:
+                    energy_map = energy_buffer()
+
+    def retarget(
+        self,
+        width: int,
+        height: int,
+        proxy_size: int = 128,
+        show_progress: bool = False,
+        protect_faces: bool = False,
+        mask: Optional[np.ndarray] = None,
+    ) -> "CarvableImage":
+        """
+        Resize the image to a target size by removing and adding seams.
+
+        When both dimensions shrink, the order of vertical and horizontal seams with the
+        lowest total energy is found by the transport map dynamic programming on a copy
+        of the image downscaled to `proxy_size`, then the seams are removed in that
+        order at full resolution in a single carving buffer. Dimensions that grow are
+        enlarged afterwards with `seam_carve_enlarge`.
+
+        Args:
+            width (int): The target width.
+            height (int): The target height.
+            proxy_size (int): The size of the longer side of the proxy image. The
+                transport map costs O(r * c) energy and seam passes on the proxy for
+                `r` vertical and `c` horizontal proxy seams.
+            show_progress (bool): Whether to show a progress bar.
+            protect_faces (bool): Whether to avoid removing seams through detected
+                faces, see `seam_carve_with_mask`.
+            mask (np.ndarray, optional): Keep/remove mask, see `seam_carve`. It is only
+                used at full resolution, not for the seam order.
+
+        Returns:
+            CarvableImage: The retargeted image of shape (height, width, 3).
+        """
+        if width < 1 or height < 1:
+            raise ValueError(f"Expected a positive size, but got: {(width, height)}")
+
+        h, w, _ = self.img.shape
+        order = self._seam_order(max(w - width, 0), max(h - height, 0), proxy_size)
+
+        carved = CarvingBuffer(
+            self.img.mat, mask=self._prepare_mask(mask, protect_faces)
+        )
+        for _ in self._iter_ordered_seams(carved, order, show_progress):
+            pass
+
+        retargeted = CarvableImage(
+            Image._adopt(carved.to_array()),
+            self.energy_function,
+            self.seam_function,
+            self.num_threads,
+            self.forward_energy,
+        )
+        retargeted.progress_callback = self.progress_callback
+
+        # The enlarged image is not carved further, so only the seams read the mask
+        mask = carved.mask
+        if width > w:
+            retargeted = retargeted.seam_carve_enlarge(
+                width - w, show_progress, mask=mask
+            )
+            retargeted.progress_callback = self.progress_callback
+            mask = None
+        if height > h:
+            retargeted = retargeted.seam_carve_enlarge(
+                height - h, show_progress, axis=0, mask=mask
+            )
+
+        return retargeted
+
+    def precompute_index_map(
+        self,
+        num_seams: int,
+        show_progress: bool = False,
+        incremental: bool = True,
+    ) -> SeamIndexMap:
+        """
+        Record the removal order of the first `num_seams` vertical seams.
+
+        Afterwards, `resize_width` produces any width down to `w - num_seams` without
+        any energy or seam calculation. The index map can be persisted with
+        `SeamIndexMap.save` and restored through the `index_map` property.
+
+        Args:
+            num_seams (int): The maximum number of seams to remove later on.
+            show_progress (bool): Whether to show a progress bar.
+            incremental (bool): See `seam_carve`.
+
+        Returns:
+            SeamIndexMap: The index map, also stored in `index_map`.
+        """
+        index_map = self._record_index_map(num_seams, show_progress, incremental)
+
+        self._index_map = index_map
+        return index_map
+
+    def _record_index_map(
+        self,
+        num_seams: int,
+        show_progress: bool = False,
+        incremental: bool = True,
+        axis: int = 1,
+        mask: Optional[np.ndarray] = None,
+    ) -> SeamIndexMap:
+        """
+        Find the first `num_seams` seams along `axis` and record them in an index map.
+        """
+        h, w, _ = self.img.shape
+        index_map = SeamIndexMap.empty(h, w, num_seams, axis)
+
+        carved = CarvingBuffer(self.img.mat, mask=self._prepare_mask(mask))
+        positions = CarvingBuffer(np.indices((h, w), dtype=np.int32)[axis])
+
+        seams = self._iter_seams(carved, num_seams, show_progress, incremental, axis)
+        for index, seam in enumerate(seams):
+            index_map.record_seam(positions.view, seam, index)
+            positions.remove_seam(seam, axis)
+
+        return index_map
+
+    def resize_width(self, width: int) -> "CarvableImage":
+        """
+        Carve the image to a width using the precomputed index map.
+
+        Args:
+            width (int): The target width, at least `w - index_map.num_seams`.
+
+        Returns:
+            CarvableImage: The carved image.
+        """
+        if self._index_map is None or self._index_map.axis != 1:
+            raise ValueError("No index map, call `precompute_index_map` first.")
+
+        carved = self._index_map.carve(self.img.mat, self.img.shape[1] - width)
+
+        return CarvableImage(
+            Image._adopt(carved),
+            self.energy_function,
+            self.seam_function,
+            self.num_threads,
+            self.forward_energy,
+        )
+
     def _detect_faces(self, image, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)):
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=scaleFactor, minNeighbors=minNeighbors, minSize=minSize)
+        faces = _face_classifier().detectMultiScale(gray, scaleFactor=scaleFactor, minNeighbors=minNeighbors, minSize=minSize)
         return faces
 
+    def face_mask(self) -> np.ndarray:
+        """
+        Detect the faces of the image and mark them as kept in a keep/remove mask.
+
+        The mask can be passed as `mask` to several carves of the image, e.g. `retarget`
+        to several sizes, so that the faces are only detected once.
+
+        Returns:
+            np.ndarray: The int8 mask of shape (h, w), 1 for the pixels of faces.
+        """
+        return self._face_mask(self.img.mat)
 
-    def _protect_faces_in_energy_map(self, energy, faces):
-        for x, y, w, h in faces:
-            energy[y : y + h, x : x + w] = np.max(energy) * 10
-        return energy
+    def _face_mask(self, image: np.ndarray) -> np.ndarray:
+        """
+        Detect the faces of an image once and mark them as kept in a mask.
+        """
+        mask = np.zeros(image.shape[:2], dtype=np.int8)
+        for x, y, w, h in self._detect_faces(image):
+            mask[y : y + h, x : x + w] = 1
+        return mask
+
+    def _prepare_mask(
+        self, mask: Optional[np.ndarray], protect_faces: bool = False
+    ) -> Optional[np.ndarray]:
+        """
+        Validate a keep/remove mask and add the detected faces as kept pixels.
+        """
+        if mask is not None:
+            if mask.shape != self.img.shape[:2]:
+                raise ValueError(
+                    f"Mask of shape {mask.shape} does not match: {self.img.shape}"
+                )
+            mask = np.sign(mask).astype(np.int8)
+
+        if protect_faces:
+            faces = self._face_mask(self.img.mat)
+            mask = faces if mask is None else np.where(mask == 0, faces, mask)
+
+        return mask
 
-        
     def seam_carve_with_mask(
         self,
         num_seams: int,
         show_progress: bool = False,
+        axis: int = 1,
+        incremental: bool = True,
+    ) -> "CarvableImage":
+        """
+        Remove seams from the image while avoiding faces.
+
+        The faces are detected once on the original image. Their mask is carved
+        alongside the image by the same seams, so it stays aligned without detecting
+        the faces again.
+
+        Args:
+            num_seams (int): The number of seams to remove.
+            show_progress (bool): Whether to show a progress bar.
+            axis (int): 1 for vertical seams, 0 for horizontal seams.
+            incremental (bool): See `seam_carve`.
+
+        Returns:
+            CarvableImage: The carved image.
+        """
+        return self.seam_carve(
+            num_seams,
+            show_progress,
+            incremental,
+            axis=axis,
+            mask=self._prepare_mask(None, protect_faces=True),
+        )
+
+    def remove_object(
+        self,
+        mask: np.ndarray,
+        show_progress: bool = False,
+        axis: Optional[int] = None,
     ) -> "CarvableImage":
-        carved: np.ndarray = self.img.mat.copy()
+        """
+        Remove seams until no pixel marked for removal is left.
+
+        Raises a ValueError if marked pixels are still left when the image is down to a
+        single column, or a single row for horizontal seams.
 
-        it = trange(num_seams, ncols=100) if show_progress else range(num_seams)
+        Args:
+            mask (np.ndarray): Keep/remove mask of shape (h, w), see `seam_carve`, with
+                at least one negative pixel.
+            show_progress (bool): Whether to show a progress bar.
+            axis (int, optional): 1 for vertical seams, 0 for horizontal seams. By
+                default the direction needing fewer seams, the widest row or the
+                tallest column of the removed region.
 
-        for _ in it:
-            mask = self._detect_faces(carved)
-            energy_map = self.energy_function(carved)
-            energy_map = self._protect_faces_in_energy_map(energy_map, mask)
-            seam = self.seam_function(energy_map)
-            carved = carve_seam(carved, seam)
+        Returns:
+            CarvableImage: The carved image.
+        """
+        mask = self._prepare_mask(mask)
+        removed = mask < 0
+        remaining = int(np.count_nonzero(removed))
+        if remaining == 0:
+            raise ValueError("The mask does not mark any pixel for removal.")
+
+        if axis is None:
+            vertical = removed.sum(axis=1).max()
+            horizontal = removed.sum(axis=0).max()
+            axis = 1 if vertical <= horizontal else 0
+        _validate_axis(axis)
+
+        carved = CarvingBuffer(self.img.mat, mask=mask)
+        max_seams = carved.shape[axis] - 1
+        seams = self._iter_seams(carved, max_seams, show_progress, axis=axis)
+        for seam in seams:
+            if axis == 1:
+                on_seam = carved.mask[np.arange(len(seam)), seam]
+            else:
+                on_seam = carved.mask[seam, np.arange(len(seam))]
+            remaining -= int(np.count_nonzero(on_seam < 0))
+            if remaining == 0:
+                # Seams are removed after they are yielded, stopping skips the last one
+                carved.remove_seam(seam, axis)
+                break
+
+        if remaining > 0:
+            raise ValueError(
+                f"{remaining} pixels marked for removal are left after removing "
+                f"{max_seams} {'vertical' if axis == 1 else 'horizontal'} seams"
+            )
 
         return CarvableImage(
-            Image(carved),
+            Image._adopt(carved.to_array()),
             self.energy_function,
             self.seam_function,
+            self.num_threads,
+            self.forward_energy,
         )
-        
-    
 
     def seam_carve_enlarge(
         self,
         num_seams: int,
         show_progress: bool = False,
+        axis: int = 1,
+        mask: Optional[np.ndarray] = None,
     ) -> "CarvableImage":
-        enlarged: np.ndarray = self.img.mat.copy()
-        carved: np.ndarray = self.img.mat.copy()
+        """
+        Add vertical seams to the image, or horizontal seams with `axis` 0.
+
+        The first `num_seams` seams that `seam_carve` would remove are duplicated, all
+        at once in the original image. An `index_map` with at least `num_seams` seams
+        is reused without a mask, otherwise the seams are found first.
+
+        Args:
+            num_seams (int): The number of seams to add.
+            show_progress (bool): Whether to show a progress bar.
+            axis (int): 1 adds vertical seams, increasing the width, 0 adds horizontal
+                seams, increasing the height.
+            mask (np.ndarray, optional): Keep/remove mask, see `seam_carve`. Kept pixels
+                are not duplicated, removed pixels are duplicated first.
+
+        Returns:
+            CarvableImage: The enlarged image.
+        """
+        _validate_axis(axis)
+
+        index_map = self._index_map
+        if (
+            index_map is None
+            or index_map.axis != axis
+            or index_map.num_seams < num_seams
+            or mask is not None
+        ):
+            index_map = self._record_index_map(
+                num_seams, show_progress, axis=axis, mask=mask
+            )
+
+        enlarged = index_map.enlarge(self.img.mat, num_seams)
+
+        return CarvableImage(
+            Image._adopt(enlarged),
+            self.energy_function,
+            self.seam_function,
+            self.num_threads,
+            self.forward_energy,
+        )
 
-        it = trange(num_seams, ncols=100) if show_progress else range(num_seams)
+    def iter_seams(
+        self,
+        num_seams: int,
+        show_progress: bool = False,
+        incremental: bool = True,
+        axis: int = 1,
+    ) -> Generator[Tuple[np.ndarray, np.ndarray], None, "CarvableImage"]:
+        """
+        Remove seams one by one, yielding every seam with the image it is removed from.
 
-        seams_to_insert = []
-        for _ in it:
-            energy_map = self.energy_function(carved)
-            seam = self.seam_function(energy_map)
-            carved = carve_seam(carved, seam)
+        The image is a view of the carving buffer that changes once the next seam is
+        requested, copy it to keep it. The carved image is the return value of the
+        generator, e.g. `carved = yield from carvable.iter_seams(n)`.
 
-            adjusted_seams = []
-            for s in seams_to_insert:
-                adjusted_seam = s.copy()
-                for i in range(len(seam)):
-                    if adjusted_seam[i] + 1 >= seam[i]:
-                        adjusted_seam[i] += 1
-                adjusted_seams.append(adjusted_seam)
+        Args:
+            num_seams (int): The number of seams to remove.
+            show_progress (bool): Whether to show a progress bar.
+            incremental (bool): See `seam_carve`.
+            axis (int): 1 for vertical seams, 0 for horizontal seams.
 
-            adjusted_seams.append(seam)
-            seams_to_insert = adjusted_seams.copy()
+        Yields:
+            Tuple[np.ndarray, np.ndarray]: The current image and the seam about to be
+                removed from it.
+        """
+        _validate_axis(axis)
 
-        for seam in reversed(seams_to_insert):
-            enlarged = carve_seam_enlarge(enlarged, seam)
+        carved = CarvingBuffer(self.img.mat)
+        for seam in self._iter_seams(
+            carved, num_seams, show_progress, incremental, axis
+        ):
+            yield carved.view, seam
 
         return CarvableImage(
-            Image(enlarged),
+            Image._adopt(carved.to_array()),
             self.energy_function,
             self.seam_function,
+            self.num_threads,
+            self.forward_energy,
         )
 
     def interactive_seam_carve(
         self,
         num_seams: int,
         title: str = "Interactive Seam Carving",
+        max_fps: float = 30.0,
+        render: Optional[Callable[[np.ndarray], None]] = None,
+        axis: int = 1,
     ) -> "CarvableImage":
-        carved: np.ndarray = self.img.mat.copy()
+        """
+        Remove seams while showing every seam on the image, at a capped frame rate.
+
+        Seams found before the next frame is due are removed without being drawn, so
+        rendering only slows down carving by at most `max_fps` frames per second. The
+        first and the last seam are always drawn. All frames are drawn into one buffer.
 
-        for _ in range(num_seams):
-            energy_map = self.energy_function(carved)
-            seam = self.seam_function(energy_map)
-            seam_img = draw_seam(carved, seam)
-            cv2.imshow(title, seam_img)
-            cv2.waitKey(10)
-            carved = carve_seam(carved, seam)
+        Args:
+            num_seams (int): The number of seams to remove.
+            title (str): The title of the OpenCV window of the default `render`.
+            max_fps (float): The maximum number of frames per second.
+            render (Callable, optional): Called with every frame, the current image with
+                the seam about to be removed in red. The frame is overwritten by the
+                next one, copy it to keep it. Shown in an OpenCV window by default.
+            axis (int): 1 for vertical seams, 0 for horizontal seams.
 
-        cv2.destroyWindow(title)
+        Returns:
+            CarvableImage: The carved image.
+        """
+        _validate_axis(axis)
+        if max_fps <= 0:
+            raise ValueError(f"Expected: `max_fps` > 0, but got: {max_fps}")
+
+        show = render is None
+        if show:
+
+            def render(frame: np.ndarray):
+                cv2.imshow(title, frame)
+                cv2.waitKey(1)
+
+        frame_buffer = np.empty_like(self.img.mat)
+        interval = 1.0 / max_fps
+        last_frame = None
+
+        carved = CarvingBuffer(self.img.mat)
+        for i, seam in enumerate(self._iter_seams(carved, num_seams, axis=axis)):
+            now = time.perf_counter()
+            skip = last_frame is not None and now - last_frame < interval
+            if skip and i < num_seams - 1:
+                continue
+            last_frame = now
+
+            image = carved.view
+            h, w, _ = image.shape
+            render(draw_seam(image, seam, out=frame_buffer[:h, :w], axis=axis))
+
+        if show:
+            cv2.destroyWindow(title)
 
         return CarvableImage(
-            Image(carved),
+            Image._adopt(carved.to_array()),
             self.energy_function,
             self.seam_function,
+            self.num_threads,
+            self.forward_energy,
         )
+
+
+def warmup(threaded: bool = False) -> Optional[threading.Thread]:
+    """
+    Compile the numba kernels of the default pipeline ahead of the first carve.
+
+    The kernels are cached on disk, so only the first process after a change compiles
+    them and later ones just load them. The per-seam kernels are compiled for their
+    explicit signatures: the energy, its band update by `update_energy`, the seam
+    searches, including the fused one of non-incremental carves, and the in-place
+    removal of `CarvingBuffer`. The rest is compiled by carving a tiny image along both
+    axes, incrementally and not.
+
+    Args:
+        threaded (bool): Whether to warm up in a daemon thread instead of blocking.
+
+    Returns:
+        Optional[threading.Thread]: The started thread if `threaded`, else None.
+    """
+    if threaded:
+        thread = threading.Thread(target=warmup, name="numba-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    for kernel, signatures in _HOT_SIGNATURES:
+        for signature in signatures:
+            kernel.compile(signature)
+
+    carvable = CarvableImage(Image(np.zeros((8, 8, 3), dtype=np.uint8)))
+    for incremental in (True, False):
+        carvable.seam_carve(2, incremental=incremental, axis=0)
+        carvable.seam_carve(2, incremental=incremental)
+    return None
@@ -0,0 +1,150 @@
+import os
+import tempfile
+from typing import Callable, Optional, Union
+
+import numba
+import numpy as np
+
+from src.algorithms.carving import CarvingBuffer
+from src.algorithms.energy import EnergyCalculator, stencil_radius, update_energy
+from src.algorithms.seam import accumulate_row, backtrack_seam
+from src.lib import Progress
+
+
+@numba.njit(cache=True)
+def _find_seam_streaming(energy_map: np.ndarray, backtrack: np.ndarray) -> np.ndarray:
+    """
+    `SeamFinder.find_seam` with the backpointers written to a given buffer.
+
+    The energy map is swept once from top to bottom, keeping two cumulative rows, so a
+    memory-mapped energy map and backpointer buffer are read and written in order.
+    """
+    h, w = energy_map.shape
+
+    previous = energy_map[0].copy()
+    current = np.empty_like(previous)
+    for y in range(1, h):
+        accumulate_row(energy_map[y], previous, current, backtrack[y])
+        previous, current = current, previous
+
+    return backtrack_seam(previous, backtrack)
+
+
+def _energy_in_strips(
+    energy_function: Callable[[np.ndarray], np.ndarray],
+    mat: np.ndarray,
+    energy_map: np.ndarray,
+    radius: int,
+    strip_height: int,
+):
+    """
+    Calculate an energy map strip by strip, each with `radius` rows of context.
+    """
+    h = mat.shape[0]
+    for y0 in range(0, h, strip_height):
+        y1 = min(y0 + strip_height, h)
+        top, bottom = max(y0 - radius, 0), min(y1 + radius, h)
+        strip = energy_function(np.ascontiguousarray(mat[top:bottom]))
+        energy_map[y0:y1] = strip[y0 - top : y1 - top]
+
+
+def _copy_in_strips(source: np.ndarray, target: np.ndarray, strip_height: int):
+    for y0 in range(0, source.shape[0], strip_height):
+        target[y0 : y0 + strip_height] = source[y0 : y0 + strip_height]
+
+
+def seam_carve_out_of_core(
+    image: Union[str, np.ndarray],
+    output_path: str,
+    num_seams: int,
+    energy_function: Callable[
+        [np.ndarray], np.ndarray
+    ] = EnergyCalculator.squared_diff,
+    work_dir: Optional[str] = None,
+    strip_height: int = 256,
+    show_progress: bool = False,
+) -> np.memmap:
+    """
+    Remove vertical seams from an image that is too large to hold in memory.
+
+    The pixels, the energy map and the seam backpointers live in memory-mapped files
+    in `work_dir`. Every seam is found by one top-to-bottom sweep over the energy map
+    that keeps only two cumulative rows in memory, then removed by shifting the rows of
+    the pixels and the energy map in place, and the energy map is only recalculated
+    around the seam. Every pass touches the files in row order, so the operating system
+    can page them in and out as needed, and the memory used besides the page cache is
+    O(w) per seam plus one strip of `strip_height` rows for the initial energy map.
+
+    Args:
+        image (Union[str, np.ndarray]): The image of shape (h, w, 3) and dtype uint8, or
+            the path of a `.npy` file holding it, which is memory-mapped read-only.
+        output_path (str): The path of the `.npy` file to write the carved image to.
+        num_seams (int): The number of seams to remove.
+        energy_function (Callable): The energy function, which must declare a stencil
+            radius, see `stencil_radius`.
+        work_dir (str, optional): The directory of the temporary files, about six
+            bytes per pixel, by default the system temporary directory.
+        strip_height (int): The number of rows copied or calculated at once.
+        show_progress (bool): Whether to show a progress bar.
+
+    Returns:
+        np.memmap: The carved image of shape (h, w - num_seams, 3), memory-mapped from
+            `output_path`.
+    """
+    if isinstance(image, str):
+        image = np.load(image, mmap_mode="r")
+
+    if len(image.shape) != 3 or image.dtype != np.uint8:
+        raise ValueError(
+            f"Image must be of shape (H, W, 3) and type uint8, but got: "
+            f"{image.shape} and {image.dtype}"
+        )
+
+    h, w, _ = image.shape
+    if not 0 <= num_seams < w:
+        raise ValueError(f"Expected: 0 <= `num_seams` < {w}, but got: {num_seams}")
+
+    radius = stencil_radius(energy_function)
+    if radius is None:
+        raise ValueError("The energy function does not declare a `stencil_radius`.")
+
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        pixels = np.lib.format.open_memmap(
+            os.path.join(tmp, "pixels.npy"), mode="w+", dtype=np.uint8, shape=(h, w, 3)
+        )
+        _copy_in_strips(image, pixels, strip_height)
+
+        energy = np.lib.format.open_memmap(
+            os.path.join(tmp, "energy.npy"), mode="w+", dtype=np.float32, shape=(h, w)
+        )
+        _energy_in_strips(energy_function, pixels, energy, radius, strip_height)
+
+        backtrack = np.lib.format.open_memmap(
+            os.path.join(tmp, "backtrack.npy"), mode="w+", dtype=np.int8, shape=(h, w)
+        )
+
+        # Carved in place in the files
+        carved = CarvingBuffer(pixels, copy=False)
+        energy_map = CarvingBuffer(energy, copy=False)
+
+        progress = Progress(num_seams, show_progress)
+        for _ in range(num_seams):
+            seam = _find_seam_streaming(
+                energy_map.view, np.asarray(backtrack)[:, : carved.width]
+            )
+
+            carved.remove_seam(seam)
+            energy_map.remove_seam(seam)
+            update_energy(energy_function, carved.view, energy_map.view, seam)
+            progress.update()
+        progress.close()
+
+        output = np.lib.format.open_memmap(
+            output_path, mode="w+", dtype=np.uint8, shape=(h, w - num_seams, 3)
+        )
+        _copy_in_strips(carved.view, output, strip_height)
+        output.flush()
+
+        del carved, energy_map, pixels, energy, backtrack
+
+    return output
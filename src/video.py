@@ -0,0 +1,212 @@
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.algorithms.carving import CarvingBuffer
+from src.algorithms.energy import EnergyCalculator, stencil_radius, update_energy
+from src.algorithms.seam import SeamFinder
+from src.lib import CarvableImage, Image, Progress
+
+
+class VideoRetargeter(object):
+    """
+    Remove the same number of vertical seams from every frame of a video.
+
+    The seams of a frame are searched in a band around the seams of the previous frame,
+    so consecutive frames lose nearly the same pixels instead of jittering, and a seam
+    costs O(h * band) instead of a full O(h * w) search. Every `keyframe_interval`
+    frames the seams are searched in the whole frame again, to follow larger changes.
+    """
+
+    def __init__(
+        self,
+        num_seams: int,
+        energy_function: Callable[
+            [np.ndarray], np.ndarray
+        ] = EnergyCalculator.squared_diff,
+        seam_function: Callable[[np.ndarray], np.ndarray] = SeamFinder.find_seam,
+        band: int = 8,
+        keyframe_interval: int = 30,
+    ):
+        """
+        Args:
+            num_seams (int): The number of seams to remove from every frame.
+            energy_function (Callable): The energy function.
+            seam_function (Callable): The seam function of keyframes, and of the
+                frames whose banded search fails.
+            band (int): The number of columns on each side of a previous seam that the
+                search for the next one may use, in every row.
+            keyframe_interval (int): The number of frames between full seam searches,
+                or 0 to only search the first frame fully.
+        """
+        if num_seams < 0 or band < 1 or keyframe_interval < 0:
+            raise ValueError(
+                "Expected: `num_seams` >= 0, `band` >= 1 and `keyframe_interval` "
+                f">= 0, but got: {num_seams}, {band} and {keyframe_interval}"
+            )
+
+        self.num_seams = num_seams
+        self.energy_function = energy_function
+        self.seam_function = seam_function
+        self.band = band
+        self.keyframe_interval = keyframe_interval
+
+        self._seams: Optional[List[np.ndarray]] = None
+        self._num_frames = 0
+        # The (h, w) of the first frame, which every later frame must have
+        self._shape: Optional[Tuple[int, int]] = None
+
+    def reset(self):
+        """
+        Search the seams of the next frame in the whole frame, e.g. after a scene cut.
+        """
+        self._seams = None
+
+    def retarget_frame(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Remove the seams from the next frame.
+
+        Args:
+            frame (np.ndarray): The frame of shape (h, w, 3), the same for every frame.
+
+        Returns:
+            np.ndarray: The retargeted frame of shape (h, w - num_seams, 3), a copy of
+                the frame without seams to remove.
+        """
+        if self._shape is None:
+            self._shape = frame.shape[:2]
+        elif frame.shape[:2] != self._shape:
+            raise ValueError(
+                f"Frame of shape {frame.shape} does not match the previous frames of "
+                f"shape {self._shape}"
+            )
+
+        keyframe = self._seams is None or (
+            self.keyframe_interval > 0
+            and self._num_frames % self.keyframe_interval == 0
+        )
+        self._num_frames += 1
+
+        if self.num_seams == 0:
+            return frame.copy()
+        if keyframe:
+            retargeted, self._seams = self._carve_keyframe(frame)
+        else:
+            retargeted, self._seams = self._carve_banded(frame)
+
+        return retargeted
+
+    def _carve_keyframe(self, frame: np.ndarray) -> Tuple[np.ndarray, List[np.ndarray]]:
+        """
+        Remove the cheapest seams of the whole frame, with the incremental seam search.
+        """
+        carvable = CarvableImage(
+            Image(frame, copy=False), self.energy_function, self.seam_function
+        )
+        seams = []
+        it = carvable.iter_seams(self.num_seams)
+        while True:
+            try:
+                _, seam = next(it)
+            except StopIteration as stop:
+                return stop.value.img.mat, seams
+            seams.append(seam.copy())
+
+    def _carve_banded(self, frame: np.ndarray) -> Tuple[np.ndarray, List[np.ndarray]]:
+        """
+        Remove the cheapest seams within the bands around the seams of the last frame.
+        """
+        incremental_energy = stencil_radius(self.energy_function) is not None
+
+        carved = CarvingBuffer(frame)
+        energy_map = CarvingBuffer(self.energy_function(carved.view), copy=False)
+
+        # The k-th seams of both frames are found after the same number of removals, so
+        # they are in the same coordinates
+        seams = []
+        for center in self._seams:
+            seam = SeamFinder.find_seam_banded(energy_map.view, center, self.band)
+            if len(seam) == 0:
+                seam = self.seam_function(energy_map.view)
+
+            carved.remove_seam(seam)
+            energy_map.remove_seam(seam)
+            if incremental_energy:
+                update_energy(self.energy_function, carved.view, energy_map.view, seam)
+            else:
+                energy_map = CarvingBuffer(
+                    self.energy_function(carved.view), copy=False
+                )
+            seams.append(seam)
+
+        return carved.to_array(), seams
+
+
+def retarget_video(
+    input_path: str,
+    output_path: str,
+    width: int,
+    band: int = 8,
+    keyframe_interval: int = 30,
+    fourcc: str = "mp4v",
+    show_progress: bool = False,
+) -> int:
+    """
+    Reduce the width of a video by seam carving, frame by frame.
+
+    Frames are read, retargeted with a `VideoRetargeter` and written one at a time, so
+    only the current frame is held in memory.
+
+    Args:
+        input_path (str): The path of the video to read with `cv2.VideoCapture`.
+        output_path (str): The path of the video to write with `cv2.VideoWriter`.
+        width (int): The target width, at most the width of the video.
+        band (int): See `VideoRetargeter`.
+        keyframe_interval (int): See `VideoRetargeter`.
+        fourcc (str): The four character code of the output codec.
+        show_progress (bool): Whether to show a progress bar.
+
+    Returns:
+        int: The number of frames written.
+    """
+    capture = cv2.VideoCapture(input_path)
+    if not capture.isOpened():
+        raise ValueError(f"Failed to open '{input_path}'")
+
+    frame_width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    frame_height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if not 0 < width <= frame_width:
+        capture.release()
+        raise ValueError(f"Expected: 0 < `width` <= {frame_width}, but got: {width}")
+
+    retargeter = VideoRetargeter(
+        frame_width - width, band=band, keyframe_interval=keyframe_interval
+    )
+
+    writer = cv2.VideoWriter(
+        output_path,
+        cv2.VideoWriter_fourcc(*fourcc),
+        capture.get(cv2.CAP_PROP_FPS) or 30.0,
+        (width, frame_height),
+    )
+    progress = Progress(
+        max(int(capture.get(cv2.CAP_PROP_FRAME_COUNT)), 0), show_progress
+    )
+
+    num_frames = 0
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+
+            writer.write(retargeter.retarget_frame(frame))
+            num_frames += 1
+            progress.update()
+    finally:
+        progress.close()
+        capture.release()
+        writer.release()
+
+    return num_frames
@@ -0,0 +1,21 @@
+import cv2
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="session")
+def castle_small() -> np.ndarray:
+    mat = cv2.imread("images/castle_small.png")
+    assert mat is not None, "Failed to read images/castle_small.png"
+    mat.setflags(write=False)
+    return mat
+
+
+@pytest.fixture(scope="session")
+def small_image(castle_small) -> np.ndarray:
+    """
+    A crop of castle_small small enough to carve down to a few pixels quickly.
+    """
+    mat = np.ascontiguousarray(castle_small[100:160, 200:280])
+    mat.setflags(write=False)
+    return mat
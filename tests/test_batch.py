@@ -0,0 +1,151 @@
+import argparse
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+from src.batch import (
+    aspect_ratio_size,
+    find_images,
+    main,
+    output_stems,
+    parse_size,
+    process_image,
+)
+from src.lib import CarvableImage
+
+
+def test_parse_size():
+    assert parse_size("640x480") == (640, 480)
+
+    for value in ("640", "640x0", "axb"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_size(value)
+
+
+def test_aspect_ratio_size_never_enlarges():
+    assert aspect_ratio_size(800, 600, (1, 1)) == (600, 600)
+    assert aspect_ratio_size(800, 600, (16, 9)) == (800, 450)
+
+
+def test_batch_writes_outputs_and_records_failures(small_image, tmp_path):
+    cv2.imwrite(str(tmp_path / "good.png"), small_image)
+    (tmp_path / "broken.png").write_bytes(b"not an image")
+    (tmp_path / "notes.txt").write_text("skipped")
+    output_dir = tmp_path / "out"
+
+    status = main(
+        [
+            str(tmp_path),
+            "--size",
+            "60x50",
+            "--aspect",
+            "1:1",
+            "--output-dir",
+            str(output_dir),
+            "--workers",
+            "1",
+            "--no-protect-faces",
+        ]
+    )
+
+    assert status == 1
+    manifest = json.loads((output_dir / "manifest.json").read_text())
+    assert manifest["num_images"] == 2 and manifest["num_failed"] == 1
+
+    # The entries are in the order of the sorted paths
+    broken, good = manifest["images"]
+    assert broken["input"].endswith("broken.png") and "error" in broken
+    assert good["size"] == [80, 60]
+    assert [o["target"] for o in good["outputs"]] == ["60x50", "1-1"]
+    for output, shape in zip(good["outputs"], [(50, 60, 3), (60, 60, 3)]):
+        assert "error" not in output
+        assert cv2.imread(output["output"]).shape == shape
+
+
+def test_find_images_filters_by_extension(tmp_path):
+    for name in ("a.png", "b.JPG", "c.txt"):
+        (tmp_path / name).write_bytes(b"")
+
+    assert find_images([str(tmp_path)]) == [
+        str(tmp_path / "a.png"),
+        str(tmp_path / "b.JPG"),
+    ]
+
+
+def test_faces_are_detected_once_per_image(small_image, tmp_path, monkeypatch):
+    calls = []
+
+    def detect_faces(self, image):
+        calls.append(image.shape)
+        return [(10, 10, 20, 20)]
+
+    monkeypatch.setattr(CarvableImage, "_detect_faces", detect_faces)
+    path = str(tmp_path / "image.png")
+    cv2.imwrite(path, small_image)
+
+    entry = process_image(
+        path, [(60, 50), (70, 40)], [(1, 1)], str(tmp_path), "{stem}_{target}{ext}"
+    )
+
+    assert calls == [small_image.shape]
+    assert len(entry["outputs"]) == 3
+    assert not any("error" in output for output in entry["outputs"])
+
+
+def test_output_stems_tell_apart_images_sharing_a_name(tmp_path):
+    paths = [
+        str(tmp_path / "a" / "photo.png"),
+        str(tmp_path / "b" / "c" / "photo.jpg"),
+        str(tmp_path / "b" / "other.png"),
+    ]
+
+    assert output_stems(paths) == {
+        paths[0]: "a/photo",
+        paths[1]: "b/c/photo",
+        paths[2]: "other",
+    }
+
+
+def run_batch(tmp_path, name: str):
+    for directory in ("a", "b"):
+        (tmp_path / directory).mkdir()
+    image = np.zeros((30, 40, 3), dtype=np.uint8)
+    cv2.imwrite(str(tmp_path / "a" / "photo.png"), image)
+    cv2.imwrite(str(tmp_path / "b" / "photo.png"), image + 255)
+    output_dir = tmp_path / "out"
+
+    status = main(
+        [
+            str(tmp_path / "a"),
+            str(tmp_path / "b"),
+            "--size",
+            "30x30",
+            "--output-dir",
+            str(output_dir),
+            "--name",
+            name,
+            "--workers",
+            "1",
+            "--no-protect-faces",
+        ]
+    )
+    return status, json.loads((output_dir / "manifest.json").read_text())
+
+
+def test_batch_keeps_outputs_of_images_sharing_a_name(tmp_path):
+    status, manifest = run_batch(tmp_path, "{stem}_{target}{ext}")
+
+    assert status == 0 and manifest["num_failed"] == 0
+    for directory, value in (("a", 0), ("b", 255)):
+        output = cv2.imread(str(tmp_path / "out" / directory / "photo_30x30.png"))
+        assert output.shape == (30, 30, 3) and (output == value).all()
+
+
+def test_batch_fails_outputs_saved_to_the_same_file(tmp_path):
+    status, manifest = run_batch(tmp_path, "{target}{ext}")
+
+    assert status == 1 and manifest["num_failed"] == 2
+    for entry in manifest["images"]:
+        assert "2 outputs are saved to" in entry["outputs"][0]["error"]
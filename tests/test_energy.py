@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from src.algorithms.energy import EnergyCalculator
+from src.lib import CarvableImage, Image
+
+
+@pytest.fixture(scope="module")
+def crop(castle_small) -> np.ndarray:
+    return np.ascontiguousarray(castle_small[:200, :300])
+
+
+@pytest.mark.parametrize("name", EnergyCalculator.names())
+def test_energy_writes_to_out(crop, name):
+    energy_function = EnergyCalculator.get(name)
+    energy_map = energy_function(crop)
+    assert energy_map.shape == crop.shape[:2] and energy_map.dtype == np.float32
+
+    if name != "squared_diff":
+        out = np.full(crop.shape[:2], np.nan, dtype=np.float32)
+        assert energy_function(crop, out) is out
+        np.testing.assert_array_equal(out, energy_map)
+
+
+@pytest.mark.parametrize("axis", [0, 1])
+@pytest.mark.parametrize("name", EnergyCalculator.names())
+def test_incremental_energy_matches_full_recalculation(crop, name, axis):
+    carvable = CarvableImage(Image(crop), name)
+
+    np.testing.assert_array_equal(
+        carvable.seam_carve(60, axis=axis).img.mat,
+        carvable.seam_carve(60, axis=axis, incremental=False).img.mat,
+    )
+
+
+def test_unknown_energy_name():
+    with pytest.raises(ValueError, match="energy function"):
+        EnergyCalculator.get("unknown")
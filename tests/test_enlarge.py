@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from src.algorithms.carving import CarvingBuffer, carve_seam_enlarge, insert_seams
+from src.lib import CarvableImage, Image
+
+
+def sequential_enlarge(mat: np.ndarray, num_seams: int) -> np.ndarray:
+    """
+    Duplicate the seams that `seam_carve` removes one by one with `carve_seam_enlarge`.
+    """
+    h, w, _ = mat.shape
+    rows = np.arange(h)
+
+    # Track the original column of every pixel through the removals
+    columns = CarvingBuffer(np.tile(np.arange(w, dtype=np.int32), (h, 1)))
+    seams = []
+    for _, seam in CarvableImage(Image(mat)).iter_seams(num_seams):
+        seams.append(columns.view[rows, seam])
+        columns.remove_seam(seam)
+
+    # Left to right in every row, so the k pixels added before are all to the left and
+    # the right neighbour of a duplicated pixel is still an original one
+    enlarged = mat
+    for k, seam in enumerate(np.sort(seams, axis=0)):
+        enlarged = carve_seam_enlarge(enlarged, seam + k)
+    return enlarged
+
+
+@pytest.mark.parametrize("num_seams", [1, 15, 40])
+def test_enlarge_matches_sequential_insertion(small_image, num_seams):
+    enlarged = CarvableImage(Image(small_image)).seam_carve_enlarge(num_seams)
+
+    np.testing.assert_array_equal(
+        enlarged.img.mat, sequential_enlarge(small_image, num_seams)
+    )
+
+
+def test_horizontal_enlarge_matches_sequential_insertion(small_image):
+    enlarged = CarvableImage(Image(small_image)).seam_carve_enlarge(15, axis=0)
+    transposed = np.ascontiguousarray(small_image.swapaxes(0, 1))
+
+    np.testing.assert_array_equal(
+        enlarged.img.mat, sequential_enlarge(transposed, 15).swapaxes(0, 1)
+    )
+
+
+@pytest.mark.parametrize("axis", [0, 1])
+@pytest.mark.parametrize("marked, message", [(True, "Too many"), (False, "Too few")])
+def test_insert_seams_rejects_malformed_masks(small_image, axis, marked, message):
+    # Three marked pixels in every row, or column for axis 0, apart from one
+    duplicate = np.zeros(small_image.shape[:2], dtype=np.bool_)
+    if axis == 1:
+        duplicate[:, :3] = True
+        duplicate[5, 10 if marked else 2] = marked
+    else:
+        duplicate[:3] = True
+        duplicate[10 if marked else 2, 5] = marked
+
+    with pytest.raises(AssertionError, match=message):
+        insert_seams(small_image, duplicate, 3, axis)
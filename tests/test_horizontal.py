@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from src.algorithms.carving import CarvingBuffer
+from src.algorithms.energy import EnergyCalculator
+from src.algorithms.seam import SeamFinder
+from src.lib import CarvableImage, Image
+
+# Horizontal seams of an image are the vertical seams of its transpose. Rotating the
+# image instead would also reverse the order of one axis and break ties differently
+
+
+def transpose(mat: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(mat.swapaxes(0, 1))
+
+
+def test_horizontal_seam_matches_vertical_seam_of_transpose(castle_small):
+    energy_map = EnergyCalculator.squared_diff(castle_small)
+
+    np.testing.assert_array_equal(
+        SeamFinder.find_horizontal_seam(energy_map),
+        SeamFinder.find_seam(transpose(energy_map)),
+    )
+    np.testing.assert_array_equal(
+        SeamFinder.find_horizontal_seam_forward(castle_small),
+        SeamFinder.find_seam_forward(transpose(castle_small)),
+    )
+
+
+def test_buffer_removes_horizontal_seam_in_place(castle_small):
+    seam = SeamFinder.find_horizontal_seam(EnergyCalculator.squared_diff(castle_small))
+
+    carved = CarvingBuffer(castle_small)
+    transposed = CarvingBuffer(transpose(castle_small))
+    for _ in range(3):
+        carved.remove_seam(seam, axis=0)
+        transposed.remove_seam(seam)
+
+    np.testing.assert_array_equal(carved.to_array(), transpose(transposed.view))
+
+
+@pytest.mark.parametrize("incremental", [True, False])
+@pytest.mark.parametrize("forward_energy", [False, True])
+def test_horizontal_seam_carve_matches_transposed_carve(
+    castle_small, incremental, forward_energy
+):
+    carvable = CarvableImage(Image(castle_small))
+    carvable.forward_energy = forward_energy
+    transposed = CarvableImage(Image(transpose(castle_small)))
+    transposed.forward_energy = forward_energy
+
+    carved = carvable.seam_carve(30, incremental=incremental, axis=0).img.mat
+
+    assert carved.shape == (castle_small.shape[0] - 30,) + castle_small.shape[1:]
+    np.testing.assert_array_equal(
+        carved, transpose(transposed.seam_carve(30, incremental=incremental).img.mat)
+    )
+
+
+def test_horizontal_seam_carve_enlarge_matches_transposed_enlarge(castle_small):
+    carved = CarvableImage(Image(castle_small)).seam_carve_enlarge(20, axis=0)
+    transposed = CarvableImage(Image(transpose(castle_small))).seam_carve_enlarge(20)
+
+    np.testing.assert_array_equal(carved.img.mat, transpose(transposed.img.mat))
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from src.lib import CarvableImage, Image
+
+
+@pytest.fixture
+def array(small_image) -> np.ndarray:
+    return small_image.copy()
+
+
+def test_copy_false_wraps_a_read_only_view(array):
+    image = Image(array, copy=False)
+
+    assert np.shares_memory(image.mat, array)
+    assert not image.mat.flags.writeable
+    assert array.flags.writeable
+
+    # Writing goes to a private copy
+    image.writable_mat()[:] = 0
+    assert not np.shares_memory(image.mat, array)
+    assert array.any()
+
+
+def test_copy_true_copies(array):
+    image = Image(array)
+
+    assert not np.shares_memory(image.mat, array)
+    assert image.mat.flags.writeable
+
+
+def test_carving_never_modifies_a_wrapped_array(array):
+    original = array.copy()
+    carvable = CarvableImage(Image(array, copy=False))
+    mask = np.zeros(array.shape[:2], dtype=np.int8)
+    mask[20:30, 30:40] = -1
+
+    carvable.seam_carve(10)
+    carvable.seam_carve(10, axis=0, incremental=False)
+    carvable.seam_carve_enlarge(10)
+    carvable.remove_object(mask)
+    carvable.retarget(70, 50)
+    for _ in carvable.iter_seams(5):
+        pass
+
+    np.testing.assert_array_equal(array, original)
+
+
+def test_from_path_memory_maps_uncompressed_images(small_image, tmp_path):
+    npy_path = str(tmp_path / "image.npy")
+    Image(small_image).save(npy_path)
+    raw_path = str(tmp_path / "image.raw")
+    small_image.tofile(raw_path)
+
+    for image in (
+        Image.from_path(npy_path),
+        Image.from_path(raw_path, shape=small_image.shape[:2]),
+    ):
+        assert isinstance(image.mat.base, np.memmap)
+        assert not image.mat.flags.writeable
+        np.testing.assert_array_equal(image.mat, small_image)
+
+    with pytest.raises(ValueError):
+        Image.from_path(raw_path)
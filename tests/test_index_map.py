@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from src.algorithms.index_map import SeamIndexMap
+from src.lib import CarvableImage, Image
+
+
+@pytest.mark.parametrize("axis", [0, 1])
+def test_index_map_matches_seam_carve(small_image, axis):
+    carvable = CarvableImage(Image(small_image))
+    index_map = carvable._record_index_map(20, axis=axis)
+
+    for num_seams in (0, 7, 20):
+        np.testing.assert_array_equal(
+            index_map.carve(small_image, num_seams),
+            carvable.seam_carve(num_seams, axis=axis).img.mat,
+        )
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+@pytest.mark.parametrize("axis", [0, 1])
+def test_saved_index_map_keeps_its_axis(small_image, tmp_path, axis, mmap):
+    index_map = CarvableImage(Image(small_image))._record_index_map(10, axis=axis)
+
+    path = str(tmp_path / "index_map.npz")
+    index_map.save(path)
+    loaded = SeamIndexMap.load(path, mmap=mmap)
+
+    assert loaded.axis == axis and loaded.num_seams == 10
+    assert isinstance(loaded.order, np.memmap) == mmap
+    np.testing.assert_array_equal(loaded.order, index_map.order)
+    np.testing.assert_array_equal(
+        loaded.carve(small_image, 10), index_map.carve(small_image, 10)
+    )
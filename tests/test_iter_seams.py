@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from src.algorithms.seam import draw_seam
+from src.lib import CarvableImage, Image
+
+
+def consume(generator):
+    items = []
+    while True:
+        try:
+            items.append(next(generator))
+        except StopIteration as stop:
+            return items, stop.value
+
+
+@pytest.mark.parametrize("axis", [0, 1])
+def test_iter_seams_matches_seam_carve(castle_small, axis):
+    carvable = CarvableImage(Image(castle_small))
+
+    items, carved = consume(carvable.iter_seams(20, axis=axis))
+
+    assert len(items) == 20
+    np.testing.assert_array_equal(
+        carved.img.mat, carvable.seam_carve(20, axis=axis).img.mat
+    )
+
+
+def test_iter_seams_yields_every_seam_with_its_image(castle_small):
+    carvable = CarvableImage(Image(castle_small))
+    h, w, _ = castle_small.shape
+
+    for i, (image, seam) in enumerate(carvable.iter_seams(10)):
+        assert image.shape == (h, w - i, 3)
+        assert len(seam) == h and (seam < w - i).all()
+
+
+@pytest.mark.parametrize("max_fps, frames", [(1e9, 10), (1e-3, 2)])
+def test_interactive_seam_carve_throttles_frames(castle_small, max_fps, frames):
+    carvable = CarvableImage(Image(castle_small))
+    rendered = []
+
+    carved = carvable.interactive_seam_carve(
+        10, max_fps=max_fps, render=lambda frame: rendered.append(frame.copy())
+    )
+
+    # The first and the last seam are always drawn
+    assert len(rendered) == frames
+    seams = [seam for _, seam in carvable.iter_seams(10)]
+    image = carvable.seam_carve(9).img.mat
+    np.testing.assert_array_equal(rendered[-1], draw_seam(image, seams[-1]))
+    np.testing.assert_array_equal(carved.img.mat, carvable.seam_carve(10).img.mat)
+
+
+def test_interactive_seam_carve_requires_positive_fps(castle_small):
+    with pytest.raises(ValueError):
+        CarvableImage(Image(castle_small)).interactive_seam_carve(1, max_fps=0)
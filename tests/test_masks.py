@@ -0,0 +1,141 @@
+import numpy as np
+import pytest
+
+from src.algorithms.carving import CarvingBuffer, carve_seam
+from src.algorithms.energy import EnergyCalculator, apply_mask
+from src.algorithms.seam import SeamFinder
+from src.lib import CarvableImage, Image
+
+
+def remove_mask(shape, rows: slice, columns: slice) -> np.ndarray:
+    mask = np.zeros(shape[:2], dtype=np.int8)
+    mask[rows, columns] = -1
+    return mask
+
+
+@pytest.mark.parametrize("axis", [0, 1])
+def test_remove_object_removes_every_marked_pixel(castle_small, axis):
+    h, w, _ = castle_small.shape
+    carvable = CarvableImage(Image(castle_small))
+
+    totals = []
+    carvable.progress_callback = lambda done, total: totals.append(total)
+    mask = remove_mask(castle_small.shape, slice(200, 230), slice(300, 320))
+    carved = carvable.remove_object(mask, axis=axis).img.mat
+
+    # Vertical seams remove at most w - 1 columns, horizontal ones h - 1 rows
+    assert set(totals) == {w - 1 if axis == 1 else h - 1}
+    if axis == 1:
+        assert carved.shape[0] == h and 20 <= w - carved.shape[1] < w
+    else:
+        assert carved.shape[1] == w and 30 <= h - carved.shape[0] < h
+
+
+@pytest.mark.parametrize("axis", [0, 1])
+def test_remove_object_raises_when_marked_pixels_remain(small_image, axis):
+    mask = np.full(small_image.shape[:2], -1, dtype=np.int8)
+
+    with pytest.raises(ValueError, match="left after removing"):
+        CarvableImage(Image(small_image)).remove_object(mask, axis=axis)
+
+
+def test_remove_object_wider_than_tall_region_on_portrait(castle_small):
+    portrait = np.ascontiguousarray(castle_small[:, :200])
+    mask = remove_mask(portrait.shape, slice(100, 110), slice(None))
+
+    # The full-width region is removed by horizontal seams
+    carved = CarvableImage(Image(portrait)).remove_object(mask).img.mat
+    assert carved.shape[1] == 200 and carved.shape[0] <= 443
+
+    with pytest.raises(ValueError):
+        CarvableImage(Image(portrait)).remove_object(mask, axis=1)
+
+
+def test_keep_mask_protects_zero_energy_image():
+    flat = np.zeros((40, 60, 3), dtype=np.uint8)
+    mask = np.zeros((40, 60), dtype=np.int8)
+    # Seams tie everywhere on a flat image and prefer the left-most columns
+    mask[:, :20] = 1
+
+    carved = CarvingBuffer(flat, mask=mask)
+    for seam in CarvableImage(Image(flat))._iter_seams(carved, 20):
+        assert (carved.mask[np.arange(40), seam] == 0).all()
+
+
+@pytest.mark.parametrize("seams_per_pass", [1, 8])
+def test_remove_mask_seams_go_through_marked_pixels(castle_small, seams_per_pass):
+    mask = remove_mask(castle_small.shape, slice(None), slice(300, 310))
+    marked = castle_small.copy()
+    marked[:, 300:310] = (255, 0, 255)
+
+    carved = (
+        CarvableImage(Image(marked))
+        .seam_carve(10, mask=mask, seams_per_pass=seams_per_pass)
+        .img.mat
+    )
+
+    # All ten seams take one marked pixel per row, before any other pixel
+    assert not (carved == (255, 0, 255)).all(axis=2).any()
+
+
+@pytest.mark.parametrize("incremental", [True, False])
+def test_masked_seams_keep_the_energy_differences(incremental):
+    # Below the removed pixels, float32 sums of -MASK_ENERGY per row round the
+    # energy of the rest of the seam away
+    mat = np.random.default_rng(0).integers(0, 256, (200, 60, 3), dtype=np.uint8)
+    mask = remove_mask(mat.shape, slice(0, 100), slice(20, 30))
+    energy_map = EnergyCalculator.squared_diff(mat).astype(np.float64)
+    apply_mask(energy_map, mask)
+
+    carved = CarvableImage(Image(mat)).seam_carve(1, incremental=incremental, mask=mask)
+
+    np.testing.assert_array_equal(
+        carved.img.mat, carve_seam(mat, SeamFinder.find_seam(energy_map))
+    )
+
+
+def test_remove_mask_keeps_approximate_mode_batching(castle_small):
+    mask = remove_mask(castle_small.shape, slice(None), slice(300, 310))
+    carvable = CarvableImage(Image(castle_small))
+
+    carved = CarvingBuffer(castle_small, mask=mask)
+    batches = list(carvable._iter_seam_batches(carved, 10, 8, 1.5))
+
+    # The cost ratio still accepts other seams through the removed pixels when the
+    # cheapest cost is negative
+    assert len(batches[0]) > 1
+    assert not (carved.mask < 0).any()
+
+
+@pytest.mark.parametrize("incremental", [True, False])
+@pytest.mark.parametrize("axis", [0, 1])
+def test_faces_are_detected_once_and_kept(castle_small, monkeypatch, axis, incremental):
+    # A region the first vertical and horizontal seams both cross without a mask
+    x, y, w, h = 560, 0, 60, 80
+    calls = []
+
+    def detect_faces(self, image):
+        calls.append(image.shape)
+        return [(x, y, w, h)]
+
+    monkeypatch.setattr(CarvableImage, "_detect_faces", detect_faces)
+    carvable = CarvableImage(Image(castle_small))
+
+    carved = carvable.seam_carve_with_mask(40, axis=axis, incremental=incremental)
+    mat = carved.img.mat
+
+    assert calls == [castle_small.shape]
+    mask = np.zeros(castle_small.shape[:2], dtype=np.int8)
+    mask[y : y + h, x : x + w] = 1
+    np.testing.assert_array_equal(
+        mat,
+        carvable.seam_carve(40, incremental=incremental, axis=axis, mask=mask).img.mat,
+    )
+
+    # The seams went around the face, so it is still there in one piece
+    face = castle_small[y : y + h, x : x + w]
+    if axis == 1:
+        windows = (mat[y : y + h, i : i + w] for i in range(mat.shape[1] - w + 1))
+    else:
+        windows = (mat[i : i + h, x : x + w] for i in range(mat.shape[0] - h + 1))
+    assert any(np.array_equal(window, face) for window in windows)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from src.algorithms.energy import EnergyCalculator
+from src.lib import CarvableImage, Image
+from src.out_of_core import seam_carve_out_of_core
+
+
+@pytest.mark.parametrize("energy", ["squared_diff", "sobel"])
+def test_out_of_core_matches_in_memory_carving(castle_small, tmp_path, energy):
+    output_path = str(tmp_path / "carved.npy")
+
+    # Strips much smaller than the image, so the energy map is built from many
+    carved = seam_carve_out_of_core(
+        castle_small,
+        output_path,
+        30,
+        EnergyCalculator.get(energy),
+        work_dir=str(tmp_path),
+        strip_height=16,
+    )
+
+    expected = CarvableImage(Image(castle_small), energy).seam_carve(30).img.mat
+    np.testing.assert_array_equal(carved, expected)
+    np.testing.assert_array_equal(np.load(output_path), expected)
+
+
+def test_out_of_core_reads_npy_files(small_image, tmp_path):
+    input_path = str(tmp_path / "image.npy")
+    np.save(input_path, small_image)
+
+    carved = seam_carve_out_of_core(input_path, str(tmp_path / "carved.npy"), 10)
+
+    np.testing.assert_array_equal(
+        carved, CarvableImage(Image(small_image)).seam_carve(10).img.mat
+    )
+
+
+def test_out_of_core_validates_arguments(small_image, tmp_path):
+    output_path = str(tmp_path / "carved.npy")
+
+    with pytest.raises(ValueError):
+        seam_carve_out_of_core(small_image, output_path, small_image.shape[1])
+    with pytest.raises(ValueError):
+        seam_carve_out_of_core(small_image[..., 0], output_path, 1)
+    with pytest.raises(ValueError):
+        seam_carve_out_of_core(
+            small_image, output_path, 1, lambda mat: EnergyCalculator.squared_diff(mat)
+        )
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from src.algorithms.energy import EnergyCalculator
+from src.algorithms.seam import SeamFinder
+from src.lib import CarvableImage, Image
+
+
+def test_parallel_kernels_match_single_threaded_kernels(castle_small):
+    energy_map = EnergyCalculator.squared_diff(castle_small)
+
+    np.testing.assert_array_equal(
+        EnergyCalculator.squared_diff_parallel(castle_small), energy_map
+    )
+    np.testing.assert_array_equal(
+        SeamFinder.find_seam_parallel(energy_map), SeamFinder.find_seam(energy_map)
+    )
+    np.testing.assert_array_equal(
+        SeamFinder.find_seam_forward_parallel(castle_small),
+        SeamFinder.find_seam_forward(castle_small),
+    )
+
+
+@pytest.mark.parametrize("incremental", [True, False])
+@pytest.mark.parametrize("forward_energy", [False, True])
+def test_multi_threaded_seam_carve_matches_single_thread(
+    castle_small, incremental, forward_energy
+):
+    carved = []
+    for num_threads in (1, 4):
+        carvable = CarvableImage(Image(castle_small))
+        carvable.num_threads = num_threads
+        carvable.forward_energy = forward_energy
+        carved.append(carvable.seam_carve(20, incremental=incremental).img.mat)
+
+    np.testing.assert_array_equal(carved[0], carved[1])
+
+
+def test_num_threads_must_be_positive(castle_small):
+    with pytest.raises(ValueError):
+        CarvableImage(Image(castle_small)).num_threads = 0
@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.algorithms.energy import (
+    UINT16_ENERGY_SCALE,
+    EnergyCalculator,
+    quantize_energy,
+)
+from src.algorithms.seam import SeamFinder, _accumulate_row_saturating
+from src.lib import CarvableImage, Image
+
+SAMPLE_IMAGES = ("images/castle_small.png", "images/castle.jpg", "images/balloon.jpg")
+
+
+def seam_cost(energy_map: np.ndarray, seam: np.ndarray) -> float:
+    return float(energy_map[np.arange(len(seam)), seam].astype(np.float64).sum())
+
+
+@pytest.fixture(scope="module", params=SAMPLE_IMAGES)
+def image(request) -> np.ndarray:
+    mat = cv2.imread(request.param)
+    assert mat is not None, f"Failed to read {request.param}"
+    return mat
+
+
+def test_energy_matches_quantized_float_energy(image):
+    energy_map = EnergyCalculator.squared_diff(image)
+    quantized = EnergyCalculator.squared_diff_uint16(image)
+
+    assert quantized.dtype == np.uint16
+    np.testing.assert_array_equal(quantized, quantize_energy(energy_map))
+
+
+def test_integer_search_matches_float64_search_on_quantized_energy(image):
+    # Not the float path: both searches run on the same quantized energy, where float64
+    # sums are exact as well, so they must break ties the same way
+    quantized = EnergyCalculator.squared_diff_uint16(image)
+
+    np.testing.assert_array_equal(
+        SeamFinder.find_seam_uint16(quantized),
+        SeamFinder.find_seam(quantized.astype(np.float64)),
+    )
+
+
+def test_seam_cost_within_rounding_bound_of_float_seam(image):
+    energy_map = EnergyCalculator.squared_diff(image)
+    float_seam = SeamFinder.find_seam(energy_map)
+    seam = SeamFinder.find_seam_uint16(EnergyCalculator.squared_diff_uint16(image))
+
+    # The seams themselves can differ, e.g. the first seam of castle_small ties with the
+    # float seam in float32. Every pixel is rounded by at most half a step, so the seam
+    # can only lose to the float seam by one step per row
+    tolerance = len(seam) / UINT16_ENERGY_SCALE
+    assert seam_cost(energy_map, seam) <= seam_cost(energy_map, float_seam) + tolerance
+
+
+def test_incremental_carving_matches_full_recalculation():
+    carvable = CarvableImage(
+        Image.from_path(SAMPLE_IMAGES[0]),
+        EnergyCalculator.squared_diff_uint16,
+        SeamFinder.find_seam_uint16,
+    )
+
+    for axis in (0, 1):
+        np.testing.assert_array_equal(
+            carvable.seam_carve(10, axis=axis).img.mat,
+            carvable.seam_carve(10, incremental=False, axis=axis).img.mat,
+        )
+
+
+def test_cumulative_energy_saturates():
+    energy_row = np.array([100, 0, 65535], dtype=np.uint16)
+    previous = np.array([0xFFFFFFF0, 0xFFFFFFF0, 0xFFFFFFFF], dtype=np.uint32)
+    current = np.empty_like(previous)
+    backtrack_row = np.empty(3, dtype=np.int8)
+
+    _accumulate_row_saturating(energy_row, previous, current, backtrack_row)
+
+    np.testing.assert_array_equal(current, [0xFFFFFFFF, 0xFFFFFFF0, 0xFFFFFFFF])
+    np.testing.assert_array_equal(backtrack_row, [0, -1, -1])
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from src.algorithms.carving import CarvingBuffer
+from src.algorithms.energy import EnergyCalculator
+from src.algorithms.seam import IncrementalSeamFinder, SeamFinder
+from src.lib import CarvableImage, Image
+
+
+def test_incremental_seam_finder_matches_full_search(castle_small):
+    energy_map = CarvingBuffer(EnergyCalculator.squared_diff(castle_small))
+    seam_finder = IncrementalSeamFinder(energy_map.view)
+
+    for _ in range(30):
+        seam = seam_finder.find_seam()
+        np.testing.assert_array_equal(seam, SeamFinder.find_seam(energy_map.view))
+
+        # Without a band, every cell of the carved energy map counts as changed
+        energy_map.remove_seam(seam)
+        seam_finder.remove_seam(seam, energy_map.view)
+        np.testing.assert_array_equal(
+            seam_finder.cumulative_energy_map,
+            IncrementalSeamFinder(energy_map.to_array()).cumulative_energy_map,
+        )
+
+
+@pytest.mark.parametrize("forward_energy", [False, True])
+@pytest.mark.parametrize("axis", [0, 1])
+def test_incremental_seam_carve_matches_full_recalculation(
+    castle_small, forward_energy, axis
+):
+    carvable = CarvableImage(Image(castle_small))
+    carvable.forward_energy = forward_energy
+
+    np.testing.assert_array_equal(
+        carvable.seam_carve(40, axis=axis).img.mat,
+        carvable.seam_carve(40, incremental=False, axis=axis).img.mat,
+    )
+
+
+def test_find_seams_returns_disjoint_connected_seams(castle_small):
+    energy_map = EnergyCalculator.squared_diff(castle_small)
+    h, w = energy_map.shape
+
+    seams = SeamFinder.find_seams(energy_map, 50)
+
+    assert 1 < len(seams) <= 50
+    np.testing.assert_array_equal(seams[0], SeamFinder.find_seam(energy_map))
+    assert ((seams >= 0) & (seams < w)).all()
+    assert (np.abs(np.diff(seams, axis=1)) <= 1).all()
+    for y in range(h):
+        assert len(np.unique(seams[:, y])) == len(seams)
+
+    # Removed together, the seams leave every row one pixel per seam shorter
+    carved = CarvingBuffer(castle_small)
+    carved.remove_seams(seams)
+    assert carved.shape == (h, w - len(seams), 3)
+
+
+def test_find_seams_bounds_the_seam_cost(castle_small):
+    energy_map = EnergyCalculator.squared_diff(castle_small)
+    rows = np.arange(energy_map.shape[0])
+
+    seams = SeamFinder.find_seams(energy_map, 50, 1.2)
+    costs = energy_map[rows, seams].astype(np.float64).sum(axis=1)
+
+    assert (costs <= 1.2 * costs[0] + 1e-3).all()
+    assert len(seams) < len(SeamFinder.find_seams(energy_map, 50))
+
+
+def test_seam_carve_removes_seams_in_batches(castle_small):
+    h, w, _ = castle_small.shape
+
+    carved = CarvableImage(Image(castle_small)).seam_carve(40, seams_per_pass=8)
+
+    assert carved.img.shape == (h, w - 40, 3)
+
+
+def test_find_seam_banded_matches_full_search_with_full_band(castle_small):
+    energy_map = EnergyCalculator.squared_diff(castle_small)
+    h, w = energy_map.shape
+    center = np.full(h, w // 2, dtype=np.int32)
+
+    np.testing.assert_array_equal(
+        SeamFinder.find_seam_banded(energy_map, center, w),
+        SeamFinder.find_seam(energy_map),
+    )
+
+
+def test_find_seam_banded_stays_in_band(castle_small):
+    energy_map = EnergyCalculator.squared_diff(castle_small)
+    h, w = energy_map.shape
+    # A diagonal path, shifted to stay in the image near the borders
+    center = np.arange(h, dtype=np.int32) // 2 + 20
+
+    seam = SeamFinder.find_seam_banded(energy_map, center, 5)
+
+    assert len(seam) == h
+    assert (np.abs(np.diff(seam)) <= 1).all()
+    assert (np.abs(seam - center) <= 5).all()
+
+
+def test_find_seam_banded_is_empty_when_no_seam_fits(castle_small):
+    energy_map = EnergyCalculator.squared_diff(castle_small)
+    center = np.where(np.arange(energy_map.shape[0]) < 100, 50, 300).astype(np.int32)
+
+    assert len(SeamFinder.find_seam_banded(energy_map, center, 5)) == 0
+
+
+def test_seam_carve_pyramid(castle_small):
+    h, w, _ = castle_small.shape
+    carvable = CarvableImage(Image(castle_small))
+
+    assert carvable.seam_carve_pyramid(30).img.shape == (h, w - 30, 3)
+
+    # With a band as wide as the image, the refined seams are the exact ones
+    np.testing.assert_array_equal(
+        carvable.seam_carve_pyramid(30, band=w).img.mat,
+        carvable.seam_carve(30).img.mat,
+    )
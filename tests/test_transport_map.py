@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from src.algorithms.carving import CarvingBuffer
+from src.algorithms.energy import EnergyCalculator
+from src.algorithms.seam import SeamFinder
+from src.algorithms.transport_map import scale_seam_order, seam_order
+from src.lib import CarvableImage, Image
+
+
+def remove_cheapest_seam(mat: np.ndarray, axis: int):
+    energy_map = EnergyCalculator.squared_diff(mat)
+    if axis == 1:
+        seam = SeamFinder.find_seam(energy_map)
+        cost = energy_map[np.arange(len(seam)), seam].sum()
+    else:
+        seam = SeamFinder.find_horizontal_seam(energy_map)
+        cost = energy_map[seam, np.arange(len(seam))].sum()
+
+    carved = CarvingBuffer(mat)
+    carved.remove_seam(seam, axis)
+    return carved.to_array(), float(cost)
+
+
+def order_cost(mat: np.ndarray, order) -> float:
+    total = 0.0
+    for axis in order:
+        mat, cost = remove_cheapest_seam(mat, axis)
+        total += cost
+    return total
+
+
+def brute_force_order(mat: np.ndarray, num_vertical: int, num_horizontal: int):
+    """
+    Evaluate the transport map recursion without reusing any cell, so every path to
+    the target is carved from the original image, ties going to the vertical seam.
+    """
+    if num_vertical == num_horizontal == 0:
+        return 0.0, mat, ()
+
+    candidates = []
+    for axis, i, j in (
+        (1, num_vertical - 1, num_horizontal),
+        (0, num_vertical, num_horizontal - 1),
+    ):
+        if i >= 0 and j >= 0:
+            cost, image, order = brute_force_order(mat, i, j)
+            carved, seam_cost = remove_cheapest_seam(image, axis)
+            candidates.append((cost + seam_cost, carved, order + (axis,)))
+    return min(candidates, key=lambda candidate: candidate[0])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_seam_order_matches_brute_force(seed):
+    mat = np.random.default_rng(seed).integers(0, 256, (8, 9, 3), dtype=np.uint8)
+
+    order = seam_order(
+        mat,
+        3,
+        2,
+        EnergyCalculator.squared_diff,
+        SeamFinder.find_seam,
+        SeamFinder.find_horizontal_seam,
+    )
+
+    cost, _, expected = brute_force_order(mat, 3, 2)
+    assert tuple(order) == expected
+    assert order_cost(mat, order) == pytest.approx(cost)
+
+
+def test_seam_order_validates_counts():
+    mat = np.zeros((8, 9, 3), dtype=np.uint8)
+    energy, find_seam = EnergyCalculator.squared_diff, SeamFinder.find_seam
+
+    with pytest.raises(ValueError):
+        seam_order(mat, 9, 0, energy, find_seam, SeamFinder.find_horizontal_seam)
+
+
+@pytest.mark.parametrize(
+    "order, num_vertical, num_horizontal, expected",
+    [
+        # Same counts keep the order
+        ([1, 0, 0, 1, 0], 2, 3, [1, 0, 0, 1, 0]),
+        ([1, 0, 1, 0], 4, 4, [1, 1, 0, 0, 1, 1, 0, 0]),
+        ([1, 1, 0, 0], 3, 5, [1, 1, 1, 0, 0, 0, 0, 0]),
+        # Axes the proxy has no seams for are left for the end
+        ([1, 1, 1], 6, 4, [1] * 6 + [0] * 4),
+        ([0, 0], 3, 5, [0] * 5 + [1] * 3),
+        ([], 2, 1, [1, 1, 0]),
+    ],
+)
+def test_scale_seam_order(order, num_vertical, num_horizontal, expected):
+    scaled = scale_seam_order(
+        np.array(order, dtype=np.int8), num_vertical, num_horizontal
+    )
+
+    np.testing.assert_array_equal(scaled, expected)
+
+
+def test_scale_seam_order_follows_the_proxy_path():
+    order = np.random.default_rng(0).permutation([1] * 7 + [0] * 5).astype(np.int8)
+
+    scaled = scale_seam_order(order, 70, 50)
+
+    assert np.count_nonzero(scaled) == 70 and len(scaled) == 120
+    # Every 10th seam of the scaled order reaches the next point of the proxy path
+    proxy_path = np.cumsum(order)
+    np.testing.assert_array_equal(np.cumsum(scaled)[9::10], proxy_path * 10)
+
+
+@pytest.mark.parametrize("size", [(60, 50), (90, 70), (90, 50), (60, 70), (80, 60)])
+def test_retarget_hits_the_target_size(small_image, size):
+    width, height = size
+
+    retargeted = CarvableImage(Image(small_image)).retarget(width, height)
+
+    assert retargeted.img.shape == (height, width, 3)
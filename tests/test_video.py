@@ -0,0 +1,103 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.lib import CarvableImage, Image
+from src.video import VideoRetargeter, retarget_video
+
+
+@pytest.fixture(scope="module")
+def frames(castle_small) -> list:
+    # A still, a small pan and a different scene
+    return [
+        castle_small[:200, 100:400],
+        castle_small[:200, 102:402],
+        castle_small[200:400, 300:600],
+    ]
+
+
+def seam_carve(frame: np.ndarray, num_seams: int) -> np.ndarray:
+    return CarvableImage(Image(frame)).seam_carve(num_seams).img.mat
+
+
+def test_keyframe_matches_seam_carve(frames):
+    retargeter = VideoRetargeter(20)
+
+    np.testing.assert_array_equal(
+        retargeter.retarget_frame(frames[0]), seam_carve(frames[0], 20)
+    )
+
+
+def test_banded_frames_follow_the_previous_seams(frames):
+    retargeter = VideoRetargeter(20, keyframe_interval=0)
+    keyframe = retargeter.retarget_frame(frames[0])
+
+    # The seams of a still frame are found again inside their own bands
+    np.testing.assert_array_equal(retargeter.retarget_frame(frames[0]), keyframe)
+
+    for frame in frames[1:]:
+        assert retargeter.retarget_frame(frame).shape == (200, 280, 3)
+
+
+def test_keyframes_search_the_whole_frame(frames):
+    retargeter = VideoRetargeter(20, keyframe_interval=2)
+    for frame in frames[:2]:
+        retargeter.retarget_frame(frame)
+
+    np.testing.assert_array_equal(
+        retargeter.retarget_frame(frames[2]), seam_carve(frames[2], 20)
+    )
+
+    retargeter = VideoRetargeter(20, keyframe_interval=0)
+    retargeter.retarget_frame(frames[0])
+    retargeter.reset()
+    np.testing.assert_array_equal(
+        retargeter.retarget_frame(frames[2]), seam_carve(frames[2], 20)
+    )
+
+
+def test_frames_must_keep_their_size(frames):
+    retargeter = VideoRetargeter(20)
+    retargeter.retarget_frame(frames[0])
+
+    with pytest.raises(ValueError):
+        retargeter.retarget_frame(frames[0][:100])
+    # Banded frames used to check the height only
+    with pytest.raises(ValueError):
+        retargeter.retarget_frame(frames[0][:, :250])
+
+
+def test_no_seams_passes_frames_through(frames):
+    retargeter = VideoRetargeter(0)
+
+    for frame in frames[:2]:
+        np.testing.assert_array_equal(retargeter.retarget_frame(frame), frame)
+    with pytest.raises(ValueError):
+        retargeter.retarget_frame(frames[0][:, :250])
+
+
+def test_retarget_video(frames, tmp_path):
+    input_path, output_path = str(tmp_path / "in.avi"), str(tmp_path / "out.avi")
+    fourcc = cv2.VideoWriter_fourcc(*"MJPG")
+    writer = cv2.VideoWriter(input_path, fourcc, 10, (300, 200))
+    for frame in frames:
+        writer.write(np.ascontiguousarray(frame))
+    writer.release()
+
+    assert retarget_video(input_path, output_path, 280, fourcc="MJPG") == 3
+
+    capture = cv2.VideoCapture(output_path)
+    assert capture.get(cv2.CAP_PROP_FRAME_WIDTH) == 280
+    assert capture.get(cv2.CAP_PROP_FRAME_HEIGHT) == 200
+    capture.release()
+
+    # The full width keeps every frame
+    assert retarget_video(input_path, output_path, 300, fourcc="MJPG") == 3
+
+    with pytest.raises(ValueError):
+        retarget_video(input_path, output_path, 301)
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        VideoRetargeter(10, band=0)